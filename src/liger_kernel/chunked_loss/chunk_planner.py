@@ -0,0 +1,50 @@
+import math
+
+from liger_kernel.ops.utils import get_free_memory_bytes
+from liger_kernel.ops.utils import plan_chunk_size
+
+
+def resolve_chunk_size(
+    chunk_size,
+    _input,
+    weight,
+    rows_per_item,
+    n_logits=1,
+    n_fp32_logits=3,
+):
+    """
+    `chunk_size` as is, or with chunk_size="auto", the largest number of items (pairs, sequences or rows) per chunk
+    whose logits fit in half of the memory free on the device of `_input`. The other half is left to the inputs,
+    their gradients and the allocator.
+
+    An item materializes `rows_per_item` rows of logits: `n_logits` in the dtype of `_input` (the matmul output) and
+    `n_fp32_logits` in fp32 (by default the upcast log_softmax, its gradient and the softmax of the backward), i.e.
+    `rows_per_item * V * 4 * n_fp32_logits` bytes for the latter, plus the (V, H) weight gradient buffers once. The free
+    memory is queried on every call, since it shrinks once the optimizer states, the activations of later steps or
+    other models are allocated; the rest of the plan is cheap arithmetic on the shapes. Without a free memory query
+    (e.g. on cpu), the chunk keeps the logits about the size of the input, as plan_chunk_size does.
+    """
+    if chunk_size != "auto":
+        assert isinstance(chunk_size, int) and chunk_size > 0, (
+            f"chunk_size must be a positive integer or 'auto'. Got: {chunk_size}"
+        )
+        return chunk_size
+    V, H = weight.shape
+    n_items = _input.numel() // H // rows_per_item
+    free_bytes = get_free_memory_bytes(_input.device)
+    plan = plan_chunk_size(
+        n_items * rows_per_item,
+        H,
+        V,
+        _input.dtype,
+        max_chunk_bytes=free_bytes // 2 if free_bytes is not None else None,
+        n_logits=n_logits,
+        n_fp32_logits=n_fp32_logits,
+        device=_input.device,
+    )
+    return min(max(1, plan.chunk_size // rows_per_item), max(n_items, 1))
+
+
+def rows_per_sequence(_input):
+    """Rows of logits per sequence of a (batch_size, seq_len, hidden_size) input (1 for a 2D input)."""
+    return math.prod(_input.shape[1:-1])
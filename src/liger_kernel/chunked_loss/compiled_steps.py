@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+import torch
+
+CompiledStepCacheInfo = namedtuple("CompiledStepCacheInfo", ["hits", "misses", "recompiles", "currsize"])
+
+# compiled per-chunk step functions of the chunked losses, shared by all their calls
+_compiled_steps = {}
+_stats = {"hits": 0, "misses": 0, "recompiles": 0}
+
+
+def _counting_backend(gm, example_inputs):
+    # every graph dynamo compiles (first compile, guard failure or graph break) goes through the backend
+    _stats["recompiles"] += 1
+    from torch._inductor.compile_fx import compile_fx
+
+    return compile_fx(gm, example_inputs)
+
+
+def static_config(**config):
+    """
+    Hashable key part of the arguments of a step function: tensors are reduced to their dtype and rank and floats to
+    their type, everything else (flags, strings, ints, loss functions) is kept as is.
+    """
+    key = []
+    for name, value in sorted(config.items()):
+        if isinstance(value, torch.Tensor):
+            value = (value.dtype, value.ndim)
+        elif isinstance(value, float):
+            value = float
+        elif isinstance(value, dict):
+            value = static_config(**value)
+        key.append((name, value))
+    return tuple(key)
+
+
+def as_graph_inputs(kwargs, names, device):
+    """
+    The float hyperparameters `names` of the step arguments `kwargs` as 0-d float32 tensors. Dynamo specializes the
+    graph on the value of a python float used in tensor math, but not on the value of a tensor. A name of a dict
+    argument (e.g. `loss_kwargs`) converts all its float entries. Hyperparameters used in python control flow (e.g.
+    `if beta == 0`) must stay floats.
+    """
+    converted = {}
+    for name, value in kwargs.items():
+        if name in names and isinstance(value, float):
+            value = torch.tensor(value, dtype=torch.float32, device=device)
+        elif name in names and isinstance(value, dict):
+            value = as_graph_inputs(value, value.keys(), device)
+        converted[name] = value
+    return converted
+
+
+def compiled_step(step_fn, key):
+    """
+    `torch.compile(step_fn)`, created once per `key` (the loss class and the static config the graph specializes on,
+    see `static_config`) and reused by all the later calls. The tensors must be arguments of `step_fn` rather than
+    closure variables, and the float hyperparameters 0-d tensors (see `as_graph_inputs`): they are then graph inputs,
+    and a new value (e.g. of `beta`) does not recompile.
+    """
+    key = (step_fn, key)
+    compiled_fn = _compiled_steps.get(key)
+    if compiled_fn is None:
+        _stats["misses"] += 1
+        compiled_fn = _compiled_steps[key] = torch.compile(step_fn, backend=_counting_backend)
+    else:
+        _stats["hits"] += 1
+    return compiled_fn
+
+
+def compiled_step_cache_info():
+    """
+    Hits and misses of the compiled step cache, and the number of graphs compiled by dynamo for them. In steady
+    state, `hits` grows with every call while `misses` and `recompiles` stay constant.
+    """
+    return CompiledStepCacheInfo(currsize=len(_compiled_steps), **_stats)
+
+
+def compiled_step_cache_clear():
+    """Drop the compiled step functions and reset the counters."""
+    _compiled_steps.clear()
+    for name in _stats:
+        _stats[name] = 0
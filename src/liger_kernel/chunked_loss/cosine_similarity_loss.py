@@ -49,7 +49,7 @@ class LigerFusedLinearCosineSimilarityFunction(LigerFusedLinearDistillationBase)
         ignore_index: int = -100,
         temperature: float = 1.0,
         compiled: bool = True,
-        chunk_size: int = 1024,
+        chunk_size: Union[int, str] = 1024,
         return_soft_hard_loss: bool = False,
     ) -> Union[torch.Tensor, Tuple[torch.Tensor, torch.Tensor, torch.Tensor]]:
         return super().forward(
@@ -99,7 +99,7 @@ class LigerFusedLinearCosineSimilarityLoss(torch.nn.Module):
         ignore_index: int = -100,
         temperature: float = 1.0,
         compiled: bool = True,
-        chunk_size: int = 1024,
+        chunk_size: Union[int, str] = 1024,
         return_soft_hard_loss: bool = False,
     ):
         super().__init__()
@@ -1,3 +1,5 @@
+from typing import Union
+
 import torch
 import torch.nn.functional as F
 
@@ -70,7 +72,7 @@ class LigerFusedLinearCPOFunction(LigerFusedLinearPreferenceBase):
             compute_nll_loss (bool): Whether to compute the NLL loss
             compiled (bool): Whether to use torch compile
             average_log_prob (bool): Whether to average the log probability per non-masked token
-            chunk_size (int): Size of chunks for processing.
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
         Returns:
             torch.Tensor: Computed loss
         """
@@ -111,7 +113,7 @@ class LigerFusedLinearCPOLoss(torch.nn.Module):
         compute_nll_loss: bool = True,
         compiled: bool = True,
         average_log_prob: bool = False,
-        chunk_size: int = 1,
+        chunk_size: Union[int, str] = 1,
     ):
         """
         Args:
@@ -122,7 +124,7 @@ class LigerFusedLinearCPOLoss(torch.nn.Module):
             compute_nll_loss (bool): Whether to compute the NLL loss.
             compiled (bool): Whether to use the torch compiled kernel.
             average_log_prob (bool): Whether to average the log probability per non-masked token.
-            chunk_size (int): Size of chunks for processing.
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
         """
         super().__init__()
         self.ignore_index = ignore_index
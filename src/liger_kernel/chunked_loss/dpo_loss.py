@@ -1,7 +1,12 @@
+from typing import Union
+
 import torch
 import torch.nn.functional as F
 
+from liger_kernel.chunked_loss.chunk_planner import resolve_chunk_size
+from liger_kernel.chunked_loss.chunk_planner import rows_per_sequence
 from liger_kernel.chunked_loss.fused_linear_preference import LigerFusedLinearPreferenceBase
+from liger_kernel.ops.fused_linear_dpo import fused_linear_dpo_forward
 
 
 class LigerFusedLinearDPOFunction(LigerFusedLinearPreferenceBase):
@@ -114,6 +119,9 @@ class LigerFusedLinearDPOFunction(LigerFusedLinearPreferenceBase):
         average_log_prob=False,
         chunk_size=1,
         loss_type="sigmoid",
+        ref_chosen_logps=None,
+        ref_rejected_logps=None,
+        use_triton_kernel=False,
     ):
         """
         Fused linear layer with DPO loss.
@@ -131,10 +139,42 @@ class LigerFusedLinearDPOFunction(LigerFusedLinearPreferenceBase):
             compiled (bool): Whether to use torch compile
             use_ref_model (bool): Whether to use a reference model
             average_log_prob (bool): Whether to average the log probability per non-masked token
-            chunk_size (int): Size of chunks for processing.
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
+            loss_type (str): Type of DPO loss.
+            ref_chosen_logps (torch.Tensor, optional): Precomputed reference log probs of the chosen sequences, used
+                instead of ref_input/ref_weight (see RefLogpCache). Shape: (batch_size // 2,)
+            ref_rejected_logps (torch.Tensor, optional): Precomputed reference log probs of the rejected sequences.
+                Shape: (batch_size // 2,)
+            use_triton_kernel (bool): Whether to compute the sigmoid loss with the cross entropy kernel instead of
+                torch.func, without the fp32 log_softmax of the chunks (see fused_linear_dpo_forward). `compiled` is
+                then unused.
         Returns:
             torch.Tensor: Computed loss
         """
+        if use_triton_kernel:
+            assert loss_type == "sigmoid", f"use_triton_kernel only supports loss_type='sigmoid'. Got: {loss_type}"
+            loss, aux_outputs, grad_input, grad_weight, grad_bias = fused_linear_dpo_forward(
+                _input,
+                weight,
+                target,
+                bias,
+                ref_input=ref_input if use_ref_model else None,
+                ref_weight=ref_weight,
+                ref_bias=ref_bias,
+                ref_chosen_logps=ref_chosen_logps if use_ref_model else None,
+                ref_rejected_logps=ref_rejected_logps if use_ref_model else None,
+                ignore_index=ignore_index,
+                beta=beta,
+                compute_nll_loss=compute_nll_loss,
+                average_log_prob=average_log_prob,
+                # one (rows, V) logits buffer at a time: the reference logits are freed before the policy ones
+                chunk_size=resolve_chunk_size(
+                    chunk_size, _input, weight, rows_per_item=2 * rows_per_sequence(_input), n_fp32_logits=0
+                ),
+            )
+            ctx.save_for_backward(grad_input, grad_weight, grad_bias)
+            return loss, aux_outputs
+
         return super().forward(
             cls=cls,
             ctx=ctx,
@@ -153,12 +193,14 @@ class LigerFusedLinearDPOFunction(LigerFusedLinearPreferenceBase):
             average_log_prob=average_log_prob,
             chunk_size=chunk_size,
             loss_type=loss_type,
+            ref_chosen_logps=ref_chosen_logps,
+            ref_rejected_logps=ref_rejected_logps,
         )
 
     @staticmethod
     def backward(ctx, *grad_output):
         grads = LigerFusedLinearPreferenceBase.backward(ctx, grad_output)[:4]
-        return *grads, None, None, None, None, None, None, None, None, None, None, None
+        return *grads, None, None, None, None, None, None, None, None, None, None, None, None, None, None
 
 
 class LigerFusedLinearDPOLoss(torch.nn.Module):
@@ -174,8 +216,9 @@ class LigerFusedLinearDPOLoss(torch.nn.Module):
         compiled: bool = True,
         use_ref_model: bool = True,
         average_log_prob: bool = False,
-        chunk_size: int = 1,
+        chunk_size: Union[int, str] = 1,
         loss_type: str = "sigmoid",
+        use_triton_kernel: bool = False,
     ):
         """
         Args:
@@ -185,7 +228,10 @@ class LigerFusedLinearDPOLoss(torch.nn.Module):
             compiled (bool): Whether to use the torch compiled kernel.
             use_ref_model (bool): Whether to use a reference model for the DPO loss.
             average_log_prob (bool): Whether to average the log probability per non-masked token.
-            chunk_size (int): Size of chunks for processing.
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
+            loss_type (str): Type of DPO loss.
+            use_triton_kernel (bool): Whether to compute the sigmoid loss with the cross entropy kernel instead of
+                the torch compiled torch.func step.
         """
         super().__init__()
         self.ignore_index = ignore_index
@@ -196,6 +242,7 @@ class LigerFusedLinearDPOLoss(torch.nn.Module):
         self.average_log_prob = average_log_prob
         self.chunk_size = chunk_size
         self.loss_type = loss_type
+        self.use_triton_kernel = use_triton_kernel
         supported_loss_types = {"sigmoid", "apo_zero", "apo_down", "sppo_hard", "nca_pair"}
         if self.loss_type not in supported_loss_types:
             raise ValueError(f"Unsupported loss_type: {self.loss_type}. Supported types are: {supported_loss_types}")
@@ -209,6 +256,8 @@ class LigerFusedLinearDPOLoss(torch.nn.Module):
         ref_input=None,
         ref_weight=None,
         ref_bias=None,
+        ref_chosen_logps=None,
+        ref_rejected_logps=None,
     ):
         return LigerFusedLinearDPOFunction.apply(
             _input,
@@ -226,4 +275,7 @@ class LigerFusedLinearDPOLoss(torch.nn.Module):
             self.average_log_prob,
             self.chunk_size,
             self.loss_type,
+            ref_chosen_logps,
+            ref_rejected_logps,
+            self.use_triton_kernel,
         )
@@ -1,5 +1,4 @@
 from abc import abstractmethod
-from functools import partial
 from typing import Tuple
 from typing import Union
 
@@ -7,6 +6,11 @@ import torch
 
 from torch.nn import functional as F
 
+from liger_kernel.chunked_loss.chunk_planner import resolve_chunk_size
+from liger_kernel.chunked_loss.compiled_steps import as_graph_inputs
+from liger_kernel.chunked_loss.compiled_steps import compiled_step
+from liger_kernel.chunked_loss.compiled_steps import static_config
+
 
 class LigerFusedLinearDistillationBase(torch.autograd.Function):
     @abstractmethod
@@ -182,7 +186,8 @@ class LigerFusedLinearDistillationBase(torch.autograd.Function):
             student_bias (torch.Tensor, optional): Student bias tensor. Shape: (vocab_size,).
             teacher_bias (torch.Tensor, optional): Teacher bias tensor. Shape: (vocab_size,).
             loss_fn (callable): Loss function to compute the loss on a chunk of input/target.
-            chunk_size (int): Size of a chunk.
+            chunk_size (Union[int, str]): Size of a chunk. "auto" picks the largest chunk whose logits fit in the free
+                device memory (see `resolve_chunk_size`).
             ignore_index (int): Index to ignore for loss computation.
             weight_hard_loss (float): Weight for hard/task loss.
             weight_soft_loss (float): Weight for soft/distillation loss.
@@ -193,16 +198,19 @@ class LigerFusedLinearDistillationBase(torch.autograd.Function):
             return_soft_hard_loss (bool): Whether to return soft and hard losses separately. Default: False.
             loss_kwargs (dict): Other possible arguments that a loss function might need
         """
-        CHUNK_SIZE = chunk_size
+        # student and teacher logits, and the fp32 log probs of both with their gradients
+        CHUNK_SIZE = resolve_chunk_size(
+            chunk_size, student_input, student_weight, rows_per_item=1, n_logits=2, n_fp32_logits=4
+        )
         grad_weight = torch.zeros_like(student_weight)
-        grad_inputs = []
         grad_bias = torch.zeros_like(student_bias) if student_bias is not None else None
         loss_acc = torch.zeros((), device=student_input.device)
         soft_loss_acc = torch.zeros((), device=student_input.device) if return_soft_hard_loss else None
         hard_loss_acc = torch.zeros((), device=student_input.device) if return_soft_hard_loss else None
 
-        loss_func_to_call = partial(
-            LigerFusedLinearDistillationBase._compute_loss,
+        # Everything the step depends on is one of its arguments, so that its compiled graph is reused by the later
+        # calls (see compiled_step), with the float hyperparameters as graph inputs.
+        step_kwargs = dict(
             distillation_loss_fn=cls.distillation_loss_fn,
             full_target=target,
             ignore_index=ignore_index,
@@ -211,53 +219,45 @@ class LigerFusedLinearDistillationBase(torch.autograd.Function):
             compute_ce_loss=compute_ce_loss,
             temperature=temperature,
             beta=beta,
-            **loss_kwargs,
+            loss_kwargs=loss_kwargs,
         )
+        fused_fwd_bwd = LigerFusedLinearDistillationBase._fused_fwd_bwd
+        if compiled:
+            fused_fwd_bwd = compiled_step(
+                fused_fwd_bwd,
+                (
+                    cls,
+                    static_config(
+                        student_input=student_input,
+                        student_weight=student_weight,
+                        teacher_input=teacher_input,
+                        teacher_weight=teacher_weight,
+                        student_bias=student_bias,
+                        teacher_bias=teacher_bias,
+                        **step_kwargs,
+                    ),
+                ),
+            )
+            step_kwargs = as_graph_inputs(
+                step_kwargs, ("weight_hard_loss", "weight_soft_loss", "temperature"), student_input.device
+            )
 
         def accumulate_chunk(student_input_chunk, teacher_input_chunk, target_chunk):
+            (
+                (chunk_grad_input, chunk_grad_weight, *chunk_grad_bias),
+                (chunk_loss, (chunk_soft_loss, chunk_hard_loss, chunk_student_logits, chunk_teacher_logits)),
+            ) = fused_fwd_bwd(
+                student_input_chunk,
+                student_weight,
+                teacher_input_chunk,
+                teacher_weight,
+                target_chunk,
+                student_bias,
+                teacher_bias,
+                **step_kwargs,
+            )
             if student_bias is not None:
-                (
-                    (chunk_grad_input, chunk_grad_weight, chunk_grad_bias),
-                    (
-                        chunk_loss,
-                        (
-                            chunk_soft_loss,
-                            chunk_hard_loss,
-                            chunk_student_logits,
-                            chunk_teacher_logits,
-                        ),
-                    ),
-                ) = torch.func.grad_and_value(loss_func_to_call, argnums=(0, 1, 5), has_aux=True)(
-                    student_input_chunk,
-                    student_weight,
-                    teacher_input_chunk,
-                    teacher_weight,
-                    target_chunk,
-                    student_bias,
-                    teacher_bias,
-                )
-                grad_bias.add_(chunk_grad_bias)
-            else:
-                (
-                    (chunk_grad_input, chunk_grad_weight),
-                    (
-                        chunk_loss,
-                        (
-                            chunk_soft_loss,
-                            chunk_hard_loss,
-                            chunk_student_logits,
-                            chunk_teacher_logits,
-                        ),
-                    ),
-                ) = torch.func.grad_and_value(loss_func_to_call, argnums=(0, 1), has_aux=True)(
-                    student_input_chunk,
-                    student_weight,
-                    teacher_input_chunk,
-                    teacher_weight,
-                    target_chunk,
-                    student_bias,
-                    teacher_bias,
-                )
+                grad_bias.add_(chunk_grad_bias[0])
             grad_weight.add_(chunk_grad_weight)
             loss_acc.add_(chunk_loss)
             if return_soft_hard_loss:
@@ -265,22 +265,26 @@ class LigerFusedLinearDistillationBase(torch.autograd.Function):
                 hard_loss_acc.add_(chunk_hard_loss)
             return chunk_grad_input
 
-        if compiled:
-            accumulate_chunk = torch.compile(accumulate_chunk)
-
         num_chunks = max(1, student_input.shape[0] // CHUNK_SIZE)
         _student_input_chunks = torch.chunk(student_input, chunks=num_chunks, dim=0)
         _teacher_input_chunks = torch.chunk(teacher_input, chunks=num_chunks, dim=0)
         _target_chunks = torch.chunk(target, chunks=num_chunks, dim=0)
 
+        # the input gradient of every chunk is written into its rows, instead of being concatenated at the end
+        grad_input = torch.empty_like(student_input) if len(_student_input_chunks) > 1 else None
+        start = 0
         for student_input_chunk, teacher_input_chunk, target_chunk in zip(
             _student_input_chunks, _teacher_input_chunks, _target_chunks
         ):
-            grad_input = accumulate_chunk(student_input_chunk, teacher_input_chunk, target_chunk)
-            grad_inputs.append(grad_input)
+            chunk_grad_input = accumulate_chunk(student_input_chunk, teacher_input_chunk, target_chunk)
+            if grad_input is None:
+                grad_input = chunk_grad_input
+            else:
+                grad_input[start : start + student_input_chunk.shape[0]].copy_(chunk_grad_input)
+            start += student_input_chunk.shape[0]
 
         ctx.save_for_backward(
-            torch.cat(grad_inputs, dim=0),
+            grad_input,
             grad_weight,
             grad_bias,
         )
@@ -288,6 +292,34 @@ class LigerFusedLinearDistillationBase(torch.autograd.Function):
             return loss_acc, soft_loss_acc, hard_loss_acc
         return loss_acc
 
+    @staticmethod
+    def _fused_fwd_bwd(
+        student_input_chunk,
+        student_weight,
+        teacher_input_chunk,
+        teacher_weight,
+        target_chunk,
+        student_bias,
+        teacher_bias,
+        loss_kwargs,
+        **kwargs,
+    ):
+        """
+        Fused forward and backward pass of the student for a chunk of input and target.
+        """
+        argnums = (0, 1, 5) if student_bias is not None else (0, 1)
+        return torch.func.grad_and_value(LigerFusedLinearDistillationBase._compute_loss, argnums=argnums, has_aux=True)(
+            student_input_chunk,
+            student_weight,
+            teacher_input_chunk,
+            teacher_weight,
+            target_chunk,
+            student_bias,
+            teacher_bias,
+            **kwargs,
+            **loss_kwargs,
+        )
+
     @staticmethod
     def backward(ctx, grad_output, *args):
         grad_input, grad_weight, grad_bias = ctx.saved_tensors
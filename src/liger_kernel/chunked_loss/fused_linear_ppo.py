@@ -1,10 +1,15 @@
 from abc import abstractmethod
-from functools import partial
 
 import torch
 import torch._dynamo.config
 import torch.nn.functional as F
 
+from liger_kernel.chunked_loss.chunk_planner import resolve_chunk_size
+from liger_kernel.chunked_loss.chunk_planner import rows_per_sequence
+from liger_kernel.chunked_loss.compiled_steps import as_graph_inputs
+from liger_kernel.chunked_loss.compiled_steps import compiled_step
+from liger_kernel.chunked_loss.compiled_steps import static_config
+
 
 class LigerFusedLinearPPOBase(torch.autograd.Function):
     @abstractmethod
@@ -71,7 +76,8 @@ class LigerFusedLinearPPOBase(torch.autograd.Function):
             temperature: Temperature for the logits
             compiled: Whether to use torch compile
             use_ref_model: Whether to use a reference model
-            chunk_size: Size of chunks for processing in other loss modules
+            chunk_size: Size of chunks for processing in other loss modules, or "auto" for the largest chunk whose logits
+                fit in the free device memory (see `resolve_chunk_size`)
             sapo_temperature_pos: Temperature for positive advantages in SAPO
             sapo_temperature_neg: Temperature for negative advantages in SAPO
             vllm_is_ratio: vLLM importance sampling ratio tensor (batch_size, seq_len) or (batch_size, 1) or None.
@@ -106,9 +112,9 @@ class LigerFusedLinearPPOBase(torch.autograd.Function):
         grad_bias = torch.zeros_like(bias) if bias is not None else None  # [V]
         aggregated_metrics = []
 
-        # Create a partial function with fixed arguments
-        compute_loss = partial(
-            LigerFusedLinearPPOBase._compute_chunk_loss,
+        # Everything the step depends on is one of its arguments, so that its compiled graph is reused by the later
+        # calls (see compiled_step), with the float hyperparameters as graph inputs.
+        step_kwargs = dict(
             ref_weight=ref_weight,
             ref_bias=ref_bias,
             full_attention_mask=attention_mask,
@@ -126,31 +132,26 @@ class LigerFusedLinearPPOBase(torch.autograd.Function):
             delta=delta,
             use_bias_correction_kl=use_bias_correction_kl,
         )
-
-        def fused_fwd_bwd(
-            input_chunk,
-            selected_token_ids_chunk,
-            attention_mask_chunk,
-            advantages_chunk,
-            ref_per_token_logps_chunk,
-            old_per_token_logps_chunk,
-            ref_input_chunk,
-            vllm_is_ratio_chunk,
-        ):
-            """Fused forward and backward for a chunk."""
-            argnums = (0, 1, 5) if bias is not None else (0, 1)
-            return torch.func.grad_and_value(compute_loss, argnums=argnums, has_aux=True)(
-                input_chunk,  # arg 0
-                weight,  # arg 1
-                selected_token_ids_chunk,  # arg 2
-                attention_mask_chunk,  # arg 3
-                advantages_chunk,  # arg 4
-                bias,  # arg 5
-                ref_per_token_logps_chunk=ref_per_token_logps_chunk,  # arg 6
-                old_per_token_logps_chunk=old_per_token_logps_chunk,  # arg 7
-                ref_input_chunk=ref_input_chunk,  # arg 8
-                vllm_is_ratio_chunk=vllm_is_ratio_chunk,  # arg 9
+        fused_fwd_bwd = LigerFusedLinearPPOBase._fused_fwd_bwd
+        if compiled:
+            # TODO: Figure out what is better to compile here
+            fused_fwd_bwd = compiled_step(
+                fused_fwd_bwd,
+                (
+                    cls,
+                    static_config(
+                        _input=_input,
+                        weight=weight,
+                        bias=bias,
+                        ref_input=ref_input,
+                        ref_per_token_logps=ref_per_token_logps,
+                        old_per_token_logps=old_per_token_logps,
+                        vllm_is_ratio=vllm_is_ratio,
+                        **step_kwargs,
+                    ),
+                ),
             )
+            step_kwargs = as_graph_inputs(step_kwargs, ("epsilon_low", "epsilon_high"), _input.device)
 
         def accumulate_chunk(
             input_chunk,
@@ -164,6 +165,8 @@ class LigerFusedLinearPPOBase(torch.autograd.Function):
         ):
             (chunk_grad_input, chunk_grad_weight, *chunk_grad_bias), (chunk_loss, chunk_metrics) = fused_fwd_bwd(
                 input_chunk,
+                weight,
+                bias,
                 selected_token_ids_chunk,
                 attention_mask_chunk,
                 advantages_chunk,
@@ -171,6 +174,7 @@ class LigerFusedLinearPPOBase(torch.autograd.Function):
                 old_per_token_logps_chunk,
                 ref_input_chunk,
                 vllm_is_ratio_chunk,
+                **step_kwargs,
             )
             if bias is not None:
                 grad_bias.add_(chunk_grad_bias[0])
@@ -194,12 +198,8 @@ class LigerFusedLinearPPOBase(torch.autograd.Function):
                 else:
                     aggregated_metrics[i].append(metric)
 
-        if compiled:
-            # TODO: Figure out what is better to compile here
-            # accumulate_chunk = torch.compile(accumulate_chunk)
-            fused_fwd_bwd = torch.compile(fused_fwd_bwd)
-
         # Process input in chunks based on chunk_size
+        chunk_size = resolve_chunk_size(chunk_size, _input, weight, rows_per_item=rows_per_sequence(_input))
         chunks = max(1, _input.shape[0] // chunk_size)
         _input_chunks = torch.chunk(_input, chunks=chunks, dim=0)
         _selected_token_ids_chunks = torch.chunk(selected_token_ids, chunks=chunks, dim=0)
@@ -284,6 +284,36 @@ class LigerFusedLinearPPOBase(torch.autograd.Function):
 
         return loss_acc, tuple(final_metrics)
 
+    @staticmethod
+    def _fused_fwd_bwd(
+        input_chunk,
+        weight,
+        bias,
+        selected_token_ids_chunk,
+        attention_mask_chunk,
+        advantages_chunk,
+        ref_per_token_logps_chunk,
+        old_per_token_logps_chunk,
+        ref_input_chunk,
+        vllm_is_ratio_chunk,
+        **kwargs,
+    ):
+        """Fused forward and backward for a chunk."""
+        argnums = (0, 1, 5) if bias is not None else (0, 1)
+        return torch.func.grad_and_value(LigerFusedLinearPPOBase._compute_chunk_loss, argnums=argnums, has_aux=True)(
+            input_chunk,  # arg 0
+            weight,  # arg 1
+            selected_token_ids_chunk,  # arg 2
+            attention_mask_chunk,  # arg 3
+            advantages_chunk,  # arg 4
+            bias,  # arg 5
+            ref_per_token_logps_chunk=ref_per_token_logps_chunk,  # arg 6
+            old_per_token_logps_chunk=old_per_token_logps_chunk,  # arg 7
+            ref_input_chunk=ref_input_chunk,  # arg 8
+            vllm_is_ratio_chunk=vllm_is_ratio_chunk,  # arg 9
+            **kwargs,
+        )
+
     @staticmethod
     def _compute_dapo_normalizer(attention_mask):
         """Global active tokens averaged per process."""
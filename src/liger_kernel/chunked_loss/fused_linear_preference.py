@@ -1,10 +1,24 @@
 from abc import abstractmethod
-from functools import partial
 
 import torch
 
 from torch.nn import functional as F
 
+from liger_kernel.chunked_loss.chunk_planner import resolve_chunk_size
+from liger_kernel.chunked_loss.chunk_planner import rows_per_sequence
+from liger_kernel.chunked_loss.compiled_steps import as_graph_inputs
+from liger_kernel.chunked_loss.compiled_steps import compiled_step
+from liger_kernel.chunked_loss.compiled_steps import static_config
+
+
+def _paired_rows(x, start, end):
+    """
+    Rows [start, end) of the chosen half of `x` followed by the same rows of its rejected half. A view of `x` when
+    they span the whole batch, a copy of the chunk only otherwise.
+    """
+    pairs = x.unflatten(0, (2, x.shape[0] // 2))[:, start:end]
+    return pairs.reshape(2 * (end - start), *x.shape[1:])
+
 
 class LigerFusedLinearPreferenceBase(torch.autograd.Function):
     @abstractmethod
@@ -34,6 +48,8 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
         ref_weight=None,
         ref_bias=None,
         average_log_prob=True,
+        ref_chosen_logps=None,
+        ref_rejected_logps=None,
         **loss_kwargs,
     ):
         """
@@ -54,7 +70,8 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
             target (torch.Tensor): Target tensor. Shape: (batch_size, seq_len).
             bias (torch.Tensor, optional): Bias tensor. Shape: (vocab_size,).
             loss_fn (callable): Loss function to compute the loss on a chunk of input/target.
-            chunk_size (int): Size of a chunk (# of batches of stacked chosen and rejected inputs).
+            chunk_size (Union[int, str]): Size of a chunk (# of batches of stacked chosen and rejected inputs). "auto"
+                picks the largest chunk whose logits fit in the free device memory (see `resolve_chunk_size`).
             ignore_index (int): Index to ignore for loss computation.
             alpha (float): Weight for the NLL loss.
             beta (float): Weight for the preference loss.
@@ -65,15 +82,26 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
             ref_weight (torch.Tensor): Reference weight tensor. Shape: (vocab_size, hidden_size).
             ref_bias (torch.Tensor, optional): Reference bias tensor. Shape: (vocab_size,).
             average_log_prob (bool): Whether to average log probabilities or to sum them over the completion.
+            ref_chosen_logps (torch.Tensor, optional): Precomputed reference log probabilities of the chosen sequences
+                (e.g. loaded from a RefLogpCache), used instead of ref_input/ref_weight. Shape: (batch_size // 2,).
+            ref_rejected_logps (torch.Tensor, optional): Same for the rejected sequences. Shape: (batch_size // 2,).
             loss_kwargs (dict): Other possible arguments that a loss function might need
         """
-        # TODO: Tune CHUNK_SIZE to fully utilize the GPU
-        CHUNK_SIZE = chunk_size
+        CHUNK_SIZE = resolve_chunk_size(chunk_size, _input, weight, rows_per_item=2 * rows_per_sequence(_input))
+
+        # Precomputed reference log probs, stacked like the inputs so that a chunk takes the same rows
+        ref_logps = None
+        if ref_chosen_logps is not None or ref_rejected_logps is not None:
+            assert ref_chosen_logps is not None and ref_rejected_logps is not None, (
+                "ref_chosen_logps and ref_rejected_logps must be provided together"
+            )
+            ref_logps = torch.cat([ref_chosen_logps, ref_rejected_logps], dim=0)
+        assert not use_ref_model or ref_input is not None or ref_logps is not None, (
+            "If use_ref_model is True, ref_input or ref_chosen_logps/ref_rejected_logps must be provided"
+        )
 
         # Gradients to be accumulated
         grad_weight = torch.zeros_like(weight)
-        grad_chosen_inputs = []
-        grad_rejected_inputs = []
         grad_bias = torch.zeros_like(bias) if bias is not None else None
 
         # Loss to be accumulated
@@ -87,8 +115,9 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
         policy_nll_loss = torch.zeros((), device=_input.device)
         aggregated_aux_outputs = []  # aggregated aux outputs from all chunks
 
-        compute_loss = partial(
-            LigerFusedLinearPreferenceBase._compute_loss,
+        # Everything the step depends on is one of its arguments, so that its compiled graph is reused by the later
+        # calls (see compiled_step), with the float hyperparameters as graph inputs.
+        step_kwargs = dict(
             preference_loss_fn=cls.preference_loss_fn,
             ignore_index=ignore_index,
             alpha=alpha,
@@ -100,32 +129,25 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
             ref_bias=ref_bias,
             full_nll_target=nll_target,
             average_log_prob=average_log_prob,
-            **loss_kwargs,
+            loss_kwargs=loss_kwargs,
         )
+        fused_fwd_bwd = LigerFusedLinearPreferenceBase._fused_fwd_bwd
+        if compiled:
+            fused_fwd_bwd = compiled_step(
+                fused_fwd_bwd,
+                (
+                    cls,
+                    static_config(
+                        _input=_input, weight=weight, bias=bias, ref_input=ref_input, ref_logps=ref_logps, **step_kwargs
+                    ),
+                ),
+            )
+            # the float loss_kwargs (e.g. gamma and label_smoothing of SimPO and CPO) are only used in tensor math
+            step_kwargs = as_graph_inputs(step_kwargs, ("alpha", "beta", "loss_kwargs"), _input.device)
 
-        def fused_fwd_bwd(input_chunk, target_chunk, ref_input_chunk, chosen_nll_target_chunk):
-            """
-            Fused forward and backward pass for a chunk of input and target.
-            """
-            if bias is not None:
-                return torch.func.grad_and_value(compute_loss, argnums=(0, 1, 3), has_aux=True)(
-                    input_chunk,
-                    weight,
-                    target_chunk,
-                    bias,
-                    ref_input_chunk=ref_input_chunk,
-                    chosen_nll_target_chunk=chosen_nll_target_chunk,
-                )
-            else:
-                return torch.func.grad_and_value(compute_loss, argnums=(0, 1), has_aux=True)(
-                    input_chunk,
-                    weight,
-                    target_chunk,
-                    ref_input_chunk=ref_input_chunk,
-                    chosen_nll_target_chunk=chosen_nll_target_chunk,
-                )
-
-        def accumulate_chunk(input_chunk, target_chunk, ref_input_chunk=None, chosen_nll_target_chunk=None):
+        def accumulate_chunk(
+            input_chunk, target_chunk, ref_input_chunk=None, ref_logps_chunk=None, chosen_nll_target_chunk=None
+        ):
             if bias is not None:
                 (
                     (chunk_grad_input, chunk_grad_weight, chunk_grad_bias),
@@ -140,7 +162,16 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
                             *aux_outputs,
                         ),
                     ),
-                ) = fused_fwd_bwd(input_chunk, target_chunk, ref_input_chunk, chosen_nll_target_chunk)
+                ) = fused_fwd_bwd(
+                    input_chunk,
+                    weight,
+                    target_chunk,
+                    bias,
+                    ref_input_chunk,
+                    ref_logps_chunk,
+                    chosen_nll_target_chunk,
+                    **step_kwargs,
+                )
                 grad_bias.add_(chunk_grad_bias)  # accumulate bias gradient
             else:
                 (
@@ -156,12 +187,19 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
                             *aux_outputs,
                         ),
                     ),
-                ) = fused_fwd_bwd(input_chunk, target_chunk, ref_input_chunk, chosen_nll_target_chunk)
+                ) = fused_fwd_bwd(
+                    input_chunk,
+                    weight,
+                    target_chunk,
+                    bias,
+                    ref_input_chunk,
+                    ref_logps_chunk,
+                    chosen_nll_target_chunk,
+                    **step_kwargs,
+                )
 
             # Accumulate gradients
             grad_weight.add_(chunk_grad_weight)
-            grad_chosen_inputs.append(chunk_grad_input[: chosen_target_chunk.shape[0]])
-            grad_rejected_inputs.append(chunk_grad_input[chosen_target_chunk.shape[0] :])
 
             # Accumulate loss
             loss_acc.add_(chunk_loss)
@@ -189,58 +227,42 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
                 else:
                     aggregated_aux_outputs[i].append(aux)
 
-        if compiled:
-            fused_fwd_bwd = torch.compile(fused_fwd_bwd)
+            return chunk_grad_input
 
         len_chosen = target.shape[0] // 2
         chunks = max(1, _input.shape[0] // (2 * CHUNK_SIZE))
-        _chosen_input_chunks = torch.chunk(_input[:len_chosen], chunks=chunks, dim=0)
-        _chosen_target_chunks = torch.chunk(target[:len_chosen], chunks=chunks, dim=0)
-        _rejected_input_chunks = torch.chunk(_input[len_chosen:], chunks=chunks, dim=0)
-        _rejected_target_chunks = torch.chunk(target[len_chosen:], chunks=chunks, dim=0)
-
-        if nll_target is not None:
-            _chosen_nll_target_chunks = torch.chunk(nll_target[:len_chosen], chunks=chunks, dim=0)
-
-        if use_ref_model:
-            _ref_chosen_input_chunks = torch.chunk(ref_input[:len_chosen], chunks=chunks, dim=0)
-            _ref_rejected_input_chunks = torch.chunk(ref_input[len_chosen:], chunks=chunks, dim=0)
-
-        for (
-            chosen_input_chunk,
-            rejected_input_chunk,
-            chosen_target_chunk,
-            rejected_target_chunk,
-            ref_chosen_input_chunk,
-            ref_rejected_input_chunk,
-            chosen_nll_target_chunk,
-        ) in zip(
-            _chosen_input_chunks,
-            _rejected_input_chunks,
-            _chosen_target_chunks,
-            _rejected_target_chunks,
-            (_ref_chosen_input_chunks if use_ref_model else [None] * len(_chosen_input_chunks)),
-            (_ref_rejected_input_chunks if use_ref_model else [None] * len(_rejected_input_chunks)),
-            (_chosen_nll_target_chunks if nll_target is not None else [None] * len(_chosen_input_chunks)),
-        ):
-            input_chunk = torch.cat([chosen_input_chunk, rejected_input_chunk], dim=0)
-            ref_input_chunk = (
-                torch.cat([ref_chosen_input_chunk, ref_rejected_input_chunk], dim=0) if use_ref_model else None
-            )
-            target_chunk = torch.cat([chosen_target_chunk, rejected_target_chunk], dim=0)
+        chunk_len = max(1, -(-len_chosen // chunks))  # the chunks of torch.chunk
+
+        # A chunk holds the same rows of the chosen and the rejected halves. They are read as views of the inputs when
+        # there is a single chunk (a chunk-sized copy otherwise), and the input gradient of every chunk is written into
+        # its rows of a preallocated buffer, instead of being concatenated at the end.
+        grad_input = torch.empty_like(_input) if chunk_len < len_chosen else None
+        for start in range(0, len_chosen, chunk_len):
+            end = min(start + chunk_len, len_chosen)
+            input_chunk = _paired_rows(_input, start, end)
+            target_chunk = _paired_rows(target, start, end)
+            ref_input_chunk = _paired_rows(ref_input, start, end) if use_ref_model and ref_logps is None else None
+            ref_logps_chunk = _paired_rows(ref_logps, start, end) if use_ref_model and ref_logps is not None else None
+            chosen_nll_target_chunk = nll_target[start:end] if nll_target is not None else None
 
             # mark input_chunk, target_chunk, and target dimension 1 as dynamic to prevent torch.compile recompilation
             torch._dynamo.mark_dynamic(input_chunk, 1)
             torch._dynamo.mark_dynamic(target_chunk, 1)
             torch._dynamo.mark_dynamic(target, 1)
-            torch._dynamo.mark_dynamic(ref_input_chunk, 1) if use_ref_model else None
+            torch._dynamo.mark_dynamic(ref_input_chunk, 1) if ref_input_chunk is not None else None
             torch._dynamo.mark_dynamic(chosen_nll_target_chunk, 1) if nll_target is not None else None
 
             # accumulate loss, gradients, and metrics
-            accumulate_chunk(input_chunk, target_chunk, ref_input_chunk, chosen_nll_target_chunk)
+            chunk_grad_input = accumulate_chunk(
+                input_chunk, target_chunk, ref_input_chunk, ref_logps_chunk, chosen_nll_target_chunk
+            )
+            if grad_input is None:
+                grad_input = chunk_grad_input
+            else:
+                grad_input.unflatten(0, (2, len_chosen))[:, start:end].copy_(
+                    chunk_grad_input.unflatten(0, (2, end - start))
+                )
 
-        # combine grad_chosen_inputs and grad_rejected_inputs
-        grad_inputs = grad_chosen_inputs + grad_rejected_inputs
         policy_chosen_logps = torch.cat(policy_chosen_logps, dim=0)
         policy_rejected_logps = torch.cat(policy_rejected_logps, dim=0)
 
@@ -250,7 +272,7 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
                 aggregated_aux_outputs[i] = torch.cat(aux, dim=0)
 
         ctx.save_for_backward(
-            torch.cat(grad_inputs, dim=0),
+            grad_input,
             grad_weight,
             grad_bias,
         )
@@ -263,6 +285,34 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
         )
         return loss_acc, (*return_vars, *aggregated_aux_outputs)
 
+    @staticmethod
+    def _fused_fwd_bwd(
+        input_chunk,
+        weight,
+        target_chunk,
+        bias,
+        ref_input_chunk,
+        ref_logps_chunk,
+        chosen_nll_target_chunk,
+        loss_kwargs,
+        **kwargs,
+    ):
+        """
+        Fused forward and backward pass for a chunk of input and target.
+        """
+        argnums = (0, 1, 3) if bias is not None else (0, 1)
+        return torch.func.grad_and_value(LigerFusedLinearPreferenceBase._compute_loss, argnums=argnums, has_aux=True)(
+            input_chunk,
+            weight,
+            target_chunk,
+            bias,
+            ref_input_chunk=ref_input_chunk,
+            ref_logps_chunk=ref_logps_chunk,
+            chosen_nll_target_chunk=chosen_nll_target_chunk,
+            **kwargs,
+            **loss_kwargs,
+        )
+
     @staticmethod
     def backward(ctx, *grad_output):
         grad_input, grad_weight, grad_bias = ctx.saved_tensors
@@ -341,6 +391,7 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
         ref_input_chunk=None,
         ref_weight=None,
         ref_bias=None,
+        ref_logps_chunk=None,
         full_nll_target=None,
         chosen_nll_target_chunk=None,
         average_log_prob=True,
@@ -362,6 +413,8 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
             use_ref_model (bool): Whether to use a reference model for the alignment loss.
             ref_weight (torch.Tensor): Reference weight tensor. Shape: (vocab_size, hidden_size).
             ref_bias (torch.Tensor, optional): Reference bias tensor. Shape: (vocab_size,).
+            ref_logps_chunk (torch.Tensor, optional): Precomputed reference log probs of the chosen then the rejected
+                sequences of the chunk, used instead of ref_input_chunk. Shape: (2 * chunk_size,).
             full_nll_target (torch.Tensor, optional): Full target tensor for NLL loss. Shape: (batch_size, sequence_length).
             chosen_nll_target_chunk (torch.Tensor, optional): Target tensor for NLL loss. Shape: (chunk_size, sequence_length) If not provided the target_chunk is used.
             average_log_prob (bool): Whether to average log probabilities or the sum.
@@ -393,7 +446,11 @@ class LigerFusedLinearPreferenceBase(torch.autograd.Function):
             full_target.shape[0] // 2 * input_chunk.shape[1] * weight.shape[0]
         )
 
-        if use_ref_model:
+        if use_ref_model and ref_logps_chunk is not None:
+            ref_chosen_logps, ref_rejected_logps = ref_logps_chunk.float().chunk(2)
+            loss_kwargs["ref_chosen_logps"] = ref_chosen_logps
+            loss_kwargs["ref_rejected_logps"] = ref_rejected_logps
+        elif use_ref_model:
             with torch.no_grad():
                 (
                     ref_chosen_logps,
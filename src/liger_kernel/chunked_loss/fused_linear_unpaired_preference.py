@@ -5,6 +5,9 @@ import torch
 
 from torch.nn import functional as F
 
+from liger_kernel.chunked_loss.chunk_planner import resolve_chunk_size
+from liger_kernel.chunked_loss.chunk_planner import rows_per_sequence
+
 
 class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
     @abstractmethod
@@ -31,6 +34,7 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
         ref_weight=None,
         ref_bias=None,
         average_log_prob=False,
+        ref_logps=None,
         **loss_kwargs,
     ):
         """
@@ -51,7 +55,8 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
             target (torch.Tensor): Target tensor. Shape: (batch_size, seq_len).
             bias (torch.Tensor, optional): Bias tensor. Shape: (vocab_size,).
             loss_fn (callable): Loss function to compute the loss on a chunk of input/target.
-            chunk_size (int): Size of a chunk (# of batches of stacked chosen and rejected inputs).
+            chunk_size (Union[int, str]): Size of a chunk (# of batches of stacked chosen and rejected inputs). "auto"
+                picks the largest chunk whose logits fit in the free device memory (see `resolve_chunk_size`).
             ignore_index (int): Index to ignore for loss computation.
             beta (float): Weight for the preference loss.
             compiled (bool): Whether to use torch compile for chunk accumulation.
@@ -61,13 +66,16 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
             ref_weight (torch.Tensor): Reference weight tensor. Shape: (vocab_size, hidden_size).
             ref_bias (torch.Tensor, optional): Reference bias tensor. Shape: (vocab_size,).
             average_log_prob (bool): Whether to average the log probability per non-masked token.
+            ref_logps (torch.Tensor, optional): Precomputed reference log probabilities of the sequences (e.g. loaded
+                from a RefLogpCache), used instead of ref_input/ref_weight. Shape: (batch_size,).
             loss_kwargs (dict): Other possible arguments that a loss function might need
         """
-        # TODO: Tune CHUNK_SIZE to fully utilize the GPU
-        CHUNK_SIZE = chunk_size
+        assert not use_ref_model or ref_input is not None or ref_logps is not None, (
+            "If use_ref_model is True, ref_input or ref_logps must be provided"
+        )
+        CHUNK_SIZE = resolve_chunk_size(chunk_size, _input, weight, rows_per_item=rows_per_sequence(_input))
 
         # Gradients to be accumulated
-        grad_inputs = []
         grad_weight = torch.zeros_like(weight)
         grad_bias = torch.zeros_like(bias) if bias is not None else None
 
@@ -93,7 +101,7 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
             **loss_kwargs,
         )
 
-        def fused_fwd_bwd(input_chunk, target_chunk, preference_labels_chunk, ref_input_chunk):
+        def fused_fwd_bwd(input_chunk, target_chunk, preference_labels_chunk, ref_input_chunk, ref_logps_chunk):
             """
             Fused forward and backward pass for a chunk of input and target.
             """
@@ -105,6 +113,7 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
                 preference_labels_chunk,
                 bias,
                 ref_input_chunk=ref_input_chunk,
+                ref_logps_chunk=ref_logps_chunk,
             )
 
         def accumulate_chunk(
@@ -112,6 +121,7 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
             target_chunk,
             preference_labels_chunk=None,
             ref_input_chunk=None,
+            ref_logps_chunk=None,
         ):
             (
                 (chunk_grad_input, chunk_grad_weight, *chunk_grad_bias),
@@ -125,13 +135,12 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
                         *aux_outputs,
                     ),
                 ),
-            ) = fused_fwd_bwd(input_chunk, target_chunk, preference_labels_chunk, ref_input_chunk)
+            ) = fused_fwd_bwd(input_chunk, target_chunk, preference_labels_chunk, ref_input_chunk, ref_logps_chunk)
             if bias is not None:
                 grad_bias.add_(chunk_grad_bias[0])  # accumulate bias gradient
 
             # Accumulate gradients
             grad_weight.add_(chunk_grad_weight)
-            grad_inputs.append(chunk_grad_input)
 
             # Accumulate loss
             loss_acc.add_(chunk_loss)
@@ -153,6 +162,8 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
                 if aux.ndim == 0:
                     aggregated_aux_outputs[i].add_(aux)
 
+            return chunk_grad_input
+
         if compiled:
             fused_fwd_bwd = torch.compile(fused_fwd_bwd)
 
@@ -164,29 +175,45 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
         _target_chunks = torch.chunk(target, chunks=chunks, dim=0)
         _preference_labels_chunks = torch.chunk(preference_labels, chunks=chunks, dim=0)
 
-        if use_ref_model:
+        _ref_input_chunks = [None] * len(_input_chunks)
+        _ref_logps_chunks = [None] * len(_input_chunks)
+        if use_ref_model and ref_logps is not None:
+            _ref_logps_chunks = torch.chunk(ref_logps, chunks=chunks, dim=0)
+        elif use_ref_model:
             _ref_input_chunks = torch.chunk(ref_input, chunks=chunks, dim=0)
 
+        # the input gradient of every chunk is written into its rows, instead of being concatenated at the end
+        grad_input = torch.empty_like(_input) if len(_input_chunks) > 1 else None
+        start = 0
         for (
             input_chunk,
             target_chunk,
             ref_input_chunk,
+            ref_logps_chunk,
             preference_labels_chunk,
         ) in zip(
             _input_chunks,
             _target_chunks,
-            (_ref_input_chunks if use_ref_model else [None] * len(_input_chunks)),
+            _ref_input_chunks,
+            _ref_logps_chunks,
             _preference_labels_chunks,
         ):
             # mark input_chunk, target_chunk, and target dimension 1 (sequence length) as dynamic to prevent torch.compile recompilation
             torch._dynamo.mark_dynamic(input_chunk, 1)
             torch._dynamo.mark_dynamic(target_chunk, 1)
             torch._dynamo.mark_dynamic(target, 1)
-            torch._dynamo.mark_dynamic(ref_input_chunk, 1) if use_ref_model else None
+            torch._dynamo.mark_dynamic(ref_input_chunk, 1) if ref_input_chunk is not None else None
             torch._dynamo.mark_dynamic(preference_labels_chunk, 1)
 
             # accumulate loss, gradients, and metrics
-            accumulate_chunk(input_chunk, target_chunk, preference_labels_chunk, ref_input_chunk)
+            chunk_grad_input = accumulate_chunk(
+                input_chunk, target_chunk, preference_labels_chunk, ref_input_chunk, ref_logps_chunk
+            )
+            if grad_input is None:
+                grad_input = chunk_grad_input
+            else:
+                grad_input[start : start + input_chunk.shape[0]].copy_(chunk_grad_input)
+            start += input_chunk.shape[0]
 
         # Aggregate aux outputs lists into tensors
         for i, aux in enumerate(aggregated_aux_outputs):
@@ -194,7 +221,7 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
                 aggregated_aux_outputs[i] = torch.cat(aux, dim=0)
 
         ctx.save_for_backward(
-            torch.cat(grad_inputs, dim=0),
+            grad_input,
             grad_weight,
             grad_bias,
         )
@@ -269,6 +296,7 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
         ref_input_chunk=None,
         ref_weight=None,
         ref_bias=None,
+        ref_logps_chunk=None,
         average_log_prob=False,
         **loss_kwargs,
     ):
@@ -285,6 +313,8 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
             use_ref_model (bool): Whether to use a reference model for the alignment loss.
             ref_weight (torch.Tensor): Reference weight tensor. Shape: (vocab_size, hidden_size).
             ref_bias (torch.Tensor, optional): Reference bias tensor. Shape: (vocab_size,).
+            ref_logps_chunk (torch.Tensor, optional): Precomputed reference log probs of the chunk, used instead of
+                ref_input_chunk. Shape: (chunk_size,).
             average_log_prob (bool): Whether to average the log probability per non-masked token.
             loss_kwargs (dict): Additional arguments for the loss function.
         """
@@ -304,7 +334,9 @@ class LigerFusedLinearUnpairedPreferenceBase(torch.autograd.Function):
             average_log_prob=average_log_prob,
         )
 
-        if use_ref_model:
+        if use_ref_model and ref_logps_chunk is not None:
+            loss_kwargs["ref_log_prob_chunk"] = ref_logps_chunk.float()
+        elif use_ref_model:
             with torch.no_grad():
                 (
                     ref_log_prob_chunk,
@@ -1,4 +1,5 @@
 from typing import Optional
+from typing import Union
 
 import torch
 
@@ -275,7 +276,7 @@ class LigerFusedLinearGRPOFunction(LigerFusedLinearPPOBase):
             temperature (float): Temperature for the logits
             compiled (bool): Whether to use torch compile
             use_ref_model (bool): Whether to use a reference model
-            chunk_size (int): Size of chunks for processing.
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
             vllm_is_ratio (torch.Tensor, optional): vLLM importance sampling ratio (batch_size, seq_len) or (batch_size, 1) or None.
                 Used to correct for distribution mismatch when using vLLM for generation.
         Returns:
@@ -363,7 +364,7 @@ class LigerFusedLinearGRPOLoss(torch.nn.Module):
         beta: float = 0.04,
         compiled: bool = True,
         use_ref_model: bool = True,
-        chunk_size: int = 1,
+        chunk_size: Union[int, str] = 1,
         epsilon_low: float = 0.2,
         epsilon_high: float = 0.2,
         loss_type: str = "dapo",
@@ -380,7 +381,7 @@ class LigerFusedLinearGRPOLoss(torch.nn.Module):
             beta (float): Weight for the KL penalty.
             compiled (bool): Whether to use torch compile.
             use_ref_model (bool): Whether to use a reference model.
-            chunk_size (int): Size of chunks for processing.
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
             epsilon_low (float): Lower bound for the importance sampling ratio.
             epsilon_high (float): Upper bound for the importance sampling ratio.
             loss_type (str): Type of loss calculation ("grpo", "bnpo", "dr_grpo", "dapo", "cispo", "sapo", "luspo").
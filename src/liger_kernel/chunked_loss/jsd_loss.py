@@ -73,7 +73,7 @@ class LigerFusedLinearJSDFunction(LigerFusedLinearDistillationBase):
         ignore_index: int = -100,
         temperature: float = 1.0,
         compiled: bool = True,
-        chunk_size: int = 1024,
+        chunk_size: Union[int, str] = 1024,
         return_soft_hard_loss: bool = False,
     ):
         """
@@ -90,7 +90,7 @@ class LigerFusedLinearJSDFunction(LigerFusedLinearDistillationBase):
             ignore_index (int): Index to ignore in loss computation
             temperature (float): Temperature for softening/sharpening distributions
             compiled (bool): Whether to use torch compile
-            chunk_size (int): Size of chunks for processing.
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
             return_soft_hard_loss (bool): Whether to return soft and hard losses separately. Default: False.
         Returns:
             torch.Tensor: Computed loss, or tuple (loss, soft_loss, hard_loss) if return_soft_hard_loss=True
@@ -146,7 +146,7 @@ class LigerFusedLinearJSDLoss(torch.nn.Module):
         ignore_index: int = -100,
         temperature: float = 1.0,
         compiled: bool = True,
-        chunk_size: int = 1024,
+        chunk_size: Union[int, str] = 1024,
         return_soft_hard_loss: bool = False,
     ):
         """
@@ -157,7 +157,7 @@ class LigerFusedLinearJSDLoss(torch.nn.Module):
             temperature (float): Temperature for softening distributions
             compiled (bool): Whether to use torch compile
             beta (float): Coefficient beta of generalized JSD in the interval [0, 1]. Default: `0.5`.
-            chunk_size (int): Size of chunks for processing.
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
             return_soft_hard_loss (bool): Whether to return soft and hard losses separately. Default: False.
         """
         super().__init__()
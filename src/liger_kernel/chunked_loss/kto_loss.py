@@ -1,3 +1,5 @@
+from typing import Union
+
 import torch
 import torch.nn.functional as F
 
@@ -87,6 +89,7 @@ class LigerFusedLinearKTOFunction(LigerFusedLinearUnpairedPreferenceBase):
         use_ref_model=True,
         average_log_prob=False,
         chunk_size=1,
+        ref_logps=None,
     ):
         """
         Fused linear layer with KTO loss.
@@ -105,7 +108,9 @@ class LigerFusedLinearKTOFunction(LigerFusedLinearUnpairedPreferenceBase):
             compiled (bool): Whether to use torch compile
             use_ref_model (bool): Whether to use a reference model
             average_log_prob (bool): Whether to average the log probability per non-masked token
-            chunk_size (int): Size of chunks for processing
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
+            ref_logps (torch.Tensor, optional): Precomputed reference log probs of the sequences, used instead of
+                ref_input/ref_weight (see RefLogpCache). Shape: (batch_size,)
         Returns:
             torch.Tensor: Computed loss
         """
@@ -127,6 +132,7 @@ class LigerFusedLinearKTOFunction(LigerFusedLinearUnpairedPreferenceBase):
             average_log_prob=average_log_prob,
             kl=kl,
             chunk_size=chunk_size,
+            ref_logps=ref_logps,
         )
 
     @staticmethod
@@ -145,6 +151,7 @@ class LigerFusedLinearKTOFunction(LigerFusedLinearUnpairedPreferenceBase):
             None,
             None,
             None,
+            None,
         )
 
 
@@ -160,7 +167,7 @@ class LigerFusedLinearKTOLoss(torch.nn.Module):
         compiled: bool = True,
         use_ref_model: bool = False,
         average_log_prob: bool = False,
-        chunk_size: int = 1,
+        chunk_size: Union[int, str] = 1,
     ):
         """
         Args:
@@ -169,7 +176,7 @@ class LigerFusedLinearKTOLoss(torch.nn.Module):
             compiled (bool): Whether to use compiled operations
             use_ref_model (bool): Whether to use a reference model for the DPO loss.
             average_log_prob (bool): Whether to average the log probability per non-masked token
-            chunk_size (int): Size of chunks for processing
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
         """
         super().__init__()
         self.ignore_index = ignore_index
@@ -190,6 +197,7 @@ class LigerFusedLinearKTOLoss(torch.nn.Module):
         ref_weight=None,
         ref_bias=None,
         kl=None,
+        ref_logps=None,
     ):
         return LigerFusedLinearKTOFunction.apply(
             _input,
@@ -207,4 +215,5 @@ class LigerFusedLinearKTOLoss(torch.nn.Module):
             self.use_ref_model,
             self.average_log_prob,
             self.chunk_size,
+            ref_logps,
         )
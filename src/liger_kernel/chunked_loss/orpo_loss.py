@@ -1,3 +1,5 @@
+from typing import Union
+
 import torch
 import torch.nn.functional as F
 
@@ -69,7 +71,7 @@ class LigerFusedLinearORPOFunction(LigerFusedLinearPreferenceBase):
             compute_nll_loss (bool): Whether to compute the NLL loss
             nll_target (torch.LongTensor, optional): Target tensor for NLL loss. Shape: (batch_size * seq_len,)
             compiled (bool): Whether to use torch compile
-            chunk_size (int): Size of chunks for processing
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
         Returns:
             torch.Tensor: Computed loss
         """
@@ -105,7 +107,7 @@ class LigerFusedLinearORPOLoss(torch.nn.Module):
         beta: float = 0.1,
         compute_nll_loss: bool = True,
         compiled: bool = True,
-        chunk_size: int = 1,
+        chunk_size: Union[int, str] = 1,
     ):
         """
         Args:
@@ -113,7 +115,7 @@ class LigerFusedLinearORPOLoss(torch.nn.Module):
             beta (float): Weight for the odds ratio loss.
             compute_nll_loss (bool): Whether to compute the NLL loss.
             compiled (bool): Whether to use the torch compiled kernel.
-            chunk_size (int): Size of chunks for processing.
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
         """
         super().__init__()
         self.ignore_index = ignore_index
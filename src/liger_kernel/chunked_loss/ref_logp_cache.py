@@ -0,0 +1,186 @@
+import json
+
+from typing import Iterable
+from typing import Optional
+
+import torch
+
+from liger_kernel.chunked_loss.fused_linear_ppo import LigerFusedLinearPPOBase
+from liger_kernel.chunked_loss.fused_linear_preference import LigerFusedLinearPreferenceBase
+
+
+class RefLogpCache:
+    """
+    Reference model log probabilities computed once over a dataset and stored in a memory-mapped file, indexed by
+    sample id. The alignment losses can then read them instead of running the reference lm_head on `ref_input`,
+    and the reference model does not need to stay in device memory during training:
+
+    - per sequence (`seq_len=None`), for `ref_chosen_logps` / `ref_rejected_logps` of DPO and `ref_logps` of KTO,
+    - per token (`seq_len` the maximum completion length), for `ref_per_token_logps` of GRPO.
+
+    Example:
+        cache = RefLogpCache.create("ref_logps.bin", num_samples=len(dataset))
+        cache.precompute(
+            ((ids, ref_model(batch), labels) for ids, batch, labels in loader),
+            lambda ref_input, target: ref_sequence_logps(ref_input, ref_lm_head.weight, target),
+        )
+        ...
+        loss, _ = dpo_loss(
+            lm_head.weight, _input, target,
+            ref_chosen_logps=cache.load(chosen_ids, device), ref_rejected_logps=cache.load(rejected_ids, device),
+        )
+
+    The file has no header: the number of samples, the sequence length and the dtype are stored in `path + ".json"`.
+    """
+
+    def __init__(self, path: str):
+        """Open the cache created at `path` by `RefLogpCache.create`."""
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        self.path = path
+        self.num_samples = meta["num_samples"]
+        self.seq_len = meta["seq_len"]
+        self.dtype = getattr(torch, meta["dtype"])
+        shape = (self.num_samples,) if self.seq_len is None else (self.num_samples, self.seq_len)
+        numel = self.num_samples * (self.seq_len or 1)
+        # shared=True maps the file itself: writes go to the file and reads only touch the pages of the loaded rows
+        self._logps = torch.from_file(path, shared=True, size=numel, dtype=self.dtype).view(shape)
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        num_samples: int,
+        seq_len: Optional[int] = None,
+        dtype: torch.dtype = torch.float32,
+    ) -> "RefLogpCache":
+        """
+        Create an empty (zero-filled) cache of `num_samples` sequences at `path`, overwriting an existing one.
+
+        Args:
+            path (str): path of the memory-mapped file.
+            num_samples (int): number of samples of the dataset, i.e. 1 + the largest sample id.
+            seq_len (Optional[int]): maximum number of tokens per sample for per-token log probs, None for one log
+                prob per sequence.
+            dtype (torch.dtype): dtype of the stored log probs.
+        """
+        numel = num_samples * (seq_len or 1)
+        with open(path, "wb") as f:
+            f.truncate(numel * dtype.itemsize)
+        with open(path + ".json", "w") as f:
+            json.dump({"num_samples": num_samples, "seq_len": seq_len, "dtype": str(dtype).split(".")[-1]}, f)
+        return cls(path)
+
+    def __len__(self):
+        return self.num_samples
+
+    def write(self, sample_ids, logps: torch.Tensor):
+        """
+        Store the log probs of the samples `sample_ids`. Per-token log probs may be shorter than `seq_len`: the
+        remaining positions are zeroed.
+
+        Args:
+            sample_ids: ids of the samples, a sequence of ints or a tensor. Shape: (n,).
+            logps (torch.Tensor): log probs. Shape: (n,) per sequence, (n, t) with t <= seq_len per token.
+        """
+        sample_ids = torch.as_tensor(sample_ids, dtype=torch.long).cpu()
+        logps = logps.detach().to("cpu", self.dtype)
+        if self.seq_len is not None and logps.shape[-1] < self.seq_len:
+            logps = torch.nn.functional.pad(logps, (0, self.seq_len - logps.shape[-1]))
+        self._logps[sample_ids] = logps
+
+    def load(self, sample_ids, device=None, seq_len: Optional[int] = None) -> torch.Tensor:
+        """
+        Log probs of the samples `sample_ids` on `device`, in the order of `sample_ids`.
+
+        Args:
+            sample_ids: ids of the samples, a sequence of ints or a tensor. Shape: (n,).
+            device: device of the returned tensor. Default: cpu.
+            seq_len (Optional[int]): number of leading tokens to return for per-token log probs, e.g. the sequence
+                length of the batch. Default: `self.seq_len`.
+        Returns:
+            torch.Tensor: Shape: (n,) per sequence, (n, seq_len) per token.
+        """
+        sample_ids = torch.as_tensor(sample_ids, dtype=torch.long).cpu()
+        logps = self._logps[sample_ids]
+        if seq_len is not None:
+            assert self.seq_len is not None and seq_len <= self.seq_len, (
+                f"seq_len must be at most {self.seq_len} for a per-token cache. Got: {seq_len}"
+            )
+            logps = logps[:, :seq_len]
+        return logps.to(device) if device is not None else logps
+
+    @torch.no_grad()
+    def precompute(self, batches: Iterable, ref_logps_fn):
+        """
+        Fill the cache in one pass over a dataset.
+
+        Args:
+            batches (Iterable): tuples `(sample_ids, *inputs)`, e.g. the reference hidden states and the targets of a
+                batch of a data loader.
+            ref_logps_fn (callable): `ref_logps_fn(*inputs)` returns the log probs of the batch, e.g. with
+                `ref_sequence_logps` or `ref_per_token_logps`.
+        """
+        for sample_ids, *inputs in batches:
+            self.write(sample_ids, ref_logps_fn(*inputs))
+
+
+@torch.no_grad()
+def ref_sequence_logps(
+    ref_input,
+    ref_weight,
+    target,
+    ref_bias=None,
+    ignore_index=-100,
+    average_log_prob=False,
+    chunk_size=1,
+):
+    """
+    Per-sequence reference log probs, as computed by the preference losses (DPO, KTO) from `ref_input`.
+
+    Args:
+        ref_input (torch.Tensor): Reference model hidden states. Shape: (batch_size, seq_len, hidden_size).
+        ref_weight (torch.Tensor): Reference lm_head weight. Shape: (vocab_size, hidden_size).
+        target (torch.Tensor): Target tensor. Shape: (batch_size, seq_len).
+        ref_bias (torch.Tensor, optional): Reference lm_head bias. Shape: (vocab_size,).
+        ignore_index (int): Index of the masked target tokens.
+        average_log_prob (bool): Whether to average the log probability per non-masked token, as in the loss.
+        chunk_size (int): Number of sequences whose logits are materialized at once.
+    Returns:
+        torch.Tensor: Shape: (batch_size,).
+    """
+    logps = []
+    for input_chunk, target_chunk in zip(ref_input.split(chunk_size), target.split(chunk_size)):
+        chosen_logps, rejected_logps, *_ = LigerFusedLinearPreferenceBase.chunk_forward(
+            input_chunk,
+            ref_weight,
+            target_chunk,
+            ref_bias,
+            ignore_index=ignore_index,
+            compute_nll_loss=False,
+            average_log_prob=average_log_prob,
+        )
+        logps.extend((chosen_logps, rejected_logps))
+    return torch.cat(logps)
+
+
+@torch.no_grad()
+def ref_per_token_logps(ref_input, ref_weight, selected_token_ids, ref_bias=None, temperature=1.0, chunk_size=1):
+    """
+    Per-token reference log probs, as computed by the PPO losses (GRPO) from `ref_input`.
+
+    Args:
+        ref_input (torch.Tensor): Reference model hidden states. Shape: (batch_size, seq_len, hidden_size).
+        ref_weight (torch.Tensor): Reference lm_head weight. Shape: (vocab_size, hidden_size).
+        selected_token_ids (torch.Tensor): Generated token ids. Shape: (batch_size, seq_len).
+        ref_bias (torch.Tensor, optional): Reference lm_head bias. Shape: (vocab_size,).
+        temperature (float): Temperature of the logits, as in the loss.
+        chunk_size (int): Number of sequences whose logits are materialized at once.
+    Returns:
+        torch.Tensor: Shape: (batch_size, seq_len).
+    """
+    logps = []
+    for input_chunk, token_ids_chunk in zip(ref_input.split(chunk_size), selected_token_ids.split(chunk_size)):
+        log_probs, _ = LigerFusedLinearPPOBase.chunk_forward(input_chunk, ref_weight, ref_bias, temperature)
+        logps.append(log_probs.gather(-1, token_ids_chunk.unsqueeze(-1)).squeeze(-1))
+    return torch.cat(logps)
@@ -1,3 +1,5 @@
+from typing import Union
+
 import torch
 import torch.nn.functional as F
 
@@ -78,7 +80,7 @@ class LigerFusedLinearSimPOFunction(LigerFusedLinearPreferenceBase):
             compute_nll_loss (bool): Whether to compute the NLL loss
             compiled (bool): Whether to use torch compile
             gamma (float): Weight for the gamma parameter
-            chunk_size (int): Size of chunks for processing
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
         Returns:
             torch.Tensor: Computed loss
         """
@@ -119,7 +121,7 @@ class LigerFusedLinearSimPOLoss(torch.nn.Module):
         compute_nll_loss: bool = True,
         compiled: bool = True,
         gamma: float = 0.5,
-        chunk_size: int = 1,
+        chunk_size: Union[int, str] = 1,
     ):
         """
         Args:
@@ -130,7 +132,7 @@ class LigerFusedLinearSimPOLoss(torch.nn.Module):
             compute_nll_loss (bool): Whether to compute the NLL loss.
             compiled (bool): Whether to use the torch compiled kernel.
             gamma (float): Weight for the gamma parameter.
-            chunk_size (int): Size of chunks for processing.
+            chunk_size (Union[int, str]): Size of chunks for processing, or "auto" to fit them in the free memory.
         """
         super().__init__()
         self.ignore_index = ignore_index
@@ -43,10 +43,15 @@ from liger_kernel.ops.fused_add_rms_norm import fused_add_rms_norm_backward  # n
 from liger_kernel.ops.fused_add_rms_norm import fused_add_rms_norm_forward  # noqa: F401
 from liger_kernel.ops.fused_linear_cross_entropy import LigerFusedLinearCrossEntropyFunction  # noqa: F401
 from liger_kernel.ops.fused_linear_cross_entropy import fused_linear_cross_entropy_backward  # noqa: F401
+from liger_kernel.ops.fused_linear_cross_entropy import fused_linear_cross_entropy_deferred_backward  # noqa: F401
 from liger_kernel.ops.fused_linear_cross_entropy import fused_linear_cross_entropy_forward  # noqa: F401
+from liger_kernel.ops.fused_linear_cross_entropy import fused_linear_cross_entropy_sequence_nll  # noqa: F401
 from liger_kernel.ops.fused_linear_jsd import LigerFusedLinearJSDFunction  # noqa: F401
 from liger_kernel.ops.fused_linear_jsd import fused_linear_jsd_backward  # noqa: F401
 from liger_kernel.ops.fused_linear_jsd import fused_linear_jsd_forward  # noqa: F401
+from liger_kernel.ops.fused_linear_multi_head_cross_entropy import LigerMultiHeadFusedLinearCrossEntropyFunction  # noqa: F401
+from liger_kernel.ops.fused_linear_soft_target_cross_entropy import LigerFusedLinearSoftTargetCrossEntropyFunction  # noqa: F401
+from liger_kernel.ops.fused_linear_soft_target_cross_entropy import fused_linear_soft_target_cross_entropy_forward  # noqa: F401
 from liger_kernel.ops.fused_neighborhood_attention import LigerFusedNeighborhoodAttentionFunction  # noqa: F401
 from liger_kernel.ops.geglu import LigerGELUMulFunction  # noqa: F401
 from liger_kernel.ops.geglu import geglu_backward  # noqa: F401
@@ -54,6 +59,7 @@ from liger_kernel.ops.geglu import geglu_forward  # noqa: F401
 from liger_kernel.ops.group_norm import LigerGroupNormFunction  # noqa: F401
 from liger_kernel.ops.group_norm import group_norm_backward  # noqa: F401
 from liger_kernel.ops.group_norm import group_norm_forward  # noqa: F401
+from liger_kernel.ops.grpo_loss import FusedLinearGrpoLossFunction  # noqa: F401
 from liger_kernel.ops.grpo_loss import GrpoLossFunction  # noqa: F401
 from liger_kernel.ops.jsd import LigerJSDFunction  # noqa: F401
 from liger_kernel.ops.jsd import jsd_backward  # noqa: F401
@@ -88,6 +94,8 @@ from liger_kernel.ops.swiglu import swiglu_forward  # noqa: F401
 from liger_kernel.ops.tiled_mlp import LigerTiledMLPFunction  # noqa: F401
 from liger_kernel.ops.tiled_mlp import apply_tiled_mlp  # noqa: F401
 from liger_kernel.ops.tvd import LigerTVDLossFunction  # noqa: F401
+from liger_kernel.ops.vocab_parallel_fused_linear_cross_entropy import LigerVocabParallelFusedLinearCrossEntropyFunction  # noqa: F401
+from liger_kernel.ops.vocab_parallel_fused_linear_cross_entropy import vocab_parallel_fused_linear_cross_entropy_forward  # noqa: F401
 
 # NOTE: __all__ is intentionally NOT defined.
 # - Import from this package (liger_kernel.ops) -> subject to vendor replacement
@@ -490,6 +490,10 @@ class LigerCrossEntropyFunction(torch.autograd.Function):
         return_z_loss: bool = False,
         return_token_accuracy: bool = False,
         return_predicted_tokens: bool = False,
+        sync_free: bool = False,
+        check_target_bounds: bool = False,
+        return_topk: int = 0,
+        return_entropy: bool = False,
     ):
         """
         The forward pass of the Liger Cross Entropy loss.
@@ -507,10 +511,17 @@ class LigerCrossEntropyFunction(torch.autograd.Function):
         return_z_loss (bool): When `return_z_loss` is `True`, returns (loss, z_loss, token_accuracy, predicted_tokens) instead of (loss, None, None, None). Default: `False`
         return_token_accuracy (bool): When `return_token_accuracy` is `True`, computes and returns per-token accuracy without materializing logits. Default: `False`
         return_predicted_tokens (bool): When `return_predicted_tokens` is `True`, returns per-token predicted class indices (argmax) without materializing logits. Default: `False`
+        sync_free (bool): Not supported on Ascend NPU yet, must be `False`.
+        check_target_bounds (bool): Unused, the target bounds are always checked on Ascend NPU.
+        return_topk (int): Not supported on Ascend NPU yet, must be `0`.
+        return_entropy (bool): Not supported on Ascend NPU yet, must be `False`.
 
         Returns:
-        tuple: A tuple with the computed losses, accuracy, and predicted tokens: (loss, z_loss, token_accuracy, predicted_tokens). z_loss, token_accuracy, and predicted_tokens are None if not requested.
+        tuple: A tuple with the computed losses, accuracy, predicted tokens, top-k and entropy: (loss, z_loss, token_accuracy, predicted_tokens, topk_ids, topk_logprobs, entropy). z_loss, token_accuracy, and predicted_tokens are None if not requested, the top-k and entropy are always None.
         """
+        assert not sync_free, "sync_free is not supported on Ascend NPU yet"
+        assert not return_topk, "return_topk is not supported on Ascend NPU yet"
+        assert not return_entropy, "return_entropy is not supported on Ascend NPU yet"
         input_requires_grad = _input.requires_grad
 
         loss, z_loss, token_accuracy, predicted_tokens, _input = cross_entropy_forward(
@@ -532,10 +543,10 @@ class LigerCrossEntropyFunction(torch.autograd.Function):
         ctx.return_token_accuracy = return_token_accuracy
         ctx.return_predicted_tokens = return_predicted_tokens
 
-        return loss, z_loss, token_accuracy, predicted_tokens
+        return loss, z_loss, token_accuracy, predicted_tokens, None, None, None
 
     @staticmethod
-    def backward(ctx, grad_output, grad_output2, grad_output3, grad_output4):
+    def backward(ctx, grad_output, grad_output2, grad_output3, grad_output4, grad_output5, grad_output6, grad_output7):
         """
         The backward pass of the Liger Cross Entropy loss.
 
@@ -545,6 +556,9 @@ class LigerCrossEntropyFunction(torch.autograd.Function):
         grad_output2 (tensor): No use. Gradient for z_loss (not used as z_loss is only for logging).
         grad_output3 (tensor): No use. Gradient for token_accuracy (not used as token_accuracy is only for metrics).
         grad_output4 (tensor): No use. Gradient for predicted_tokens (not used as predicted_tokens is only for metrics).
+        grad_output5 (tensor): No use. Gradient for topk_ids (not returned).
+        grad_output6 (tensor): No use. Gradient for topk_logprobs (not returned).
+        grad_output7 (tensor): No use. Gradient for entropy (not returned).
         Returns:
         tuple: A tuple with the gradients with respect to the inputs. The elements are tensors or None.
         """
@@ -569,4 +583,8 @@ class LigerCrossEntropyFunction(torch.autograd.Function):
             None,
             None,
             None,
+            None,  # sync_free
+            None,  # check_target_bounds
+            None,  # return_topk
+            None,  # return_entropy
         )
@@ -53,6 +53,25 @@ def liger_cross_entropy_kernel(
     HAS_WEIGHT: tl.constexpr,
     HAS_SOFTCAPPING: tl.constexpr,
     HAS_GRADIENTS: tl.constexpr,
+    HAS_DEVICE_NORMALIZERS: tl.constexpr = False,
+    lse_ptr=None,
+    STORE_LSE: tl.constexpr = False,
+    LOAD_LSE: tl.constexpr = False,
+    token_weights_ptr=None,
+    token_weights_stride=0,
+    HAS_TOKEN_WEIGHTS: tl.constexpr = False,
+    TOKEN_SCALING: tl.constexpr = False,
+    topk_ids_ptr=None,
+    topk_logprobs_ptr=None,
+    topk_stride=0,
+    TOPK: tl.constexpr = 0,
+    BLOCK_K: tl.constexpr = 1,
+    entropy_ptr=None,
+    entropy_stride=0,
+    RETURN_ENTROPY: tl.constexpr = False,
+    row_offset=0,
+    seq_len=1,
+    TARGET_SHIFT: tl.constexpr = 0,
 ):
     """
     This kernel computes both cross entropy loss and the gradient of the input.
@@ -84,6 +103,29 @@ def liger_cross_entropy_kernel(
     HAS_WEIGHT (bool): The boolean value to determine whether assigning weight to each of the classes.
     HAS_SOFTCAPPING (bool): The boolean value to determine whether applying soft-capping or not.
     HAS_GRADIENTS (bool): The boolean value to determine whether calculating gradients in forward pass.
+    HAS_DEVICE_NORMALIZERS (bool): If True, n_non_ignore, sum_non_ignore_weight and weight_sum are pointers to 0-d device
+        tensors that are read inside the kernel, so the host never has to synchronize to fetch them.
+    lse_ptr: Pointer to the per-row logsumexp, with the same stride as the loss tensor. Only used if STORE_LSE or LOAD_LSE.
+    STORE_LSE (bool): If True, store the logsumexp of each non-ignored row to lse_ptr.
+    LOAD_LSE (bool): If True, load the logsumexp saved by a previous STORE_LSE launch instead of recomputing it, and only
+        compute the gradients (the loss and the metrics are not written). Used to recompute gradients in backward.
+    token_weights_ptr: Pointer to the per-row weights of the loss. Only used if HAS_TOKEN_WEIGHTS.
+    token_weights_stride (int): The stride of the token weights tensor.
+    HAS_TOKEN_WEIGHTS (bool): If True, the loss, the z loss and the gradients of each row are multiplied by its token weight.
+    TOKEN_SCALING (bool): If True, the loss, the z loss and the gradients of each row are multiplied by the (detached)
+        predicted probability of its target, exp(X_y - lse).
+    topk_ids_ptr: Pointer to the (n_rows, TOPK) tensor storing the TOPK most probable classes of each row, in decreasing order.
+    topk_logprobs_ptr: Pointer to the (n_rows, TOPK) tensor storing the log-probabilities of these classes.
+    topk_stride (int): The row stride of both top-k tensors.
+    TOPK (int): The number of most probable classes to return. No operation if 0. Ignored rows are not written.
+    BLOCK_K (int): The power of 2 >= TOPK holding the running top-k of the row.
+    entropy_ptr: Pointer to tensor to store the per-token entropy of the predicted distribution. Only used if RETURN_ENTROPY.
+    entropy_stride (int): The stride of the entropy tensor.
+    RETURN_ENTROPY (bool): If True, store the entropy of softmax(X) of each row, 0 for the ignored rows.
+    row_offset (int): The index of the first row of the launch in the sequences of seq_len rows. Only used if TARGET_SHIFT.
+    seq_len (int): The number of rows of every sequence. Only used if TARGET_SHIFT.
+    TARGET_SHIFT (int): If > 0, Y_ptr points to the unshifted labels: row r is scored against label r + TARGET_SHIFT, and
+        the last TARGET_SHIFT rows of every sequence are ignored. This saves the shifted copy of the labels.
     """
 
     # https://github.com/triton-lang/triton/issues/1058
@@ -91,8 +133,13 @@ def liger_cross_entropy_kernel(
     program_id = tl.program_id(0).to(tl.int64)
 
     # 1. Load Y_ptr first because if the target is ignore_index, we can return right away
-    Y_ptr += program_id * Y_stride
-    y = tl.load(Y_ptr)
+    if TARGET_SHIFT > 0:
+        in_seq = (program_id + row_offset) % seq_len + TARGET_SHIFT < seq_len
+        Y_ptr += tl.where(in_seq, program_id + TARGET_SHIFT, program_id) * Y_stride
+        y = tl.where(in_seq, tl.load(Y_ptr), ignore_index)
+    else:
+        Y_ptr += program_id * Y_stride
+        y = tl.load(Y_ptr)
 
     # 2. locate the start index
     X_ptr += program_id * X_stride
@@ -109,6 +156,8 @@ def liger_cross_entropy_kernel(
         if RETURN_PREDICTED_TOKENS:
             predicted_tokens_ptr += program_id * predicted_tokens_stride
             tl.store(predicted_tokens_ptr, -1)
+        if RETURN_ENTROPY:
+            tl.store(entropy_ptr + program_id * entropy_stride, 0.0)
         return
 
     loss_ptr += program_id * loss_stride
@@ -122,6 +171,11 @@ def liger_cross_entropy_kernel(
     if HAS_WEIGHT:
         weight_y = tl.load(weight_ptr + y).cast(tl.float32)
 
+    if HAS_DEVICE_NORMALIZERS:
+        n_non_ignore = tl.load(n_non_ignore).cast(tl.float32)
+        sum_non_ignore_weight = tl.load(sum_non_ignore_weight).cast(tl.float32)
+        weight_sum = tl.load(weight_sum).cast(tl.float32)
+
     # Online softmax: 2 loads + 1 store (compared with 3 loads + 1 store for the safe softmax)
     # Refer to Algorithm 3 in the paper: https://arxiv.org/pdf/1805.02867
 
@@ -129,6 +183,11 @@ def liger_cross_entropy_kernel(
     m = float("-inf")  # m is the max value. use the notation from the paper
     d = 0.0  # d is the sum. use the notation from the paper
     argmax_idx = 0  # Track the index of the maximum value for token accuracy / predicted tokens computation
+    if TOPK > 0:
+        # running top-k of the row, sorted in decreasing order, kept in registers
+        k_offsets = tl.arange(0, BLOCK_K)
+        topk_vals = tl.full([BLOCK_K], float("-inf"), dtype=tl.float32)
+        topk_idx = tl.full([BLOCK_K], -1, dtype=tl.int64)
     ori_X_y = tl.load(X_ptr + y).cast(tl.float32)  # we need to store the original value of X_y for the loss calculation
     if HAS_SOFTCAPPING:
         ori_X_y = softcap * tanh(ori_X_y / softcap)
@@ -137,46 +196,98 @@ def liger_cross_entropy_kernel(
     # See the full derivation at https://github.com/linkedin/Liger-Kernel/pull/198#issue-2503665310
     scaled_x_sum = 0.0
     eps = label_smoothing / n_cols
-
-    for i in range(0, n_cols, BLOCK_SIZE):
-        X_offsets = i + tl.arange(0, BLOCK_SIZE)
-        X_block = tl.load(
-            X_ptr + X_offsets,
-            mask=X_offsets < n_cols,
-            other=float("-inf"),
-            # Ensure float32 precision for softmax calculation
-        ).cast(tl.float32)
-        if HAS_SOFTCAPPING:
-            X_block = softcap * tanh(X_block / softcap)
-        block_max = tl.max(X_block)
-
-        # Track argmax for accuracy / predicted tokens computation
-        if RETURN_TOKEN_ACCURACY or RETURN_PREDICTED_TOKENS:
-            # Find the index of the maximum value in this block
-            is_max_mask = X_block == block_max
-            # Mask out invalid indices with a value larger than n_cols
-            masked_offsets = tl.where(is_max_mask, X_offsets, n_cols)
-            # Get the first (smallest) index where max occurs
-            current_block_argmax_idx = tl.min(masked_offsets)
-
-            is_new_max = block_max > m
-            argmax_idx = tl.where(is_new_max, current_block_argmax_idx, argmax_idx)
-
-        if label_smoothing > 0:
-            # scale X beforehand to avoid overflow
-            if HAS_WEIGHT:
-                weight_block = tl.load(weight_ptr + X_offsets, mask=X_offsets < n_cols)
-                scaled_x_sum += tl.sum(tl.where(X_offsets < n_cols, -eps * X_block * weight_block, 0.0))
-            else:
-                scaled_x_sum += tl.sum(tl.where(X_offsets < n_cols, -eps * X_block, 0.0))
-        m_new = tl.maximum(m, block_max)
-        d = d * tl.exp(m - m_new) + tl.sum(tl.exp(X_block - m_new))
-        m = m_new
-
-    # log (sum(e^(X_i))) = log (sum(e ^ (max(X) * e ^ (X_i - max(X)))))
-    #                    = log (e^(max(X)) * sum(e ^ (X_i - max(X))))
-    #                    = max(X) + log (sum(e ^ (X_i - max(X)))) = m + log d
-    lse = m + tl.log(d)
+    # sum(e ^ (X_i - m) * X_i), rescaled along with d, so that sum(softmax(X_i) * X_i) = x_exp_sum / d
+    x_exp_sum = 0.0
+
+    if LOAD_LSE:
+        # the logsumexp saved by the forward pass replaces the first pass: with m = lse and d = 1,
+        # exp(X_i - m) / d in the second pass is still softmax(X_i)
+        lse = tl.load(lse_ptr + program_id * loss_stride)
+        m = lse
+        d = 1.0
+    else:
+        for i in range(0, n_cols, BLOCK_SIZE):
+            X_offsets = i + tl.arange(0, BLOCK_SIZE)
+            X_block = tl.load(
+                X_ptr + X_offsets,
+                mask=X_offsets < n_cols,
+                other=float("-inf"),
+                # Ensure float32 precision for softmax calculation
+            ).cast(tl.float32)
+            if HAS_SOFTCAPPING:
+                X_block = softcap * tanh(X_block / softcap)
+            block_max = tl.max(X_block)
+
+            # Track argmax for accuracy / predicted tokens computation
+            if RETURN_TOKEN_ACCURACY or RETURN_PREDICTED_TOKENS:
+                # Find the index of the maximum value in this block
+                is_max_mask = X_block == block_max
+                # Mask out invalid indices with a value larger than n_cols
+                masked_offsets = tl.where(is_max_mask, X_offsets, n_cols)
+                # Get the first (smallest) index where max occurs
+                current_block_argmax_idx = tl.min(masked_offsets)
+
+                is_new_max = block_max > m
+                argmax_idx = tl.where(is_new_max, current_block_argmax_idx, argmax_idx)
+
+            if TOPK > 0:
+                # Merge the block into the running top-k, only if one of its values beats the current k-th one, which
+                # quickly becomes rare as the running top-k fills up with large values. Each step moves the largest
+                # remaining value of either side to the output; on ties the running top-k (smaller indices) wins.
+                kth_val = tl.min(tl.where(k_offsets < TOPK, topk_vals, float("inf")))
+                if block_max > kth_val:
+                    candidates = X_block
+                    running_vals = topk_vals
+                    running_ids = topk_idx
+                    for k in tl.static_range(TOPK):
+                        running_max = tl.max(running_vals)
+                        candidate_max = tl.max(candidates)
+                        running_pos = tl.min(tl.where(running_vals == running_max, k_offsets, BLOCK_K))
+                        candidate_idx = tl.min(tl.where(candidates == candidate_max, X_offsets, n_cols))
+                        take_running = running_max >= candidate_max
+                        running_idx = tl.sum(tl.where(k_offsets == running_pos, running_ids, 0))
+                        topk_vals = tl.where(k_offsets == k, tl.maximum(running_max, candidate_max), topk_vals)
+                        topk_idx = tl.where(
+                            k_offsets == k, tl.where(take_running, running_idx, candidate_idx.to(tl.int64)), topk_idx
+                        )
+                        # remove the taken value from its side (the positions BLOCK_K and n_cols match nothing)
+                        running_vals = tl.where(
+                            k_offsets == tl.where(take_running, running_pos, BLOCK_K), float("-inf"), running_vals
+                        )
+                        candidates = tl.where(
+                            X_offsets == tl.where(take_running, n_cols, candidate_idx), float("-inf"), candidates
+                        )
+
+            if label_smoothing > 0:
+                # scale X beforehand to avoid overflow
+                if HAS_WEIGHT:
+                    weight_block = tl.load(weight_ptr + X_offsets, mask=X_offsets < n_cols)
+                    scaled_x_sum += tl.sum(tl.where(X_offsets < n_cols, -eps * X_block * weight_block, 0.0))
+                else:
+                    scaled_x_sum += tl.sum(tl.where(X_offsets < n_cols, -eps * X_block, 0.0))
+            m_new = tl.maximum(m, block_max)
+            d = d * tl.exp(m - m_new) + tl.sum(tl.exp(X_block - m_new))
+            if RETURN_ENTROPY:
+                # the masked columns are -inf, where exp(X_i - m_new) * X_i would be nan
+                x_exp_sum = x_exp_sum * tl.exp(m - m_new) + tl.sum(
+                    tl.where(X_offsets < n_cols, tl.exp(X_block - m_new) * X_block, 0.0)
+                )
+            m = m_new
+
+        # log (sum(e^(X_i))) = log (sum(e ^ (max(X) * e ^ (X_i - max(X)))))
+        #                    = log (e^(max(X)) * sum(e ^ (X_i - max(X))))
+        #                    = max(X) + log (sum(e ^ (X_i - max(X)))) = m + log d
+        lse = m + tl.log(d)
+        if STORE_LSE:
+            tl.store(lse_ptr + program_id * loss_stride, lse)
+
+    # Per-row scale of the loss and its gradients. The predicted probability of the target comes for free from the
+    # online softmax statistics and is treated as a constant (detached).
+    token_scale = 1.0
+    if HAS_TOKEN_WEIGHTS:
+        token_scale = tl.load(token_weights_ptr + program_id * token_weights_stride).cast(tl.float32)
+    if TOKEN_SCALING:
+        token_scale = token_scale * tl.exp(ori_X_y - lse)
 
     # 4. [Online Softmax] Second pass: compute gradients
     # For 'mean' reduction, gradients are normalized by number of non-ignored elements (N)
@@ -243,12 +354,18 @@ def liger_cross_entropy_kernel(
             if HAS_SOFTCAPPING:
                 X_block = X_block * (1 - intermediate * intermediate)
 
+            if HAS_TOKEN_WEIGHTS or TOKEN_SCALING:
+                X_block = X_block * token_scale
+
             tl.store(X_ptr + X_offsets, X_block, mask=X_offsets < n_cols)
 
     # We need tl.debug_barrier() to ensure the new result of X_ptr is written as mentioned in
     # https://github.com/triton-lang/triton/blob/ba42a5c68fd0505f8c42f4202d53be0f8d9a5fe0/python/triton/ops/cross_entropy.py#L34
     tl.debug_barrier()
 
+    if LOAD_LSE:
+        return
+
     # 5. Calculate the loss
 
     # loss = log (softmax(X_y)) = log ((e ^ (X_y - max(X)) / sum(e ^ (X - max(X))))
@@ -286,6 +403,9 @@ def liger_cross_entropy_kernel(
             loss = loss / n_non_ignore
         # TODO: Implement weighted z_loss. Currently, z_loss is not scaled by weight.
         z_loss = z_loss / n_non_ignore
+    if HAS_TOKEN_WEIGHTS or TOKEN_SCALING:
+        loss = loss * token_scale
+        z_loss = z_loss * token_scale
     loss += z_loss
 
     tl.store(loss_ptr, loss)
@@ -297,6 +417,14 @@ def liger_cross_entropy_kernel(
         tl.store(token_accuracy_ptr, is_correct)
     if RETURN_PREDICTED_TOKENS:
         tl.store(predicted_tokens_ptr, argmax_idx)
+    if RETURN_ENTROPY:
+        # H = -sum(p_i * log(p_i)) = -sum(p_i * (X_i - lse)) = lse - sum(p_i * X_i)
+        tl.store(entropy_ptr + program_id * entropy_stride, lse - x_exp_sum / d)
+    if TOPK > 0:
+        topk_ids_ptr += program_id * topk_stride
+        topk_logprobs_ptr += program_id * topk_stride
+        tl.store(topk_ids_ptr + k_offsets, topk_idx, mask=k_offsets < TOPK)
+        tl.store(topk_logprobs_ptr + k_offsets, topk_vals - lse, mask=k_offsets < TOPK)
 
 
 # The hard limit of TRITON_MAX_TENSOR_NUMEL is 1048576 https://github.com/triton-lang/triton/blob/ba42a5c68fd0505f8c42f4202d53be0f8d9a5fe0/python/triton/language/core.py#L19
@@ -310,6 +438,63 @@ elif infer_device() == "npu":
 else:
     MAX_FUSED_SIZE = 65536 // 2
 
+# The merge of a block into the running top-k of `liger_cross_entropy_kernel` is unrolled over k
+MAX_TOPK = 20
+
+
+def compute_normalizers(target, target_mask, weight, sync_free):
+    """
+    Compute n_non_ignore, sum_non_ignore_weight and weight_sum for the mean reduction.
+
+    By default they are fetched to the host with `.item()`. With `sync_free`, they stay as 0-d device tensors to be read
+    by `liger_cross_entropy_kernel` (HAS_DEVICE_NORMALIZERS), so no device-to-host synchronization happens and the
+    forward can be captured by CUDA graphs.
+    """
+    if not sync_free:
+        n_non_ignore = target_mask.sum().item()
+        sum_non_ignore_weight = n_non_ignore
+        weight_sum = 0.0
+        if weight is not None:
+            sum_non_ignore_weight = torch.gather(weight, dim=0, index=target.masked_select(target_mask)).sum().item()
+            weight_sum = weight.sum().item()
+        return n_non_ignore, sum_non_ignore_weight, weight_sum
+
+    n_non_ignore = target_mask.sum()
+    sum_non_ignore_weight = n_non_ignore
+    weight_sum = torch.zeros((), dtype=torch.float32, device=target.device)
+    if weight is not None:
+        # masked_select has a data-dependent shape, so gather every row and zero out the ignored ones instead
+        sum_non_ignore_weight = (torch.gather(weight, dim=0, index=target.where(target_mask, 0)) * target_mask).sum()
+        weight_sum = weight.sum()
+    return n_non_ignore, sum_non_ignore_weight, weight_sum
+
+
+def allocate_topk_buffers(return_topk, n_rows, V, device):
+    """
+    (n_rows, k) ids and fp32 log-probabilities of the `return_topk` most probable classes, to be filled by
+    `liger_cross_entropy_kernel` (TOPK). Ignored rows keep the ids -1 and the log-probabilities 0. (None, None) if 0.
+    """
+    assert isinstance(return_topk, int) and 0 <= return_topk <= min(MAX_TOPK, V), (
+        f"return_topk must be an integer in [0, {min(MAX_TOPK, V)}]. Got: {return_topk}"
+    )
+    if not return_topk:
+        return None, None
+    topk_ids = torch.full((n_rows, return_topk), -1, dtype=torch.int64, device=device)
+    topk_logprobs = torch.zeros(n_rows, return_topk, dtype=torch.float32, device=device)
+    return topk_ids, topk_logprobs
+
+
+def all_reduce_normalizers_async(n_non_ignore, sum_non_ignore_weight, process_group):
+    """
+    Start summing the 0-d device normalizers returned by `compute_normalizers(..., sync_free=True)` over `process_group`,
+    in place, e.g. across context-parallel ranks that each hold a slice of the sequence. Returns the async works, which
+    must be waited on before the normalizers are read, so that the collective overlaps with the caller's next matmul.
+    """
+    works = [torch.distributed.all_reduce(n_non_ignore, group=process_group, async_op=True)]
+    if sum_non_ignore_weight is not n_non_ignore:
+        works.append(torch.distributed.all_reduce(sum_non_ignore_weight, group=process_group, async_op=True))
+    return works
+
 
 def cross_entropy_forward(
     _input,
@@ -323,6 +508,10 @@ def cross_entropy_forward(
     return_z_loss,
     return_token_accuracy=False,
     return_predicted_tokens=False,
+    sync_free=False,
+    check_target_bounds=False,
+    return_topk=0,
+    return_entropy=False,
 ):
     assert isinstance(return_z_loss, bool), f"return_z_loss must be True or False. Got: {return_z_loss}"
     assert isinstance(return_token_accuracy, bool), (
@@ -334,6 +523,7 @@ def cross_entropy_forward(
 
     BT, V = _input.shape
     n_rows = BT
+    topk_ids, topk_logprobs = allocate_topk_buffers(return_topk, n_rows, V, _input.device)
 
     BLOCK_SIZE = min(MAX_FUSED_SIZE, triton.next_power_of_2(V))
 
@@ -346,25 +536,23 @@ def cross_entropy_forward(
     predicted_tokens_1d = (
         torch.full((n_rows,), -1, dtype=torch.int64, device=_input.device) if return_predicted_tokens else None
     )
+    entropy_1d = torch.zeros(n_rows, dtype=torch.float32, device=_input.device) if return_entropy else None
 
     target_mask = target != ignore_index
-    n_non_ignore = target_mask.sum().item()
-    assert (target * target_mask).max() < _input.shape[-1], (
-        f"Target {target.max()} is out of bounds. Expected < {_input.shape[-1]}"
-    )
-    assert (target * target_mask).min() >= 0, f"Target {target.min()} is out of bounds. Expected >= 0"
-    sum_non_ignore_weight = n_non_ignore
-    weight_sum = 0.0
+    if not sync_free or check_target_bounds:
+        assert (target * target_mask).max() < _input.shape[-1], (
+            f"Target {target.max()} is out of bounds. Expected < {_input.shape[-1]}"
+        )
+        assert (target * target_mask).min() >= 0, f"Target {target.min()} is out of bounds. Expected >= 0"
     if weight is not None:
         assert weight.shape[0] == V, f"If given, weight has to be a Tensor of size V. Got: {weight.shape}"
         assert torch.is_floating_point(weight), (
             f"If given, weight has to be a Tensor of floating point dtype. Got: {weight.dtype}"
         )
-        sum_non_ignore_weight = torch.gather(weight, dim=0, index=target.masked_select(target_mask)).sum().item()
-        weight_sum = weight.sum().item()
         # ensure weight is contiguous
         if weight.stride(-1) != 1:
             weight = weight.contiguous()
+    n_non_ignore, sum_non_ignore_weight, weight_sum = compute_normalizers(target, target_mask, weight, sync_free)
 
     # ensure _input and target are contiguous in the last dimension
     if _input.stride(-1) != 1:
@@ -406,6 +594,15 @@ def cross_entropy_forward(
         HAS_WEIGHT=True if weight is not None else False,
         HAS_SOFTCAPPING=True if softcap is not None else False,
         HAS_GRADIENTS=_input.requires_grad,
+        HAS_DEVICE_NORMALIZERS=sync_free,
+        topk_ids_ptr=topk_ids,
+        topk_logprobs_ptr=topk_logprobs,
+        topk_stride=topk_ids.stride(-2) if return_topk else 0,
+        TOPK=return_topk,
+        BLOCK_K=triton.next_power_of_2(max(return_topk, 1)),
+        entropy_ptr=entropy_1d,
+        entropy_stride=entropy_1d.stride(-1) if return_entropy else 0,
+        RETURN_ENTROPY=return_entropy,
         # TODO: 32 seems to give the best performance
         # Performance is quite sensitive to num_warps
         num_warps=32 if not is_hip() else 16,
@@ -415,20 +612,23 @@ def cross_entropy_forward(
         loss = loss_1d
         z_loss = z_loss_1d if return_z_loss else None
         token_accuracy = token_accuracy_1d if return_token_accuracy else None
+        entropy = entropy_1d if return_entropy else None
     else:
         loss = torch.sum(loss_1d)
         z_loss = torch.sum(z_loss_1d) if return_z_loss else None
-        # For accuracy, we compute the mean across all non-ignored tokens
+        # For accuracy and entropy, we compute the mean across all non-ignored tokens
         token_accuracy = torch.sum(token_accuracy_1d) / n_non_ignore if return_token_accuracy else None
+        entropy = torch.sum(entropy_1d) / n_non_ignore if return_entropy else None
 
     predicted_tokens = predicted_tokens_1d if return_predicted_tokens else None
 
-    return loss, z_loss, token_accuracy, predicted_tokens, _input
+    return loss, z_loss, token_accuracy, predicted_tokens, topk_ids, topk_logprobs, entropy, _input
 
 
-def cross_entropy_backward(_input, grad_output):
+def cross_entropy_backward(_input, grad_output, sync_free=False):
     # If cross entropy is the last layer, grad_output is 1.0. Skip the mul to save time
-    if torch.equal(grad_output, torch.tensor(1.0, device=grad_output.device)):
+    # (the comparison itself synchronizes, so it is skipped in sync_free mode)
+    if not sync_free and torch.equal(grad_output, torch.tensor(1.0, device=grad_output.device)):
         pass
     # If reduction is 'none'
     elif grad_output.ndim > 0:
@@ -473,6 +673,10 @@ class LigerCrossEntropyFunction(torch.autograd.Function):
         return_z_loss: bool = False,
         return_token_accuracy: bool = False,
         return_predicted_tokens: bool = False,
+        sync_free: bool = False,
+        check_target_bounds: bool = False,
+        return_topk: int = 0,
+        return_entropy: bool = False,
     ):
         """
         The forward pass of the Liger Cross Entropy loss.
@@ -490,24 +694,36 @@ class LigerCrossEntropyFunction(torch.autograd.Function):
         return_z_loss (bool): When `return_z_loss` is `True`, returns (loss, z_loss, token_accuracy, predicted_tokens) instead of (loss, None, None, None). Default: `False`
         return_token_accuracy (bool): When `return_token_accuracy` is `True`, computes and returns per-token accuracy without materializing logits. Default: `False`
         return_predicted_tokens (bool): When `return_predicted_tokens` is `True`, returns per-token predicted class indices (argmax) without materializing logits. Default: `False`
+        sync_free (bool): When `sync_free` is `True`, the loss normalizers stay on device and no `.item()` is called, so the op can be captured by CUDA graphs. Default: `False`
+        check_target_bounds (bool): Run the host-side target bounds check even in `sync_free` mode (it synchronizes). Default: `False`
+        return_topk (int): When `return_topk` is k > 0, returns the (BT, k) ids and log-probabilities of the k most probable classes of every
+            token (at most 20), tracked during the online softmax without materializing logits. Ignored tokens get ids -1 and log-probabilities 0. Default: `0`
+        return_entropy (bool): When `return_entropy` is `True`, computes and returns the entropy of the predicted distribution of every token in the
+            online softmax pass, without materializing logits. Averaged over the non-ignored tokens like the accuracy, unless reduction="none". Default: `False`
 
         Returns:
-        tuple: A tuple with the computed losses, accuracy, and predicted tokens: (loss, z_loss, token_accuracy, predicted_tokens). z_loss, token_accuracy, and predicted_tokens are None if not requested.
+        tuple: A tuple with the computed losses, accuracy, predicted tokens, top-k and entropy: (loss, z_loss, token_accuracy, predicted_tokens, topk_ids, topk_logprobs, entropy). All but the loss are None if not requested.
         """
         input_requires_grad = _input.requires_grad
 
-        loss, z_loss, token_accuracy, predicted_tokens, _input = cross_entropy_forward(
-            _input,
-            target,
-            weight,
-            ignore_index,
-            lse_square_scale,
-            label_smoothing,
-            reduction,
-            softcap,
-            return_z_loss,
-            return_token_accuracy,
-            return_predicted_tokens,
+        loss, z_loss, token_accuracy, predicted_tokens, topk_ids, topk_logprobs, entropy, _input = (
+            cross_entropy_forward(
+                _input,
+                target,
+                weight,
+                ignore_index,
+                lse_square_scale,
+                label_smoothing,
+                reduction,
+                softcap,
+                return_z_loss,
+                return_token_accuracy,
+                return_predicted_tokens,
+                sync_free,
+                check_target_bounds,
+                return_topk,
+                return_entropy,
+            )
         )
         # TODO: investigation
         # If we don't detach the _input tensor, the memory will double
@@ -517,11 +733,15 @@ class LigerCrossEntropyFunction(torch.autograd.Function):
         ctx.return_z_loss = return_z_loss
         ctx.return_token_accuracy = return_token_accuracy
         ctx.return_predicted_tokens = return_predicted_tokens
+        ctx.return_entropy = return_entropy
+        ctx.sync_free = sync_free
+        if return_topk:
+            ctx.mark_non_differentiable(topk_ids, topk_logprobs)
 
-        return loss, z_loss, token_accuracy, predicted_tokens
+        return loss, z_loss, token_accuracy, predicted_tokens, topk_ids, topk_logprobs, entropy
 
     @staticmethod
-    def backward(ctx, grad_output, grad_output2, grad_output3, grad_output4):
+    def backward(ctx, grad_output, grad_output2, grad_output3, grad_output4, grad_output5, grad_output6, grad_output7):
         """
         The backward pass of the Liger Cross Entropy loss.
 
@@ -531,6 +751,9 @@ class LigerCrossEntropyFunction(torch.autograd.Function):
         grad_output2 (tensor): No use. Gradient for z_loss (not used as z_loss is only for logging).
         grad_output3 (tensor): No use. Gradient for token_accuracy (not used as token_accuracy is only for metrics).
         grad_output4 (tensor): No use. Gradient for predicted_tokens (not used as predicted_tokens is only for metrics).
+        grad_output5 (tensor): No use. Gradient for topk_ids (not differentiable).
+        grad_output6 (tensor): No use. Gradient for topk_logprobs (not differentiable).
+        grad_output7 (tensor): No use. Gradient for entropy (not used as entropy is only for metrics).
         Returns:
         tuple: A tuple with the gradients with respect to the inputs. The elements are tensors or None.
         """
@@ -540,9 +763,11 @@ class LigerCrossEntropyFunction(torch.autograd.Function):
             del grad_output3  # token_accuracy is only for metrics
         if ctx.return_predicted_tokens:
             del grad_output4  # predicted_tokens is only for metrics
+        if ctx.return_entropy:
+            del grad_output7  # entropy is only for metrics
 
         (_input,) = ctx.saved_tensors
-        _input = cross_entropy_backward(_input, grad_output)
+        _input = cross_entropy_backward(_input, grad_output, ctx.sync_free)
         return (
             _input,
             None,
@@ -555,4 +780,8 @@ class LigerCrossEntropyFunction(torch.autograd.Function):
             None,
             None,
             None,
+            None,  # sync_free
+            None,  # check_target_bounds
+            None,  # return_topk
+            None,  # return_entropy
         )
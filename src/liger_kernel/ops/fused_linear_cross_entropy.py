@@ -1,19 +1,384 @@
+import logging
+import math
+
 import torch
 import triton
 
+from liger_kernel.ops.cross_entropy import all_reduce_normalizers_async
+from liger_kernel.ops.cross_entropy import allocate_topk_buffers
+from liger_kernel.ops.cross_entropy import compute_normalizers
 from liger_kernel.ops.cross_entropy import liger_cross_entropy_kernel
 from liger_kernel.ops.utils import amp_custom_bwd
 from liger_kernel.ops.utils import amp_custom_fwd
 from liger_kernel.ops.utils import element_mul_kernel
 from liger_kernel.ops.utils import is_hip
+from liger_kernel.ops.utils import plan_chunk_size
 from liger_kernel.utils import infer_device
 
+logger = logging.getLogger(__name__)
+
 # The hard limit of TRITON_MAX_TENSOR_NUMEL is 1048576 https://github.com/triton-lang/triton/blob/ba42a5c68fd0505f8c42f4202d53be0f8d9a5fe0/python/triton/language/core.py#L19
 # However, setting limit as 65536 as in LayerNorm tutorial is faster because of less register spilling
 # The optimal maximum block size depends on your hardware, your kernel, and your dtype
 MAX_FUSED_SIZE = 2048 if infer_device() == "npu" else 65536 // 2
 
 
+def _scatter_kept_rows(src, kept_rows, n_rows, fill_value):
+    """Expand a per-row buffer computed on the compacted rows back to `n_rows` rows, filling the dropped ones."""
+    out = torch.full((n_rows, *src.shape[1:]), fill_value, dtype=src.dtype, device=src.device)
+    return out.index_copy_(0, kept_rows, src)
+
+
+def shift_targets(target, shift, ignore_index=-100):
+    """Targets of a head predicting the token `shift` positions ahead: (B, T) -> (B, T), padded with ignore_index."""
+    B, T = target.shape
+    assert 0 <= shift, f"target shifts must be non-negative. Got: {shift}"
+    shifted = torch.full_like(target, ignore_index)
+    if shift < T:
+        shifted[:, : T - shift] = target[:, shift:]
+    return shifted
+
+
+def sequence_mean_token_weights(target, cu_seqlens, ignore_index=-100, ce_weight=None, token_weights=None):
+    """
+    Per-row weights turning the "sum" reduction into reduction="sequence_mean" over packed sequences: the loss is
+    averaged over the non-ignored tokens of every sequence (`cu_seqlens[i]:cu_seqlens[i + 1]` rows), then over the
+    sequences having at least one of them. With `ce_weight`, a sequence is normalized by the class weights of its
+    targets, as the "mean" reduction does. Computed on device, without synchronizing.
+    """
+    assert cu_seqlens.ndim == 1 and cu_seqlens.numel() >= 2, (
+        f"cu_seqlens must be the (n_seqs + 1,) cumulative sequence lengths. Got: {tuple(cu_seqlens.shape)}"
+    )
+    target = target.reshape(-1)
+    seq_lens = (cu_seqlens[1:] - cu_seqlens[:-1]).long()
+    n_seqs = seq_lens.numel()
+    seq_ids = torch.repeat_interleave(
+        torch.arange(n_seqs, device=target.device), seq_lens.to(target.device), output_size=target.numel()
+    )
+    target_mask = target != ignore_index
+    row_counts = target_mask.float()
+    if ce_weight is not None:
+        row_counts = ce_weight[target.where(target_mask, 0)].float() * row_counts
+    seq_counts = torch.zeros(n_seqs, dtype=torch.float32, device=target.device).index_add_(0, seq_ids, row_counts)
+    n_valid_seqs = (seq_counts > 0).sum().clamp(min=1)
+    seq_weights = torch.where(seq_counts > 0, 1.0 / (seq_counts * n_valid_seqs), 0.0)
+    row_weights = seq_weights[seq_ids]
+    return row_weights if token_weights is None else token_weights.reshape(-1).float() * row_weights
+
+
+def _start_normalizers(target, target_mask, ce_weight, sync_free, process_group):
+    """
+    compute_normalizers, summed over `process_group` (context parallel) if given. The all-reduce is asynchronous:
+    the returned works must be passed to `_wait_for_normalizers` before the normalizers are used.
+    """
+    if process_group is None:
+        return compute_normalizers(target, target_mask, ce_weight, sync_free), None
+    normalizers = compute_normalizers(target, target_mask, ce_weight, sync_free=True)
+    return normalizers, all_reduce_normalizers_async(normalizers[0], normalizers[1], process_group)
+
+
+def _wait_for_normalizers(normalizers, works, sync_free):
+    for work in works:
+        work.wait()
+    if sync_free:
+        return normalizers
+    return tuple(normalizer.item() for normalizer in normalizers)
+
+
+def _cross_entropy_loss_from_stats(
+    lse,
+    x_y,
+    smooth_x_sum,
+    weight_y,
+    weight_sum,
+    target_mask,
+    V,
+    lse_square_scale,
+    label_smoothing,
+    reduction,
+    n_non_ignore,
+    sum_non_ignore_weight,
+):
+    """
+    Per-row loss and z-loss of `liger_cross_entropy_kernel` (see the derivations there), from per-row statistics of the
+    (softcapped, fp32) logits: the logsumexp `lse`, the target logit `x_y`, `smooth_x_sum` = sum(-eps * x_i (* w_i))
+    for label smoothing and the class weight `weight_y` of the target (None without ce_weight). Ignored rows get 0.
+    """
+    eps = label_smoothing / V
+    loss = lse - x_y
+    if weight_y is not None:
+        loss = weight_y * loss
+    if label_smoothing > 0:
+        if weight_y is not None:
+            smooth_loss = smooth_x_sum + eps * lse * weight_sum
+        else:
+            smooth_loss = smooth_x_sum + label_smoothing * lse
+        loss = loss * (1 - label_smoothing) + smooth_loss
+    z_loss = lse_square_scale * lse * lse
+    if reduction == "mean":
+        loss = loss / (sum_non_ignore_weight if weight_y is not None else n_non_ignore)
+        z_loss = z_loss / n_non_ignore
+    # where() rather than a product: the normalizers are 0 if all rows are ignored
+    return (loss + z_loss).where(target_mask, 0.0), z_loss.where(target_mask, 0.0)
+
+
+def _cross_entropy_grad_logits(
+    logits,
+    lse,
+    one_hot_y,
+    weight_y,
+    ce_weight,
+    weight_sum,
+    target_mask,
+    V,
+    lse_square_scale,
+    label_smoothing,
+    reduction,
+    n_non_ignore,
+    sum_non_ignore_weight,
+):
+    """
+    Gradient of the loss of `liger_cross_entropy_kernel` w.r.t. a block of columns of the (softcapped, fp32) logits,
+    given the logsumexp `lse` of the full rows. `one_hot_y` marks the targets falling in the block and `ce_weight`
+    holds the class weights of its columns. Ignored rows get 0.
+    """
+    eps = label_smoothing / V
+    softmax = torch.exp(logits - lse.unsqueeze(-1))
+    if ce_weight is None:
+        grad_logits = softmax * (1 + 2 * lse_square_scale * lse).unsqueeze(-1) - eps
+        grad_logits = grad_logits - (1 - label_smoothing) * one_hot_y
+        if reduction == "mean":
+            grad_logits = grad_logits / n_non_ignore
+    else:
+        dloss_ori = (1 - label_smoothing) * (softmax - one_hot_y) * weight_y.unsqueeze(-1)
+        dloss_smooth = eps * (-ce_weight + softmax * weight_sum)
+        dz_loss = 2 * lse_square_scale * lse.unsqueeze(-1) * softmax
+        if reduction == "mean":
+            dloss_ori = dloss_ori / sum_non_ignore_weight
+            dloss_smooth = dloss_smooth / sum_non_ignore_weight
+            dz_loss = dz_loss / n_non_ignore
+        grad_logits = dloss_ori + dloss_smooth + dz_loss
+    return grad_logits.where(target_mask.unsqueeze(-1), 0.0)
+
+
+def _target_logits(_input_chunk, weight, bias, safe_target, softcap):
+    """fp32 (softcapped) logit of the target of every row, computed from the weight rows of the targets only."""
+    logits = (_input_chunk.float() * weight[safe_target].float()).sum(dim=-1)
+    if bias is not None:
+        logits = logits + bias[safe_target].float()
+    if softcap is not None:
+        logits = softcap * torch.tanh(logits / softcap)
+    return logits
+
+
+def _vocab_tile_logits(_input_chunk, weight, bias, start, end, softcap):
+    """fp32 (softcapped) logits of the columns [start, end), and tanh(logits / softcap) for the softcap gradient."""
+    logits = _input_chunk @ weight[start:end].t()
+    if bias is not None:
+        logits = logits + bias[start:end]
+    logits = logits.float()
+    intermediate = None
+    if softcap is not None:
+        intermediate = torch.tanh(logits / softcap)
+        logits = softcap * intermediate
+    return logits, intermediate
+
+
+def _vocab_tiled_row_stats(
+    _input_chunk,
+    weight,
+    bias,
+    target_chunk,
+    target_mask,
+    ce_weight,
+    label_smoothing,
+    softcap,
+    vocab_tile_size,
+    topk=0,
+    return_entropy=False,
+):
+    """
+    First pass of the vocab-tiled path: online softmax over tiles of `vocab_tile_size` columns. Returns the logsumexp,
+    the target logit, the label smoothing sum, the argmax of every row, its `topk` largest logits and their ids
+    (None if 0) and its entropy (None unless `return_entropy`), only ever materializing a
+    (chunk_size, vocab_tile_size) block of logits.
+    """
+    n_rows = _input_chunk.shape[0]
+    V = weight.shape[0]
+    eps = label_smoothing / V
+    device = _input_chunk.device
+    m = torch.full((n_rows,), float("-inf"), dtype=torch.float32, device=device)
+    d = torch.zeros(n_rows, dtype=torch.float32, device=device)
+    x_y = torch.zeros(n_rows, dtype=torch.float32, device=device)
+    smooth_x_sum = torch.zeros(n_rows, dtype=torch.float32, device=device)
+    argmax = torch.zeros(n_rows, dtype=torch.int64, device=device)
+    topk_vals = torch.empty(n_rows, 0, dtype=torch.float32, device=device) if topk else None
+    topk_ids = torch.empty(n_rows, 0, dtype=torch.int64, device=device) if topk else None
+    # sum(exp(logits - m) * logits), rescaled along with d
+    x_exp_sum = torch.zeros(n_rows, dtype=torch.float32, device=device) if return_entropy else None
+    for start in range(0, V, vocab_tile_size):
+        end = min(start + vocab_tile_size, V)
+        logits, _ = _vocab_tile_logits(_input_chunk, weight, bias, start, end, softcap)
+
+        if topk:
+            # merge the tile's top-k into the running one
+            tile_vals, tile_ids = logits.topk(min(topk, end - start), dim=-1)
+            topk_vals, merged_pos = torch.cat([topk_vals, tile_vals], dim=-1).topk(
+                min(topk, topk_vals.shape[-1] + tile_vals.shape[-1]), dim=-1
+            )
+            topk_ids = torch.cat([topk_ids, tile_ids + start], dim=-1).gather(-1, merged_pos)
+
+        tile_max, tile_argmax = logits.max(dim=-1)
+        # strict comparison: the first index of the max wins, as in the kernel
+        argmax = torch.where(tile_max > m, tile_argmax + start, argmax)
+        m_new = torch.maximum(m, tile_max)
+        exp_logits = torch.exp(logits - m_new.unsqueeze(-1))
+        d = d * torch.exp(m - m_new) + exp_logits.sum(dim=-1)
+        if return_entropy:
+            x_exp_sum = x_exp_sum * torch.exp(m - m_new) + (exp_logits * logits).sum(dim=-1)
+        m = m_new
+
+        in_tile = target_mask & (target_chunk >= start) & (target_chunk < end)
+        local_target = (target_chunk - start).where(in_tile, 0).unsqueeze(-1)
+        x_y = x_y + logits.gather(-1, local_target).squeeze(-1) * in_tile
+        if label_smoothing > 0:
+            if ce_weight is not None:
+                smooth_x_sum = smooth_x_sum - eps * (logits * ce_weight[start:end]).sum(dim=-1)
+            else:
+                smooth_x_sum = smooth_x_sum - eps * logits.sum(dim=-1)
+    lse = m + torch.log(d)
+    entropy = lse - x_exp_sum / d if return_entropy else None
+    return lse, x_y, smooth_x_sum, argmax, topk_vals, topk_ids, entropy
+
+
+def _vocab_tiled_grads(
+    _input_chunk,
+    weight,
+    bias,
+    target_chunk,
+    target_mask,
+    ce_weight,
+    weight_y,
+    weight_sum,
+    lse,
+    row_scale,
+    grad_weight,
+    grad_bias,
+    compute_grad_input,
+    lse_square_scale,
+    label_smoothing,
+    reduction,
+    softcap,
+    n_non_ignore,
+    sum_non_ignore_weight,
+    vocab_tile_size,
+):
+    """
+    Second pass of the vocab-tiled path: recompute each tile of logits, turn it into gradients with the logsumexp of the
+    first pass, scale the rows by `row_scale` (None, a scalar or one value per row) and accumulate the tile's share of
+    the input gradient (returned) and of `grad_weight` / `grad_bias` (in place).
+    """
+    V = weight.shape[0]
+    grad_input_chunk = torch.zeros_like(_input_chunk) if compute_grad_input else None
+    for start in range(0, V, vocab_tile_size):
+        end = min(start + vocab_tile_size, V)
+        logits, intermediate = _vocab_tile_logits(_input_chunk, weight, bias, start, end, softcap)
+        in_tile = target_mask & (target_chunk >= start) & (target_chunk < end)
+        local_target = (target_chunk - start).where(in_tile, 0).unsqueeze(-1)
+        one_hot_y = torch.zeros_like(logits).scatter_(-1, local_target, in_tile.unsqueeze(-1).float())
+        grad_logits = _cross_entropy_grad_logits(
+            logits,
+            lse,
+            one_hot_y,
+            weight_y,
+            ce_weight[start:end] if ce_weight is not None else None,
+            weight_sum,
+            target_mask,
+            V,
+            lse_square_scale,
+            label_smoothing,
+            reduction,
+            n_non_ignore,
+            sum_non_ignore_weight,
+        )
+        if softcap is not None:
+            grad_logits = grad_logits * (1 - intermediate * intermediate)
+        if row_scale is not None:
+            grad_logits = grad_logits * (row_scale.unsqueeze(-1) if row_scale.ndim > 0 else row_scale)
+        grad_logits = grad_logits.to(_input_chunk.dtype)
+
+        if grad_input_chunk is not None:
+            grad_input_chunk += grad_logits @ weight[start:end]
+        if grad_weight is not None:
+            grad_weight[start:end] += torch.mm(grad_logits.t(), _input_chunk)
+        if grad_bias is not None:
+            grad_bias[start:end] += grad_logits.sum(dim=0)
+    return grad_input_chunk
+
+
+def _sample_classes(sampler, num_sampled, V, sampling_probs, device):
+    """Draw the `num_sampled` negative classes (with replacement) shared by a chunk of the sampled softmax."""
+    if sampler == "uniform":
+        return torch.randint(0, V, (num_sampled,), device=device)
+    if sampler == "log_uniform":
+        # Zipfian P(k) = log((k + 2) / (k + 1)) / log(V + 1), sampled by inverting its CDF
+        u = torch.rand(num_sampled, dtype=torch.float64, device=device)
+        return (torch.exp(u * math.log(V + 1)).floor().long() - 1).clamp_(0, V - 1)
+    return torch.multinomial(sampling_probs, num_sampled, replacement=True)
+
+
+def _log_expected_count(sampler, class_ids, num_sampled, V, sampling_probs):
+    """log(num_sampled * P(class)) of the sampler, subtracted from the logits of the sampled softmax (logQ correction)."""
+    if sampler == "uniform":
+        log_q = torch.full(class_ids.shape, -math.log(V), dtype=torch.float32, device=class_ids.device)
+    elif sampler == "log_uniform":
+        k = class_ids.double()
+        log_q = torch.log(torch.log((k + 2) / (k + 1)) / math.log(V + 1)).float()
+    else:
+        log_q = torch.log(sampling_probs[class_ids])
+    return log_q + math.log(num_sampled)
+
+
+def _sampled_softmax_logits(
+    _input_chunk, weight, bias, target_chunk, target_mask, sampled_ids, sampled_log_count, sampler, sampling_probs
+):
+    """
+    fp32 (chunk_size, 1 + num_sampled) logits of the sampled softmax: the target class in column 0, then the shared
+    negatives, minus their log expected counts. Negatives equal to the target of a row (accidental hits) are masked out.
+    Only the weight rows of the targets and of the negatives are read.
+    """
+    V = weight.shape[0]
+    safe_target = target_chunk.where(target_mask, 0)
+    target_logits = _target_logits(_input_chunk, weight, bias, safe_target, None)
+    sampled_logits = (_input_chunk @ weight[sampled_ids].t()).float()
+    if bias is not None:
+        sampled_logits = sampled_logits + bias[sampled_ids].float()
+    target_logits = target_logits - _log_expected_count(sampler, safe_target, sampled_ids.shape[0], V, sampling_probs)
+    target_logits = target_logits.unsqueeze(-1)
+    sampled_logits = (sampled_logits - sampled_log_count).masked_fill_(
+        sampled_ids == safe_target.unsqueeze(-1), float("-inf")
+    )
+    return torch.cat([target_logits, sampled_logits], dim=-1).contiguous()
+
+
+def _sampled_softmax_grads(
+    grad_logits, _input_chunk, weight, target_chunk, target_mask, sampled_ids, grad_weight, grad_bias
+):
+    """Scatter the gradients of the sampled softmax logits back to the input, the weight and the bias."""
+    safe_target = target_chunk.where(target_mask, 0)
+    grad_logits = grad_logits.to(_input_chunk.dtype)
+    grad_target, grad_sampled = grad_logits[:, :1], grad_logits[:, 1:]
+    grad_input_chunk = grad_target * weight[safe_target] + grad_sampled @ weight[sampled_ids]
+    # the gradients of the ignored rows are 0, so their placeholder target 0 gets nothing
+    if grad_weight is not None:
+        grad_weight.index_add_(0, safe_target, (grad_target * _input_chunk).to(grad_weight.dtype))
+        grad_weight.index_add_(0, sampled_ids, torch.mm(grad_sampled.t(), _input_chunk).to(grad_weight.dtype))
+    if grad_bias is not None:
+        grad_bias.index_add_(0, safe_target, grad_target.squeeze(-1).to(grad_bias.dtype))
+        grad_bias.index_add_(0, sampled_ids, grad_sampled.sum(dim=0).to(grad_bias.dtype))
+    return grad_input_chunk
+
+
 def fused_linear_cross_entropy_forward(
     _input,
     weight,
@@ -30,6 +395,22 @@ def fused_linear_cross_entropy_forward(
     use_token_scaling=False,
     return_token_accuracy=False,
     return_predicted_tokens=False,
+    compact_ignored_tokens=False,
+    sync_free=False,
+    check_target_bounds=False,
+    max_chunk_bytes=None,
+    grad_mode="eager",
+    lse_out=None,
+    process_group=None,
+    vocab_tile_size=None,
+    num_sampled=None,
+    sampler="log_uniform",
+    sampling_probs=None,
+    token_weights=None,
+    return_topk=0,
+    return_entropy=False,
+    shift=0,
+    grad_weight_dtype=None,
 ):
     assert isinstance(return_z_loss, bool), f"return_z_loss must be True or False. Got: {return_z_loss}"
     assert isinstance(return_token_accuracy, bool), (
@@ -38,26 +419,84 @@ def fused_linear_cross_entropy_forward(
     assert isinstance(return_predicted_tokens, bool), (
         f"return_predicted_tokens must be True or False. Got: {return_predicted_tokens}"
     )
+    assert grad_mode in {"eager", "deferred"}, f"grad_mode must be 'eager' or 'deferred'. Got: {grad_mode}"
+    if num_sampled is not None:
+        assert sampler in {"uniform", "unigram", "log_uniform"}, (
+            f"sampler must be 'uniform', 'unigram' or 'log_uniform'. Got: {sampler}"
+        )
+        assert ce_weight is None and label_smoothing == 0.0 and softcap is None and not use_token_scaling, (
+            "sampled softmax does not support ce_weight, label_smoothing, softcap and use_token_scaling"
+        )
+        assert grad_mode == "eager" and vocab_tile_size is None, (
+            "sampled softmax does not support grad_mode='deferred' and vocab_tile_size"
+        )
+        assert not return_topk and not return_entropy, "sampled softmax does not support return_topk and return_entropy"
+        if sampler == "unigram":
+            assert sampling_probs is not None and sampling_probs.shape == (weight.shape[0],), (
+                "sampler='unigram' requires sampling_probs of size V"
+            )
+            sampling_probs = sampling_probs.float() / sampling_probs.sum()
     device = _input.device
 
-    input_requires_grad = _input.requires_grad
+    # With grad_mode="deferred", the gradients are recomputed in backward from the logsumexp written to `lse_out`
+    # (see fused_linear_cross_entropy_deferred_backward), so none of the gradient buffers are allocated here.
+    input_requires_grad = _input.requires_grad and grad_mode == "eager"
+
+    # Rows whose target is ignore_index produce zero loss and zero gradients, yet still pay for their share of
+    # the lm_head matmul and the kernel launch. When `compact_ignored_tokens` is set, we gather the non-ignored
+    # rows once, run the chunk loop on them only, and scatter the per-row results back to their positions.
+    # With `shift`, `target` holds the unshifted (..., T) labels and the kernel scores row r against label r + shift of
+    # its sequence, instead of a shifted copy of the labels. The paths indexing the targets on the host use the copy.
+    seq_len = target.shape[-1] if shift else 1
+    if shift:
+        target = target.reshape(-1, seq_len)
+        if compact_ignored_tokens or vocab_tile_size is not None or num_sampled is not None or ce_weight is not None:
+            target = shift_targets(target, shift, ignore_index)
+            shift = 0
+        target = target.reshape(-1)
+        token_weights = token_weights.reshape(-1) if token_weights is not None else None
+
+    # Without gradients (evaluation, or under torch.no_grad()), no gradient buffer is allocated at all.
+    grad_input = torch.zeros_like(_input, device=device) if input_requires_grad else None
+    kept_rows = None
+    n_total_rows = _input.shape[0]
+    if compact_ignored_tokens:
+        kept_rows = torch.nonzero(target != ignore_index, as_tuple=True)[0]
+        _input = _input.index_select(0, kept_rows)
+        target = target.index_select(0, kept_rows)
+        if token_weights is not None:
+            token_weights = token_weights.index_select(0, kept_rows)
 
     # inputs have shape: BT x H
     # materialized activations will have shape: BT x V
     # the increase in memory = BT x V
-    # reduction can be achieved by partitioning the number of tokens BT into smaller chunks.
-    # for ex: if we were to achieve the same memory consumption as BT x H, then the chunk size should be:
-    # inc_factor = (V+H-1)//H, chunk_size = (BT + inc_factor - 1)//inc_factor
-    # for ex: BT = 4096*4, V = 32000, H = 4096 ==> inc_factor = 8, chunk_size = 2048
+    # reduction can be achieved by partitioning the number of tokens BT into smaller chunks,
+    # see plan_chunk_size for how the chunk size is derived from the memory budget.
     BT, H = _input.shape
     V = weight.shape[0]
-    BLOCK_SIZE = min(MAX_FUSED_SIZE, triton.next_power_of_2(V))
-
-    inc_factor = triton.cdiv(V, H)  # (V + H - 1) // H
-    chunk_size = triton.next_power_of_2(triton.cdiv(BT, inc_factor))  # (BT + inc_factor - 1) // inc_factor
-    num_chunks = triton.cdiv(BT, chunk_size)  # (BT + chunk_size - 1) // chunk_size
+    # with sampled softmax, the logits of a row are its target and the `num_sampled` negatives
+    n_cols = V if num_sampled is None else 1 + num_sampled
+    BLOCK_SIZE = min(MAX_FUSED_SIZE, triton.next_power_of_2(n_cols))
 
-    grad_input = torch.zeros_like(_input, device=device)
+    # logits chunk (+ the copy made by adding the bias) (+ clone, softmax and rescaled gradient for token scaling)
+    plan = plan_chunk_size(
+        BT,
+        H,
+        V,
+        _input.dtype,
+        max_chunk_bytes=max_chunk_bytes,
+        n_logits=1 + (bias is not None) if vocab_tile_size is None else 2,
+        # vocab tiles: fp32 logits, softmax, one-hot target and gradient
+        n_fp32_logits=0 if vocab_tile_size is None else 4,
+        accum_dtype=accum_dtype,
+        has_grad_weight=input_requires_grad and weight.requires_grad,
+        device=device,
+        n_cols=vocab_tile_size or n_cols,
+        has_grad_input=input_requires_grad,
+    )
+    logger.debug("fused_linear_cross_entropy_forward chunk plan: %s", plan)
+    chunk_size = plan.chunk_size
+    num_chunks = plan.num_chunks
 
     # we use fp32 for loss and gradients accumulator
     if input_requires_grad:
@@ -75,78 +514,173 @@ def fused_linear_cross_entropy_forward(
     z_loss_1d = torch.zeros(BT, dtype=_input.dtype, device=_input.device) if return_z_loss else None
     token_accuracy_1d = torch.zeros(BT, dtype=torch.float32, device=device) if return_token_accuracy else None
     predicted_tokens_1d = torch.full((BT,), -1, dtype=torch.int64, device=device) if return_predicted_tokens else None
+    topk_ids, topk_logprobs = allocate_topk_buffers(return_topk, BT, V, device)
+    entropy_1d = torch.zeros(BT, dtype=torch.float32, device=device) if return_entropy else None
+    lse_1d = lse_out if kept_rows is None or lse_out is None else torch.zeros(BT, dtype=torch.float32, device=device)
 
-    # TODO: evaluate how CUDA synchronization caused by .item() affects the speed
+    # The .item() calls in compute_normalizers synchronize with the device on every step; with `sync_free` the
+    # normalizers stay on device and are read by the kernel instead.
     target_mask = target != ignore_index
-    total_n_non_ignore = target_mask.sum().item()
-    total_sum_non_ignore_ce_weight = total_n_non_ignore
-    ce_weight_sum = 0.0
+    if check_target_bounds:
+        assert (target * target_mask).max() < V, f"Target {target.max()} is out of bounds. Expected < {V}"
+        assert (target * target_mask).min() >= 0, f"Target {target.min()} is out of bounds. Expected >= 0"
+    if shift:
+        # the mask of the labels the rows are scored against
+        target_mask = torch.nn.functional.pad(target_mask.view(-1, seq_len)[:, shift:], (0, shift)).view(-1)
     if ce_weight is not None:
         assert ce_weight.shape[0] == V, f"If given, weight has to be a Tensor of size V. Got: {ce_weight.shape}"
         assert torch.is_floating_point(ce_weight), (
             f"If given, weight has to be a Tensor of floating point dtype. Got: {ce_weight.dtype}"
         )
-        total_sum_non_ignore_ce_weight = (
-            torch.gather(ce_weight, dim=0, index=target.masked_select(target_mask)).sum().item()
-        )
-        ce_weight_sum = ce_weight.sum().item()
         if ce_weight.stride(-1) != 1:
             ce_weight = ce_weight.contiguous()
+    # With a context-parallel `process_group`, the counts are summed over all ranks so that the mean is taken over all
+    # their tokens; the all-reduce is only waited on before the first kernel launch, overlapping the first matmul.
+    normalizers, normalizers_works = _start_normalizers(target, target_mask, ce_weight, sync_free, process_group)
+    total_n_non_ignore, total_sum_non_ignore_ce_weight, ce_weight_sum = normalizers
 
     for chunk_id in range(num_chunks):
         start_idx = chunk_id * chunk_size
         end_idx = min((chunk_id + 1) * chunk_size, BT)
         _input_chunk = _input[start_idx:end_idx]  # chunk_size x H
 
-        # when doing matmul, use the original precision
-        logits_chunk = _input_chunk @ weight.t()  # chunk_size x V
-        if bias is not None:
-            logits_chunk = logits_chunk + bias
+        if vocab_tile_size is not None:
+            # two passes over tiles of the vocab: online softmax statistics, then the gradients tile by tile
+            target_chunk = target[start_idx:end_idx]
+            target_mask_chunk = target_mask[start_idx:end_idx]
+            lse_chunk, x_y, smooth_x_sum, argmax, topk_vals, topk_ids_chunk, entropy_chunk = _vocab_tiled_row_stats(
+                _input_chunk,
+                weight,
+                bias,
+                target_chunk,
+                target_mask_chunk,
+                ce_weight,
+                label_smoothing,
+                softcap,
+                vocab_tile_size,
+                return_topk,
+                return_entropy,
+            )
+            if normalizers_works is not None:
+                normalizers = _wait_for_normalizers(normalizers, normalizers_works, sync_free)
+                total_n_non_ignore, total_sum_non_ignore_ce_weight, ce_weight_sum = normalizers
+                normalizers_works = None
+            weight_y = ce_weight[target_chunk.where(target_mask_chunk, 0)].float() if ce_weight is not None else None
+            loss_chunk, z_loss_chunk = _cross_entropy_loss_from_stats(
+                lse_chunk,
+                x_y,
+                smooth_x_sum,
+                weight_y,
+                ce_weight_sum,
+                target_mask_chunk,
+                V,
+                lse_square_scale,
+                label_smoothing,
+                reduction,
+                total_n_non_ignore,
+                total_sum_non_ignore_ce_weight,
+            )
+            row_scale = None
+            if use_token_scaling:
+                row_scale = torch.exp(x_y - lse_chunk).where(target_mask_chunk, 0.0)
+            if token_weights is not None:
+                token_weights_chunk = token_weights[start_idx:end_idx].float()
+                row_scale = token_weights_chunk if row_scale is None else row_scale * token_weights_chunk
+            if row_scale is not None:
+                loss_chunk = loss_chunk * row_scale
+                z_loss_chunk = z_loss_chunk * row_scale
 
-        target_chunk = target[start_idx:end_idx]  # chunk_size,
+            loss_1d[start_idx:end_idx] = loss_chunk
+            if return_z_loss:
+                z_loss_1d[start_idx:end_idx] = z_loss_chunk
+            if return_token_accuracy:
+                token_accuracy_1d[start_idx:end_idx] = ((argmax == target_chunk) & target_mask_chunk).float()
+            if return_predicted_tokens:
+                predicted_tokens_1d[start_idx:end_idx] = argmax.where(target_mask_chunk, -1)
+            if return_entropy:
+                entropy_1d[start_idx:end_idx] = entropy_chunk.where(target_mask_chunk, 0.0)
+            if return_topk:
+                topk_ids[start_idx:end_idx] = topk_ids_chunk.where(target_mask_chunk.unsqueeze(-1), -1)
+                topk_logprobs[start_idx:end_idx] = (topk_vals - lse_chunk.unsqueeze(-1)).where(
+                    target_mask_chunk.unsqueeze(-1), 0.0
+                )
+            if lse_1d is not None:
+                lse_1d[start_idx:end_idx] = lse_chunk.where(target_mask_chunk, 0.0)
 
-        n_rows = logits_chunk.shape[0]
+            if input_requires_grad:
+                grad_input_chunk = _vocab_tiled_grads(
+                    _input_chunk,
+                    weight,
+                    bias,
+                    target_chunk,
+                    target_mask_chunk,
+                    ce_weight,
+                    weight_y,
+                    ce_weight_sum,
+                    lse_chunk,
+                    row_scale,
+                    grad_weight,
+                    grad_bias,
+                    True,
+                    lse_square_scale,
+                    label_smoothing,
+                    reduction,
+                    softcap,
+                    total_n_non_ignore,
+                    total_sum_non_ignore_ce_weight,
+                    vocab_tile_size,
+                )
+                if kept_rows is None:
+                    grad_input[start_idx:end_idx] = grad_input_chunk
+                else:
+                    grad_input.index_copy_(0, kept_rows[start_idx:end_idx], grad_input_chunk)
+            continue
 
-        # Compute predicted probabilities for token scaling if needed
-        if use_token_scaling:
-            # Compute softmax probabilities for scaling
-            # We need to compute this before the cross entropy kernel modifies logits_chunk
-            logits_for_softmax = logits_chunk.detach().clone()  # Detach to avoid gradient flow
-            if softcap is not None:
-                logits_for_softmax = softcap * torch.tanh(logits_for_softmax / softcap)
-
-            # Compute softmax to get predicted probabilities
-            probs = torch.softmax(logits_for_softmax, dim=-1)
-
-            # Get predicted probabilities for token scaling, handling ignored targets
-            valid_target_mask = target_chunk != ignore_index
-            valid_targets = target_chunk[valid_target_mask]
-
-            if len(valid_targets) > 0:
-                # Gather probabilities only for valid targets
-                valid_probs = probs[valid_target_mask]
-                pred_probs_valid = torch.gather(valid_probs, -1, valid_targets.unsqueeze(-1)).squeeze(-1)
-
-                # Create full tensor with zeros for ignored targets
-                pred_probs = torch.zeros_like(target_chunk, dtype=probs.dtype, device=probs.device)
-                pred_probs[valid_target_mask] = pred_probs_valid
-            else:
-                # All targets are ignored
-                pred_probs = torch.zeros_like(target_chunk, dtype=probs.dtype, device=probs.device)
+        # with shift, the kernel reads up to `shift` labels past the end of the chunk
+        target_chunk = target[start_idx:end_idx] if not shift else target[start_idx:]  # chunk_size,
+        if num_sampled is None:
+            # when doing matmul, use the original precision
+            logits_chunk = _input_chunk @ weight.t()  # chunk_size x V
+            if bias is not None:
+                logits_chunk = logits_chunk + bias
+        else:
+            # the target of every row is column 0 of its sampled logits
+            sampled_ids = _sample_classes(sampler, num_sampled, V, sampling_probs, device)
+            sampled_log_count = _log_expected_count(sampler, sampled_ids, num_sampled, V, sampling_probs)
+            target_mask_chunk = target_mask[start_idx:end_idx]
+            logits_chunk = _sampled_softmax_logits(
+                _input_chunk,
+                weight,
+                bias,
+                target_chunk,
+                target_mask_chunk,
+                sampled_ids,
+                sampled_log_count,
+                sampler,
+                sampling_probs,
+            )  # chunk_size x (1 + num_sampled)
+            original_target_chunk = target_chunk
+            target_chunk = torch.zeros_like(target_chunk).where(target_mask_chunk, ignore_index)
 
-            # Store the scaling factors
-            scaling_factors = pred_probs.detach()  # Detach to ensure no gradient flow
+        n_rows = logits_chunk.shape[0]
 
         # unreduced loss
         loss_1d_slice = loss_1d[start_idx:end_idx]  # chunk_size,
         z_loss_1d_slice = z_loss_1d[start_idx:end_idx] if return_z_loss else None
         token_accuracy_1d_slice = token_accuracy_1d[start_idx:end_idx] if return_token_accuracy else None
         predicted_tokens_1d_slice = predicted_tokens_1d[start_idx:end_idx] if return_predicted_tokens else None
+        lse_1d_slice = lse_1d[start_idx:end_idx] if lse_1d is not None else None
+        token_weights_slice = token_weights[start_idx:end_idx] if token_weights is not None else None
 
         # ensure _input and target are contiguous
         logits_chunk = logits_chunk.contiguous()
         target_chunk = target_chunk.contiguous()
 
+        if normalizers_works is not None:
+            normalizers = _wait_for_normalizers(normalizers, normalizers_works, sync_free)
+            total_n_non_ignore, total_sum_non_ignore_ce_weight, ce_weight_sum = normalizers
+            normalizers_works = None
+
         # Here we calculate the gradient of logits_chunk in place so we can save memory.
         liger_cross_entropy_kernel[(n_rows,)](
             X_ptr=logits_chunk,
@@ -165,7 +699,7 @@ def fused_linear_cross_entropy_forward(
             predicted_tokens_stride=predicted_tokens_1d_slice.stride(-1)
             if return_predicted_tokens
             else 0,  # always 1 if predicted tokens is enabled
-            n_cols=V,
+            n_cols=n_cols,
             n_non_ignore=total_n_non_ignore,
             sum_non_ignore_weight=total_sum_non_ignore_ce_weight,
             weight_sum=ce_weight_sum,
@@ -180,36 +714,66 @@ def fused_linear_cross_entropy_forward(
             HAS_WEIGHT=True if ce_weight is not None else False,
             HAS_SOFTCAPPING=True if softcap is not None else False,
             HAS_GRADIENTS=input_requires_grad,
+            HAS_DEVICE_NORMALIZERS=sync_free,
+            lse_ptr=lse_1d_slice,
+            STORE_LSE=lse_1d is not None,
+            token_weights_ptr=token_weights_slice,
+            token_weights_stride=token_weights_slice.stride(-1) if token_weights is not None else 0,
+            HAS_TOKEN_WEIGHTS=token_weights is not None,
+            TOKEN_SCALING=use_token_scaling,
+            topk_ids_ptr=topk_ids[start_idx:end_idx] if return_topk else None,
+            topk_logprobs_ptr=topk_logprobs[start_idx:end_idx] if return_topk else None,
+            topk_stride=topk_ids.stride(-2) if return_topk else 0,
+            TOPK=return_topk,
+            BLOCK_K=triton.next_power_of_2(max(return_topk, 1)),
+            entropy_ptr=entropy_1d[start_idx:end_idx] if return_entropy else None,
+            entropy_stride=entropy_1d.stride(-1) if return_entropy else 0,
+            RETURN_ENTROPY=return_entropy,
+            row_offset=start_idx,
+            seq_len=seq_len,
+            TARGET_SHIFT=shift,
             BLOCK_SIZE=BLOCK_SIZE,
             num_warps=32 if not is_hip() else 16,
         )
 
-        # Apply token scaling if requested
-        if use_token_scaling:
-            loss_1d_slice = loss_1d_slice * scaling_factors
-            if return_z_loss:
-                z_loss_1d_slice = z_loss_1d_slice * scaling_factors
-
-        loss_1d[start_idx:end_idx] = loss_1d_slice
-        if return_z_loss:
-            z_loss_1d[start_idx:end_idx] = z_loss_1d_slice
-        if return_token_accuracy:
-            token_accuracy_1d[start_idx:end_idx] = token_accuracy_1d_slice
         if return_predicted_tokens:
+            if num_sampled is not None:
+                # column 0 is the target, the others map to the sampled classes
+                predicted_tokens_1d_slice = torch.where(
+                    predicted_tokens_1d_slice > 0,
+                    sampled_ids[(predicted_tokens_1d_slice - 1).clamp(min=0)],
+                    original_target_chunk.where(predicted_tokens_1d_slice == 0, -1),
+                )
             predicted_tokens_1d[start_idx:end_idx] = predicted_tokens_1d_slice
         grad_logits_chunk = logits_chunk  # chunk_size x V
 
-        # Apply token scaling to gradients if requested
-        if use_token_scaling:
-            # Expand scaling factors to match gradient dimensions
-            scaling_factors_expanded = scaling_factors.unsqueeze(-1)  # chunk_size x 1
-            grad_logits_chunk = grad_logits_chunk * scaling_factors_expanded
+        if num_sampled is not None:
+            if input_requires_grad:
+                grad_input_chunk = _sampled_softmax_grads(
+                    grad_logits_chunk,
+                    _input_chunk,
+                    weight,
+                    original_target_chunk,
+                    target_mask_chunk,
+                    sampled_ids,
+                    grad_weight,
+                    grad_bias,
+                )
+                if kept_rows is None:
+                    grad_input[start_idx:end_idx] = grad_input_chunk
+                else:
+                    grad_input.index_copy_(0, kept_rows[start_idx:end_idx], grad_input_chunk)
+            continue
 
         if input_requires_grad:
-            grad_input[start_idx:end_idx] = grad_logits_chunk @ weight
+            if kept_rows is None:
+                grad_input[start_idx:end_idx] = grad_logits_chunk @ weight
+            else:
+                grad_input.index_copy_(0, kept_rows[start_idx:end_idx], grad_logits_chunk @ weight)
 
         if grad_weight is not None and input_requires_grad:
-            grad_weight += torch.mm(grad_logits_chunk.t(), _input_chunk).float()
+            # in-place add upcasts to the accumulator dtype without materializing a (V, H) fp32 copy
+            grad_weight.add_(torch.mm(grad_logits_chunk.t(), _input_chunk))
 
         if bias is not None and input_requires_grad:
             torch.add(
@@ -219,6 +783,27 @@ def fused_linear_cross_entropy_forward(
                 alpha=1.0,
             )
 
+    if normalizers_works is not None:
+        # no chunk at all (no rows, or all of them compacted away)
+        total_n_non_ignore, _, _ = _wait_for_normalizers(normalizers, normalizers_works, sync_free)
+
+    if kept_rows is not None:
+        # ignored rows get the same values the kernel would have written for them
+        loss_1d = _scatter_kept_rows(loss_1d, kept_rows, n_total_rows, 0.0)
+        z_loss_1d = _scatter_kept_rows(z_loss_1d, kept_rows, n_total_rows, 0.0) if return_z_loss else None
+        token_accuracy_1d = (
+            _scatter_kept_rows(token_accuracy_1d, kept_rows, n_total_rows, 0.0) if return_token_accuracy else None
+        )
+        predicted_tokens_1d = (
+            _scatter_kept_rows(predicted_tokens_1d, kept_rows, n_total_rows, -1) if return_predicted_tokens else None
+        )
+        entropy_1d = _scatter_kept_rows(entropy_1d, kept_rows, n_total_rows, 0.0) if return_entropy else None
+        if return_topk:
+            topk_ids = _scatter_kept_rows(topk_ids, kept_rows, n_total_rows, -1)
+            topk_logprobs = _scatter_kept_rows(topk_logprobs, kept_rows, n_total_rows, 0.0)
+        if lse_out is not None:
+            lse_out.index_copy_(0, kept_rows, lse_1d)
+
     # Need extra calculations for backward if reduction=='none'. Not supporting reduction='none' now.
     # if reduction == "none":
     #     loss = loss_1d
@@ -229,38 +814,284 @@ def fused_linear_cross_entropy_forward(
         loss = loss_1d
         z_loss = z_loss_1d if return_z_loss else None
         token_accuracy = token_accuracy_1d if return_token_accuracy else None
+        entropy = entropy_1d if return_entropy else None
     else:
         loss = torch.sum(loss_1d)
         z_loss = torch.sum(z_loss_1d) if return_z_loss else None
-        # For accuracy, we compute the mean across all non-ignored tokens
+        # For accuracy and entropy, we compute the mean across all non-ignored tokens
         token_accuracy = torch.sum(token_accuracy_1d) / total_n_non_ignore if return_token_accuracy else None
+        entropy = torch.sum(entropy_1d) / total_n_non_ignore if return_entropy else None
 
     predicted_tokens = predicted_tokens_1d if return_predicted_tokens else None
 
-    # Cast back to original dtype
+    # Cast back to original dtype, unless the caller adds the weight gradient into a higher precision buffer
+    grad_weight = grad_weight.to(grad_weight_dtype or weight.dtype) if grad_weight is not None else None
+    grad_bias = grad_bias.to(bias.dtype) if grad_bias is not None else None
+
+    return (
+        loss,
+        z_loss,
+        token_accuracy,
+        predicted_tokens,
+        topk_ids,
+        topk_logprobs,
+        entropy,
+        grad_input,
+        grad_weight,
+        grad_bias,
+    )
+
+
+def fused_linear_cross_entropy_deferred_backward(
+    grad_output,
+    _input,
+    weight,
+    target,
+    lse,
+    bias=None,
+    ce_weight=None,
+    ignore_index=-100,
+    lse_square_scale=0.0,
+    label_smoothing=0.0,
+    reduction="mean",
+    softcap=None,
+    accum_dtype=None,
+    use_token_scaling=False,
+    compact_ignored_tokens=False,
+    sync_free=False,
+    max_chunk_bytes=None,
+    input_requires_grad=True,
+    weight_requires_grad=True,
+    grad_weight_buffer=None,
+    process_group=None,
+    vocab_tile_size=None,
+    token_weights=None,
+):
+    """
+    Backward of grad_mode="deferred": recompute the logits chunk by chunk and turn them into gradients with the
+    logsumexp `lse` saved by the forward pass, so that only the second (gradient) pass of the cross entropy kernel runs.
+    `grad_output` is applied to every chunk before the matmuls, so a per-token `grad_output` (reduction="none") is
+    supported as well.
+    If `grad_weight_buffer` is given, the weight gradient of every chunk is added into it in place (no (V, H) buffer is
+    allocated) and None is returned for it.
+    """
+    device = _input.device
+
+    grad_input = torch.zeros_like(_input, device=device) if input_requires_grad else None
+    kept_rows = None
+    if compact_ignored_tokens:
+        kept_rows = torch.nonzero(target != ignore_index, as_tuple=True)[0]
+        _input = _input.index_select(0, kept_rows)
+        target = target.index_select(0, kept_rows)
+        lse = lse.index_select(0, kept_rows)
+        if token_weights is not None:
+            token_weights = token_weights.index_select(0, kept_rows)
+        if grad_output.ndim > 0:
+            grad_output = grad_output.index_select(0, kept_rows)
+
+    BT, H = _input.shape
+    V = weight.shape[0]
+    BLOCK_SIZE = min(MAX_FUSED_SIZE, triton.next_power_of_2(V))
+
+    plan = plan_chunk_size(
+        BT,
+        H,
+        V,
+        _input.dtype,
+        max_chunk_bytes=max_chunk_bytes,
+        n_logits=1 + (bias is not None) if vocab_tile_size is None else 2,
+        # vocab tiles: fp32 logits, softmax, one-hot target and gradient
+        n_fp32_logits=0 if vocab_tile_size is None else 4,
+        accum_dtype=accum_dtype,
+        has_grad_weight=weight_requires_grad and grad_weight_buffer is None,
+        device=device,
+        n_cols=vocab_tile_size,
+    )
+    logger.debug("fused_linear_cross_entropy_deferred_backward chunk plan: %s", plan)
+    chunk_size = plan.chunk_size
+    num_chunks = plan.num_chunks
+
+    if not weight_requires_grad:
+        grad_weight = None
+    elif grad_weight_buffer is not None:
+        grad_weight = grad_weight_buffer
+    else:
+        grad_weight = torch.zeros_like(weight, dtype=accum_dtype or weight.dtype, device=device)
+    grad_bias = torch.zeros_like(bias, dtype=accum_dtype or bias.dtype, device=device) if bias is not None else None
+
+    target_mask = target != ignore_index
+    if ce_weight is not None and ce_weight.stride(-1) != 1:
+        ce_weight = ce_weight.contiguous()
+    normalizers, normalizers_works = _start_normalizers(target, target_mask, ce_weight, sync_free, process_group)
+    total_n_non_ignore, total_sum_non_ignore_ce_weight, ce_weight_sum = normalizers
+
+    for chunk_id in range(num_chunks):
+        start_idx = chunk_id * chunk_size
+        end_idx = min((chunk_id + 1) * chunk_size, BT)
+        _input_chunk = _input[start_idx:end_idx]  # chunk_size x H
+
+        if vocab_tile_size is not None:
+            target_chunk = target[start_idx:end_idx]
+            target_mask_chunk = target_mask[start_idx:end_idx]
+            if normalizers_works is not None:
+                normalizers = _wait_for_normalizers(normalizers, normalizers_works, sync_free)
+                total_n_non_ignore, total_sum_non_ignore_ce_weight, ce_weight_sum = normalizers
+                normalizers_works = None
+            # scale by grad_output along with the rows: a scalar for "mean"/"sum", one value per row for "none"
+            row_scale = grad_output[start_idx:end_idx] if grad_output.ndim > 0 else grad_output
+            if token_weights is not None:
+                row_scale = row_scale * token_weights[start_idx:end_idx]
+            if use_token_scaling:
+                # p(target) from the target logits alone and the saved logsumexp
+                target_logits = _target_logits(
+                    _input_chunk, weight, bias, target_chunk.where(target_mask_chunk, 0), softcap
+                )
+                row_scale = row_scale * torch.exp(target_logits - lse[start_idx:end_idx]).where(target_mask_chunk, 0.0)
+            grad_input_chunk = _vocab_tiled_grads(
+                _input_chunk,
+                weight,
+                bias,
+                target_chunk,
+                target_mask_chunk,
+                ce_weight,
+                ce_weight[target_chunk.where(target_mask_chunk, 0)].float() if ce_weight is not None else None,
+                ce_weight_sum,
+                lse[start_idx:end_idx],
+                row_scale,
+                grad_weight,
+                grad_bias,
+                grad_input is not None,
+                lse_square_scale,
+                label_smoothing,
+                reduction,
+                softcap,
+                total_n_non_ignore,
+                total_sum_non_ignore_ce_weight,
+                vocab_tile_size,
+            )
+            if grad_input is not None:
+                if kept_rows is None:
+                    grad_input[start_idx:end_idx] = grad_input_chunk
+                else:
+                    grad_input.index_copy_(0, kept_rows[start_idx:end_idx], grad_input_chunk)
+            continue
+
+        logits_chunk = _input_chunk @ weight.t()  # chunk_size x V
+        if bias is not None:
+            logits_chunk = logits_chunk + bias
+        target_chunk = target[start_idx:end_idx].contiguous()  # chunk_size,
+        lse_chunk = lse[start_idx:end_idx]
+        n_rows = logits_chunk.shape[0]
+        token_weights_chunk = token_weights[start_idx:end_idx] if token_weights is not None else None
+
+        logits_chunk = logits_chunk.contiguous()
+        if normalizers_works is not None:
+            normalizers = _wait_for_normalizers(normalizers, normalizers_works, sync_free)
+            total_n_non_ignore, total_sum_non_ignore_ce_weight, ce_weight_sum = normalizers
+            normalizers_works = None
+        # only the gradients are computed, in place, from the saved logsumexp
+        liger_cross_entropy_kernel[(n_rows,)](
+            X_ptr=logits_chunk,
+            X_stride=logits_chunk.stride(-2),
+            Y_ptr=target_chunk,
+            Y_stride=target_chunk.stride(-1),  # always 1
+            weight_ptr=ce_weight,
+            loss_ptr=lse_chunk,  # not written with LOAD_LSE
+            z_loss_ptr=None,
+            loss_stride=lse_chunk.stride(-1),  # always 1
+            token_accuracy_ptr=None,
+            token_accuracy_stride=0,
+            predicted_tokens_ptr=None,
+            predicted_tokens_stride=0,
+            n_cols=V,
+            n_non_ignore=total_n_non_ignore,
+            sum_non_ignore_weight=total_sum_non_ignore_ce_weight,
+            weight_sum=ce_weight_sum,
+            ignore_index=ignore_index,
+            lse_square_scale=lse_square_scale,
+            label_smoothing=label_smoothing,
+            reduction=reduction,
+            softcap=softcap,
+            RETURN_Z_LOSS=False,
+            RETURN_TOKEN_ACCURACY=False,
+            RETURN_PREDICTED_TOKENS=False,
+            HAS_WEIGHT=True if ce_weight is not None else False,
+            HAS_SOFTCAPPING=True if softcap is not None else False,
+            HAS_GRADIENTS=True,
+            HAS_DEVICE_NORMALIZERS=sync_free,
+            lse_ptr=lse_chunk,
+            LOAD_LSE=True,
+            token_weights_ptr=token_weights_chunk,
+            token_weights_stride=token_weights_chunk.stride(-1) if token_weights is not None else 0,
+            HAS_TOKEN_WEIGHTS=token_weights is not None,
+            TOKEN_SCALING=use_token_scaling,
+            BLOCK_SIZE=BLOCK_SIZE,
+            num_warps=32 if not is_hip() else 16,
+        )
+        grad_logits_chunk = logits_chunk  # chunk_size x V
+
+        # scale by grad_output before the matmuls: a scalar for "mean"/"sum", one value per row for "none"
+        grad_logits_chunk.mul_(grad_output[start_idx:end_idx].unsqueeze(-1) if grad_output.ndim > 0 else grad_output)
+
+        if grad_input is not None:
+            if kept_rows is None:
+                grad_input[start_idx:end_idx] = grad_logits_chunk @ weight
+            else:
+                grad_input.index_copy_(0, kept_rows[start_idx:end_idx], grad_logits_chunk @ weight)
+
+        if grad_weight is not None:
+            grad_weight.add_(torch.mm(grad_logits_chunk.t(), _input_chunk))
+
+        if grad_bias is not None:
+            grad_bias.add_(grad_logits_chunk.sum(dim=0))
+
+    if grad_weight_buffer is not None:
+        grad_weight = None
     grad_weight = grad_weight.to(weight.dtype) if grad_weight is not None else None
     grad_bias = grad_bias.to(bias.dtype) if grad_bias is not None else None
 
-    return loss, z_loss, token_accuracy, predicted_tokens, grad_input, grad_weight, grad_bias
+    return grad_input, grad_weight, grad_bias
+
 
+def _grad_weight_accumulation_buffer(weight):
+    """
+    Return the buffer the weight gradient is accumulated into when `accumulate_grad_weight` is set: the Megatron-style
+    fp32 `weight.main_grad` if the weight has one, otherwise `weight.grad`, which is created on first use.
+    """
+    main_grad = getattr(weight, "main_grad", None)
+    if main_grad is not None:
+        return main_grad
+    if weight.grad is None:
+        weight.grad = torch.zeros_like(weight)
+    return weight.grad
 
-def fused_linear_cross_entropy_backward(grad_output, grad_input, grad_weight, grad_bias):
+
+def fused_linear_cross_entropy_backward(grad_output, grad_input, grad_weight, grad_bias, sync_free=False):
     # If cross entropy is the last layer, grad_output is 1.0. Skip the mul to save time
-    if not torch.equal(grad_output, torch.tensor(1.0, device=grad_output.device)):
+    # (the comparison itself synchronizes, so it is skipped in sync_free mode)
+    if sync_free or not torch.equal(grad_output, torch.tensor(1.0, device=grad_output.device)):
         # We use a Triton kernel instead of a PyTorch operation because modifying inputs in-place
         # for gradient storage and backward multiple times causes anomalies with PyTorch but not with Triton.
-        BT, H = grad_input.shape
-        n_rows = BT
+        # grad_input is None when only the weight requires grad
+        H = (
+            grad_input.shape[-1]
+            if grad_input is not None
+            else (grad_weight.shape[-1] if grad_weight is not None else 1)
+        )
         BLOCK_SIZE = min(MAX_FUSED_SIZE, triton.next_power_of_2(H))
 
-        element_mul_kernel[(n_rows,)](
-            grad_input,
-            grad_input.stride(-2),
-            grad_output,
-            H,
-            BLOCK_SIZE=BLOCK_SIZE,
-            num_warps=32 if not is_hip() else 16,
-        )
+        if grad_input is not None:
+            BT = grad_input.shape[0]
+            n_rows = BT
+
+            element_mul_kernel[(n_rows,)](
+                grad_input,
+                grad_input.stride(-2),
+                grad_output,
+                H,
+                BLOCK_SIZE=BLOCK_SIZE,
+                num_warps=32 if not is_hip() else 16,
+            )
 
         # handle grad_weight
         if grad_weight is not None:
@@ -291,6 +1122,56 @@ def fused_linear_cross_entropy_backward(grad_output, grad_input, grad_weight, gr
     return grad_input, grad_weight, grad_bias
 
 
+@torch.no_grad()
+def fused_linear_cross_entropy_sequence_nll(
+    _input,
+    weight,
+    target,
+    bias=None,
+    ignore_index=-100,
+    softcap=None,
+    max_chunk_bytes=None,
+    compact_ignored_tokens=False,
+):
+    """
+    Gradient-free evaluation path: the summed negative log-likelihood of every sequence, e.g. for perplexity.
+
+    No gradient buffer is allocated and the kernel skips its in-place gradient stores, which also lets the chunk grow
+    (see `plan_chunk_size`). The perplexity of each sequence is `exp(nll / n_tokens)`.
+
+    Args:
+        _input (torch.Tensor): hidden states of shape (B, T, H).
+        weight (torch.Tensor): lm_head weight of shape (V, H).
+        target (torch.Tensor): labels of shape (B, T), already shifted, with `ignore_index` for the positions to skip.
+        bias (Optional[torch.Tensor]): lm_head bias of shape (V,).
+        ignore_index (int): target value that is ignored.
+        softcap (Optional[float]): softcap applied to the logits.
+        max_chunk_bytes (Optional[Union[int, str]]): see `plan_chunk_size`.
+        compact_ignored_tokens (bool): skip the lm_head matmul of the ignored rows.
+
+    Returns:
+        tuple: the fp32 summed NLL of shape (B,) and the number of non-ignored tokens of shape (B,).
+    """
+    assert _input.ndim == 3 and target.shape == _input.shape[:2], (
+        f"expected _input of shape (B, T, H) and target of shape (B, T). Got: {_input.shape} and {target.shape}"
+    )
+    B, T, H = _input.shape
+    loss = fused_linear_cross_entropy_forward(
+        _input=_input.detach().reshape(B * T, H),
+        weight=weight.detach(),
+        target=target.reshape(B * T),
+        bias=bias.detach() if bias is not None else None,
+        ignore_index=ignore_index,
+        reduction="none",
+        softcap=softcap,
+        compact_ignored_tokens=compact_ignored_tokens,
+        max_chunk_bytes=max_chunk_bytes,
+    )[0]
+    nll = loss.float().view(B, T).sum(dim=-1)
+    n_tokens = (target != ignore_index).sum(dim=-1)
+    return nll, n_tokens
+
+
 class LigerFusedLinearCrossEntropyFunction(torch.autograd.Function):
     @staticmethod
     @amp_custom_fwd
@@ -311,6 +1192,22 @@ class LigerFusedLinearCrossEntropyFunction(torch.autograd.Function):
         use_token_scaling: bool = False,
         return_token_accuracy: bool = False,
         return_predicted_tokens: bool = False,
+        compact_ignored_tokens: bool = False,
+        sync_free: bool = False,
+        check_target_bounds: bool = False,
+        max_chunk_bytes=None,
+        grad_mode: str = "eager",
+        accumulate_grad_weight: bool = False,
+        process_group=None,
+        vocab_tile_size=None,
+        num_sampled=None,
+        sampler: str = "log_uniform",
+        sampling_probs=None,
+        token_weights=None,
+        return_topk=0,
+        return_entropy=False,
+        shift=0,
+        cu_seqlens=None,
     ):
         """
         Fusing the last linear layer with cross-entropy loss
@@ -328,59 +1225,230 @@ class LigerFusedLinearCrossEntropyFunction(torch.autograd.Function):
         ce_weight: a manual rescaling weight given to each class. If given, has to be a Tensor of size V and floating point dtype
         ignore_index: the index to ignore in the target
         label_smoothing (float): The amount of smoothing when computing the loss, where 0.0 means no smoothing.
-        reduction: reduction to apply
+        reduction: reduction to apply: "mean", "sum", "none" or "sequence_mean" (see `cu_seqlens`)
         accum_dtype (torch.dtype): the dtype of intermediate result buffers for weight and bias gradient accumulations.
             Recommended to set `accum_dtype` to higher precision, e.g. `torch.float32`, if the training is unstable with original dtype. Default: `None`, performing accumulations in original dtype
         use_token_scaling (bool): whether to scale each token's loss by its predicted probability (detached).
-            When True, each token's loss is multiplied by the model's predicted probability for that token's true class.
-            Default: False.
+            When True, each token's loss is multiplied by the model's predicted probability for that token's true class,
+            computed by the cross entropy kernel from its online softmax statistics. Default: False.
         return_token_accuracy (bool): When `return_token_accuracy` is `True`, computes and returns per-token accuracy without materializing logits. Default: `False`
         return_predicted_tokens (bool): When `return_predicted_tokens` is `True`, returns per-token predicted class indices (argmax) without materializing logits. Default: `False`
+        compact_ignored_tokens (bool): When `compact_ignored_tokens` is `True`, rows whose target is `ignore_index` are dropped before
+            the chunked matmul and their (zero) results are scattered back afterwards, saving the lm_head FLOPs spent on them. Default: `False`
+        sync_free (bool): When `sync_free` is `True`, the loss normalizers stay on device and no `.item()` is called, so the op can be
+            captured by CUDA graphs. `compact_ignored_tokens` still synchronizes. Default: `False`
+        check_target_bounds (bool): When `check_target_bounds` is `True`, asserts that targets are within [0, V) (synchronizes). Default: `False`
+        max_chunk_bytes (Optional[Union[int, str]]): memory budget in bytes used to pick the chunk size, or "auto" to use the free device memory.
+            See `plan_chunk_size`. Default: `None`, keeping the logits chunk about the size of `_input`
+        grad_mode (str): "eager" computes the gradients during the forward pass and keeps them until backward. "deferred" only saves
+            `_input`, `target` and the per-row logsumexp, and recomputes the logits chunk by chunk in backward: about twice the
+            lm_head FLOPs, but no (V, H) gradient buffer is held between forward and backward, and any `grad_output` is supported
+            (including a per-token one with reduction="none"). With reduction="none", "eager" behaves as "deferred", so that a per-token
+            `grad_output` (e.g. advantages or token weights applied after the loss) is applied to every row. Default: "eager"
+        accumulate_grad_weight (bool): When `accumulate_grad_weight` is `True`, backward adds the weight gradient in place into
+            `weight.main_grad` (Megatron-style fp32 buffer) if it exists, else into `weight.grad`, and returns None for the weight,
+            saving the accumulation by autograd. With grad_mode="eager", the forward pass still allocates a (V, H) weight gradient
+            buffer per micro-batch and keeps it until backward; with `main_grad`, it is accumulated in the dtype of `main_grad`
+            (unless `accum_dtype` is set) and added without being downcast to the dtype of `weight`. With grad_mode="deferred"
+            every chunk is added directly, so no (V, H) gradient buffer is allocated at all. `weight` must be a leaf tensor.
+            Default: `False`
+        process_group (torch.distributed.ProcessGroup): With context/sequence parallelism, the group of ranks holding the slices of the
+            sequences. The non-ignored token count (and the ce_weight sum of the targets) of the "mean" reduction are summed over it with
+            an asynchronous all-reduce overlapped with the first chunk's matmul, so that the sum of the losses of all ranks is the mean
+            over all their tokens. Default: `None`, normalizing by the local tokens only
+        vocab_tile_size (Optional[int]): When set, each chunk of rows is processed in tiles of `vocab_tile_size` classes: a first pass
+            keeps a running max / sum-exp per row (online softmax) and a second pass recomputes every tile to accumulate its gradients, so
+            only (chunk_size, vocab_tile_size) logits are alive at a time and the chunks can be much larger for big vocabularies. The
+            logits are computed twice (about twice the lm_head FLOPs). Default: `None`, materializing (chunk_size, V) logits
+        num_sampled (Optional[int]): When set, the loss is a sampled softmax: every chunk draws `num_sampled` negative classes
+            (with replacement) shared by its rows, only the weight rows of the targets and of the negatives are multiplied, and the
+            logits are corrected by the log expected count of each class under the sampler (logQ correction). Negatives equal to the
+            target of a row are masked out. The token accuracy and predicted tokens are taken over the target and the negatives.
+            Not supported with ce_weight, label_smoothing, softcap, use_token_scaling, grad_mode="deferred", vocab_tile_size and
+            reduction="none".
+            Default: `None`, computing the exact full softmax
+        sampler (str): distribution of the negatives of the sampled softmax: "uniform", "unigram" (`sampling_probs`) or
+            "log_uniform" (Zipfian, for vocabularies sorted by decreasing frequency). Default: "log_uniform"
+        sampling_probs (Optional[torch.Tensor]): (V,) unnormalized class frequencies of the "unigram" sampler. Default: `None`
+        token_weights (Optional[torch.Tensor]): (B*T,) weights multiplying the loss (and z loss) of every token and its gradient,
+            applied by the kernel after the reduction's normalization (the "mean" is still over the non-ignored tokens).
+            Combined with `use_token_scaling` by multiplication. Not differentiated. Default: `None`
+        return_topk (int): When `return_topk` is k > 0, also returns the (B*T, k) ids and log-probabilities of the k most probable
+            classes of every token (at most 20), kept as a running top-k during the online softmax without materializing logits.
+            Ignored tokens get ids -1 and log-probabilities 0. Not supported with num_sampled. Default: `0`
+        return_entropy (bool): When `return_entropy` is `True`, computes and returns the entropy of the predicted distribution of every token
+            in the online softmax pass, without materializing logits. Averaged over the non-ignored tokens like the accuracy, unless
+            reduction="none" (0 for the ignored tokens). Not supported with num_sampled. Default: `False`
+        shift (int): When `shift` > 0, `target` holds the unshifted (..., T) labels and row r of every sequence of T rows is
+            trained on label r + shift, the last `shift` rows being ignored. The kernel reads the shifted labels in place,
+            instead of a shifted copy of them. Default: `0`
+        cu_seqlens (Optional[torch.Tensor]): (n_seqs + 1,) cumulative lengths of the sequences packed in the B*T rows (padding-free
+            packing), required by reduction="sequence_mean": the loss is the mean over the non-ignored tokens of every sequence,
+            averaged over the sequences. The kernel applies the per-row normalizer of the sequence of every row, so the packed
+            batch is neither unpacked nor padded. The token accuracy and entropy stay averaged over all the non-ignored tokens.
+            Not supported with shift and process_group. Default: `None`
         """
-
-        loss, z_loss, token_accuracy, predicted_tokens, grad_input, grad_weight, grad_bias = (
-            fused_linear_cross_entropy_forward(
-                _input=_input,
-                weight=weight,
-                target=target,
-                bias=bias,
-                ce_weight=ce_weight,
-                ignore_index=ignore_index,
-                lse_square_scale=lse_square_scale,
-                label_smoothing=label_smoothing,
-                reduction=reduction,
-                softcap=softcap,
-                return_z_loss=return_z_loss,
-                accum_dtype=accum_dtype,
-                use_token_scaling=use_token_scaling,
-                return_token_accuracy=return_token_accuracy,
-                return_predicted_tokens=return_predicted_tokens,
+        assert token_weights is None or token_weights.numel() == target.numel(), (
+            f"token_weights must have the shape of target. Got: {token_weights.shape}"
+        )
+        assert shift >= 0, f"shift must be non-negative. Got: {shift}"
+        assert vocab_tile_size is None or vocab_tile_size > 0, (
+            f"vocab_tile_size must be a positive integer or None. Got: {vocab_tile_size}"
+        )
+        assert (reduction == "sequence_mean") == (cu_seqlens is not None), (
+            f"cu_seqlens is required by, and only used with, reduction='sequence_mean'. Got: reduction={reduction}"
+        )
+        if reduction == "sequence_mean":
+            assert shift == 0 and process_group is None, (
+                "reduction='sequence_mean' does not support shift and process_group"
             )
+            # the "sum" of the losses weighted by the normalizer of the sequence of every row
+            token_weights = sequence_mean_token_weights(target, cu_seqlens, ignore_index, ce_weight, token_weights)
+            reduction = "sum"
+        if reduction == "none" and grad_mode == "eager":
+            # the per-token grad_output of reduction="none" cannot be applied to the weight gradient summed over the
+            # tokens in forward, so the gradients are recomputed in backward instead
+            assert num_sampled is None, "sampled softmax does not support reduction='none'"
+            grad_mode = "deferred"
+        # keep a reference to the parameter itself to reach its .grad / .main_grad in backward
+        grad_weight_owner = weight if accumulate_grad_weight and weight.requires_grad else None
+        main_grad = getattr(grad_weight_owner, "main_grad", None)
+        grad_weight_dtype = None
+        if grad_mode == "eager" and main_grad is not None:
+            # the eager weight gradient is added into main_grad in backward: accumulate and keep it in its precision
+            accum_dtype = accum_dtype or main_grad.dtype
+            grad_weight_dtype = accum_dtype
+        if shift and grad_mode == "deferred":
+            # the deferred backward reads the targets of the rows it recomputes
+            target = shift_targets(target.reshape(-1, target.shape[-1]), shift, ignore_index).view(-1)
+            shift = 0
+        lse = (
+            torch.empty(_input.shape[0], dtype=torch.float32, device=_input.device) if grad_mode == "deferred" else None
         )
-        # downcast to dtype and store for backward
-        ctx.save_for_backward(
-            grad_input.detach(),
-            grad_weight.detach() if grad_weight is not None else None,
-            grad_bias.detach() if grad_bias is not None else None,
+
+        (
+            loss,
+            z_loss,
+            token_accuracy,
+            predicted_tokens,
+            topk_ids,
+            topk_logprobs,
+            entropy,
+            grad_input,
+            grad_weight,
+            grad_bias,
+        ) = fused_linear_cross_entropy_forward(
+            _input=_input,
+            weight=weight,
+            target=target,
+            bias=bias,
+            ce_weight=ce_weight,
+            ignore_index=ignore_index,
+            lse_square_scale=lse_square_scale,
+            label_smoothing=label_smoothing,
+            reduction=reduction,
+            softcap=softcap,
+            return_z_loss=return_z_loss,
+            accum_dtype=accum_dtype,
+            use_token_scaling=use_token_scaling,
+            return_token_accuracy=return_token_accuracy,
+            return_predicted_tokens=return_predicted_tokens,
+            compact_ignored_tokens=compact_ignored_tokens,
+            sync_free=sync_free,
+            check_target_bounds=check_target_bounds,
+            max_chunk_bytes=max_chunk_bytes,
+            grad_mode=grad_mode,
+            lse_out=lse,
+            process_group=process_group,
+            vocab_tile_size=vocab_tile_size,
+            num_sampled=num_sampled,
+            sampler=sampler,
+            sampling_probs=sampling_probs,
+            token_weights=token_weights,
+            return_topk=return_topk,
+            return_entropy=return_entropy,
+            shift=shift,
+            grad_weight_dtype=grad_weight_dtype,
         )
+        if grad_mode == "deferred":
+            ctx.save_for_backward(_input.detach(), weight.detach(), target, bias, ce_weight, lse, token_weights)
+            ctx.ignore_index = ignore_index
+            ctx.lse_square_scale = lse_square_scale
+            ctx.label_smoothing = label_smoothing
+            ctx.reduction = reduction
+            ctx.softcap = softcap
+            ctx.accum_dtype = accum_dtype
+            ctx.use_token_scaling = use_token_scaling
+            ctx.compact_ignored_tokens = compact_ignored_tokens
+            ctx.max_chunk_bytes = max_chunk_bytes
+            ctx.process_group = process_group
+            ctx.vocab_tile_size = vocab_tile_size
+        else:
+            # downcast to dtype and store for backward
+            ctx.save_for_backward(
+                grad_input.detach() if grad_input is not None else None,
+                grad_weight.detach() if grad_weight is not None else None,
+                grad_bias.detach() if grad_bias is not None else None,
+            )
+        ctx.grad_mode = grad_mode
+        ctx.grad_weight_owner = grad_weight_owner
         ctx.return_z_loss = return_z_loss
         ctx.return_token_accuracy = return_token_accuracy
         ctx.return_predicted_tokens = return_predicted_tokens
-        return loss, z_loss, token_accuracy, predicted_tokens
+        ctx.return_entropy = return_entropy
+        ctx.sync_free = sync_free
+        if return_topk:
+            ctx.mark_non_differentiable(topk_ids, topk_logprobs)
+        return loss, z_loss, token_accuracy, predicted_tokens, topk_ids, topk_logprobs, entropy
 
     @staticmethod
     @amp_custom_bwd
-    def backward(ctx, grad_output, grad_output2, grad_output3, grad_output4):
+    def backward(ctx, grad_output, grad_output2, grad_output3, grad_output4, grad_output5, grad_output6, grad_output7):
         if ctx.return_z_loss:
             del grad_output2  # z_loss is only for logging
         if ctx.return_token_accuracy:
             del grad_output3  # token_accuracy is only for metrics
         if ctx.return_predicted_tokens:
             del grad_output4  # predicted_tokens is only for metrics
-        (grad_input, grad_weight, grad_bias) = ctx.saved_tensors
-        grad_input, grad_weight, grad_bias = fused_linear_cross_entropy_backward(
-            grad_output, grad_input, grad_weight, grad_bias
-        )
+        if ctx.return_entropy:
+            del grad_output7  # entropy is only for metrics
+        if ctx.grad_mode == "deferred":
+            (_input, weight, target, bias, ce_weight, lse, token_weights) = ctx.saved_tensors
+            grad_input, grad_weight, grad_bias = fused_linear_cross_entropy_deferred_backward(
+                grad_output,
+                _input,
+                weight,
+                target,
+                lse,
+                bias=bias,
+                ce_weight=ce_weight,
+                ignore_index=ctx.ignore_index,
+                lse_square_scale=ctx.lse_square_scale,
+                label_smoothing=ctx.label_smoothing,
+                reduction=ctx.reduction,
+                softcap=ctx.softcap,
+                accum_dtype=ctx.accum_dtype,
+                use_token_scaling=ctx.use_token_scaling,
+                compact_ignored_tokens=ctx.compact_ignored_tokens,
+                sync_free=ctx.sync_free,
+                max_chunk_bytes=ctx.max_chunk_bytes,
+                input_requires_grad=ctx.needs_input_grad[0],
+                weight_requires_grad=ctx.needs_input_grad[1],
+                grad_weight_buffer=_grad_weight_accumulation_buffer(ctx.grad_weight_owner)
+                if ctx.grad_weight_owner is not None
+                else None,
+                process_group=ctx.process_group,
+                vocab_tile_size=ctx.vocab_tile_size,
+                token_weights=token_weights,
+            )
+        else:
+            (grad_input, grad_weight, grad_bias) = ctx.saved_tensors
+            grad_input, grad_weight, grad_bias = fused_linear_cross_entropy_backward(
+                grad_output, grad_input, grad_weight, grad_bias, ctx.sync_free
+            )
+            if ctx.grad_weight_owner is not None and grad_weight is not None:
+                _grad_weight_accumulation_buffer(ctx.grad_weight_owner).add_(grad_weight)
+                grad_weight = None
         return (
             grad_input,
             grad_weight,
@@ -397,4 +1465,20 @@ class LigerFusedLinearCrossEntropyFunction(torch.autograd.Function):
             None,  # use_token_scaling
             None,  # return_token_accuracy
             None,  # return_predicted_tokens
+            None,  # compact_ignored_tokens
+            None,  # sync_free
+            None,  # check_target_bounds
+            None,  # max_chunk_bytes
+            None,  # grad_mode
+            None,  # accumulate_grad_weight
+            None,  # process_group
+            None,  # vocab_tile_size
+            None,  # num_sampled
+            None,  # sampler
+            None,  # sampling_probs
+            None,  # token_weights
+            None,  # return_topk
+            None,  # return_entropy
+            None,  # shift
+            None,  # cu_seqlens
         )
@@ -0,0 +1,191 @@
+import torch
+import torch.nn.functional as F
+import triton
+
+from liger_kernel.ops.cross_entropy import liger_cross_entropy_kernel
+from liger_kernel.ops.fused_linear_cross_entropy import MAX_FUSED_SIZE
+from liger_kernel.ops.utils import is_hip
+
+
+def target_logps(logits, target, ignore_index=-100, compute_grad=True):
+    """
+    Log probabilities of the target tokens (0 for ignored tokens), computed by the online-softmax cross entropy kernel.
+
+    With `compute_grad`, `logits` is overwritten in place with the gradient of `-logp` w.r.t. the logits, i.e.
+    `softmax(logits) - one_hot(target)` (zeroed on ignored rows), so that no extra (n_rows, V) buffer is needed.
+
+    Args:
+        logits (torch.Tensor): Shape: (n_rows, V). Must be contiguous in the last dimension.
+        target (torch.Tensor): Shape: (n_rows,).
+    Returns:
+        torch.Tensor: float32 log probabilities. Shape: (n_rows,).
+    """
+    n_rows, V = logits.shape
+    # ignored rows are not written by the kernel
+    loss_1d = torch.zeros(n_rows, dtype=torch.float32, device=logits.device)
+    liger_cross_entropy_kernel[(n_rows,)](
+        X_ptr=logits,
+        X_stride=logits.stride(-2),
+        Y_ptr=target,
+        Y_stride=target.stride(-1),  # always 1
+        weight_ptr=None,
+        loss_ptr=loss_1d,
+        z_loss_ptr=None,
+        loss_stride=loss_1d.stride(-1),  # always 1
+        token_accuracy_ptr=None,
+        token_accuracy_stride=0,
+        predicted_tokens_ptr=None,
+        predicted_tokens_stride=0,
+        n_cols=V,
+        n_non_ignore=1,
+        sum_non_ignore_weight=1.0,
+        weight_sum=0.0,
+        ignore_index=ignore_index,
+        lse_square_scale=0.0,
+        label_smoothing=0.0,
+        reduction="sum",  # unscaled per-token losses and gradients
+        softcap=None,
+        RETURN_Z_LOSS=False,
+        RETURN_TOKEN_ACCURACY=False,
+        RETURN_PREDICTED_TOKENS=False,
+        HAS_WEIGHT=False,
+        HAS_SOFTCAPPING=False,
+        HAS_GRADIENTS=compute_grad,
+        BLOCK_SIZE=min(MAX_FUSED_SIZE, triton.next_power_of_2(V)),
+        num_warps=32 if not is_hip() else 16,
+    )
+    return loss_1d.neg_()
+
+
+def fused_linear_dpo_forward(
+    _input,
+    weight,
+    target,
+    bias=None,
+    ref_input=None,
+    ref_weight=None,
+    ref_bias=None,
+    ref_chosen_logps=None,
+    ref_rejected_logps=None,
+    ignore_index=-100,
+    beta=0.1,
+    alpha=1.0,
+    compute_nll_loss=False,
+    average_log_prob=False,
+    chunk_size=1,
+):
+    """
+    Sigmoid DPO loss of the stacked chosen and rejected sequences, with its gradients computed in the forward pass.
+
+    The same pairs are processed together, `chunk_size` pairs at a time. For every chunk, the logits are computed in
+    the dtype of `_input` and overwritten by the cross entropy kernel with the gradient of the per-token log probs (the
+    reference logits of the chunk, if any, are computed and freed before).
+    Both the DPO loss and the NLL loss of the chosen sequences are linear in the per-token log probs of a pair. Their
+    derivative w.r.t. every token log prob is therefore known once the sequence log probs of the chunk are, and scales
+    the logits gradient in place before the matmuls. The peak memory is that of the fused linear cross entropy: one
+    (rows, V) logits chunk, without fp32 log_softmax copies or autograd intermediates.
+
+    Returns:
+        tuple: (loss, (chosen_logps, rejected_logps, chosen_logits_mean, rejected_logits_mean, nll_loss, chosen_rewards,
+            rejected_rewards), grad_input, grad_weight, grad_bias), the outputs of LigerFusedLinearDPOFunction and the
+            unscaled gradients.
+    """
+    input_shape = _input.shape
+    B, V = target.shape[0], weight.shape[0]
+    n_pairs = B // 2
+    T = target.numel() // B
+    H = _input.shape[-1]
+    device = _input.device
+
+    # rows ordered as (chosen/rejected, pair, token)
+    _input = _input.reshape(2, n_pairs, T, H)
+    target = target.reshape(2, n_pairs, T)
+    if ref_input is not None:
+        ref_input = ref_input.reshape(2, n_pairs, T, H)
+
+    grad_input = torch.empty_like(_input)
+    grad_weight = torch.zeros_like(weight)
+    grad_bias = torch.zeros_like(bias) if bias is not None else None
+
+    chosen_logps = torch.empty(n_pairs, dtype=torch.float32, device=device)
+    rejected_logps = torch.empty(n_pairs, dtype=torch.float32, device=device)
+    ref_chosen = torch.zeros(n_pairs, dtype=torch.float32, device=device)
+    ref_rejected = torch.zeros(n_pairs, dtype=torch.float32, device=device)
+    logits_sums = torch.zeros(2, dtype=torch.float32, device=device)
+    loss = torch.zeros((), dtype=torch.float32, device=device)
+    nll_loss = torch.zeros((), dtype=torch.float32, device=device)
+    n_nll_tokens = (target[0] != ignore_index).sum()
+
+    for start in range(0, n_pairs, chunk_size):
+        end = min(start + chunk_size, n_pairs)
+        n_rows = 2 * (end - start) * T
+        # a chunk-sized copy of the rows of the pairs [start, end), a view when there is a single chunk
+        input_chunk = _input[:, start:end].reshape(n_rows, H)
+        target_chunk = target[:, start:end].reshape(n_rows)
+        loss_mask = (target_chunk != ignore_index).view(2, -1, T)
+
+        token_scale = (
+            loss_mask.sum(-1).float().reciprocal() if average_log_prob else torch.ones(2, end - start, device=device)
+        )
+
+        # the reference logits are freed before the policy ones are computed: a single (rows, V) buffer is alive
+        if ref_chosen_logps is not None:
+            ref_seq_logps = torch.stack([ref_chosen_logps[start:end], ref_rejected_logps[start:end]]).float()
+        elif ref_input is not None:
+            ref_logits_chunk = ref_input[:, start:end].reshape(n_rows, H) @ ref_weight.t()
+            if ref_bias is not None:
+                ref_logits_chunk.add_(ref_bias)
+            ref_token_logps = target_logps(ref_logits_chunk, target_chunk, ignore_index, compute_grad=False)
+            del ref_logits_chunk
+            ref_seq_logps = ref_token_logps.view(2, -1, T).sum(-1) * token_scale
+        else:
+            ref_seq_logps = torch.zeros(2, end - start, dtype=torch.float32, device=device)
+
+        logits_chunk = input_chunk @ weight.t()
+        if bias is not None:
+            logits_chunk.add_(bias)
+        logits_sums += logits_chunk.view(2, -1).sum(-1, dtype=torch.float32)
+
+        # per-token log probs, and the gradient of -logp in place of the logits
+        per_token_logps = target_logps(logits_chunk, target_chunk, ignore_index).view(2, -1, T)
+        seq_logps = per_token_logps.sum(-1) * token_scale
+
+        # L = -sum(logsigmoid(z)) / n_pairs, z = beta * (chosen - ref_chosen - (rejected - ref_rejected))
+        logratios = seq_logps - ref_seq_logps
+        z = beta * (logratios[0] - logratios[1])
+        loss += -F.logsigmoid(z).sum() / n_pairs
+        dloss_dz = -torch.sigmoid(-z) / n_pairs
+        dloss_dseq = torch.stack([beta * dloss_dz, -beta * dloss_dz]).unsqueeze(-1) * token_scale.unsqueeze(-1)
+        dloss_dlogp = dloss_dseq.expand(2, -1, T).clone()
+        if compute_nll_loss:
+            # alpha * NLL of the chosen sequences, averaged over all the chosen tokens of the batch
+            nll_loss += -per_token_logps[0].sum() / n_nll_tokens
+            dloss_dlogp[0] -= alpha / n_nll_tokens
+
+        # d(-logp)/dlogits is in logits_chunk: scaling it by -dL/dlogp gives dL/dlogits
+        grad_logits_chunk = logits_chunk.mul_(dloss_dlogp.reshape(n_rows, 1).neg().to(logits_chunk.dtype))
+
+        grad_input[:, start:end] = (grad_logits_chunk @ weight).view(2, -1, T, H)
+        grad_weight.addmm_(grad_logits_chunk.t(), input_chunk)
+        if bias is not None:
+            grad_bias.add_(grad_logits_chunk.sum(0))
+        del logits_chunk, grad_logits_chunk
+
+        chosen_logps[start:end] = seq_logps[0]
+        rejected_logps[start:end] = seq_logps[1]
+        ref_chosen[start:end] = ref_seq_logps[0]
+        ref_rejected[start:end] = ref_seq_logps[1]
+
+    if compute_nll_loss:
+        loss += alpha * nll_loss
+    logits_means = logits_sums / (n_pairs * T * V)
+    aux_outputs = (
+        chosen_logps,
+        rejected_logps,
+        logits_means[0],
+        logits_means[1],
+        nll_loss,
+        beta * (chosen_logps - ref_chosen),
+        beta * (rejected_logps - ref_rejected),
+    )
+    return loss, aux_outputs, grad_input.view(input_shape), grad_weight, grad_bias
@@ -1,3 +1,5 @@
+import logging
+
 from typing import Optional
 
 import torch
@@ -8,8 +10,11 @@ from liger_kernel.ops.utils import amp_custom_bwd
 from liger_kernel.ops.utils import amp_custom_fwd
 from liger_kernel.ops.utils import element_mul_kernel
 from liger_kernel.ops.utils import is_hip
+from liger_kernel.ops.utils import plan_chunk_size
 from liger_kernel.utils import infer_device
 
+logger = logging.getLogger(__name__)
+
 # The hard limit of TRITON_MAX_TENSOR_NUMEL is 1048576 https://github.com/triton-lang/triton/blob/ba42a5c68fd0505f8c42f4202d53be0f8d9a5fe0/python/triton/language/core.py#L19
 # However, setting limit as 65536 as in LayerNorm tutorial is faster because of less register spilling
 # The optimal maximum block size depends on your hardware, your kernel, and your dtype
@@ -26,6 +31,7 @@ def fused_linear_jsd_forward(
     ignore_index,
     has_label,
     temperature,
+    max_chunk_bytes=None,
 ):
     device = student_input.device
     dtype = student_input.dtype
@@ -33,17 +39,28 @@ def fused_linear_jsd_forward(
     # inputs have shape: BT x H
     # materialized activations will have shape: BT x V
     # the increase in memory = BT x V
-    # reduction can be achieved by partitioning the number of tokens BT into smaller chunks.
-    # for ex: if we were to achieve the same memory consumption as BT x H, then the chunk size should be:
-    # inc_factor = (V+H-1)//H, chunk_size = (BT + inc_factor - 1)//inc_factor
-    # for ex: BT = 4096*4, V = 32000, H = 4096 ==> inc_factor = 8, chunk_size = 2048
+    # reduction can be achieved by partitioning the number of tokens BT into smaller chunks,
+    # see plan_chunk_size for how the chunk size is derived from the memory budget.
     BT, H = student_input.shape
     V = student_weight.shape[0]
     BLOCK_SIZE = min(MAX_FUSED_SIZE, triton.next_power_of_2(V))
 
-    inc_factor = triton.cdiv(V, H)  # (V + H - 1) // H
-    chunk_size = triton.next_power_of_2(triton.cdiv(BT, inc_factor))  # (BT + inc_factor - 1) // inc_factor
-    num_chunks = triton.cdiv(BT, chunk_size)  # (BT + chunk_size - 1) // chunk_size
+    # per chunk: the student matmul output (and its gradient) in the input dtype, plus the fp32 student and teacher logits,
+    # their log-probs, the student softmax and the temporaries of the gradient computation
+    plan = plan_chunk_size(
+        BT,
+        H,
+        V,
+        dtype,
+        max_chunk_bytes=max_chunk_bytes,
+        n_logits=1,
+        n_fp32_logits=6,
+        has_grad_weight=student_weight.requires_grad,
+        device=device,
+    )
+    logger.debug("fused_linear_jsd_forward chunk plan: %s", plan)
+    chunk_size = plan.chunk_size
+    num_chunks = plan.num_chunks
 
     grad_weight = torch.zeros_like(student_weight, device=device) if student_weight.requires_grad else None
     grad_input = torch.zeros_like(student_input)
@@ -178,6 +195,7 @@ class LigerFusedLinearJSDFunction(torch.autograd.Function):
         jsd_beta: float = 0.5,
         ignore_index: int = -100,
         temperature: float = 1.0,
+        max_chunk_bytes=None,
     ):
         """
         Args:
@@ -190,6 +208,8 @@ class LigerFusedLinearJSDFunction(torch.autograd.Function):
             jsd_beta (float): coefficient beta of generalized JSD in the interval [0, 1]. It implements forward/reverse KL when beta equals 0 and 1 respectively. Default: `0.5`
             ignore_index (int): the index to ignore. Default: -100
             temperature (float): temperature in softmax function to control the output probability distribution. Default: `1.0`
+            max_chunk_bytes (Optional[Union[int, str]]): memory budget in bytes used to pick the chunk size, or "auto" to use the free
+                device memory. See `plan_chunk_size`. Default: `None`, keeping the logits chunk about the size of `student_input`
 
         Returns:
             loss (torch.Tensor): generalized JSD
@@ -212,6 +232,7 @@ class LigerFusedLinearJSDFunction(torch.autograd.Function):
             ignore_index,
             has_label,
             temperature,
+            max_chunk_bytes,
         )
         # downcast to dtype and store for backward
         ctx.save_for_backward(
@@ -225,4 +246,4 @@ class LigerFusedLinearJSDFunction(torch.autograd.Function):
     def backward(ctx, grad_output):
         (grad_input, grad_weight) = ctx.saved_tensors
         grad_input, grad_weight = fused_linear_jsd_backward(grad_output, grad_input, grad_weight)
-        return (grad_input, grad_weight, None, None, None, None, None, None)
+        return (grad_input, grad_weight, None, None, None, None, None, None, None)
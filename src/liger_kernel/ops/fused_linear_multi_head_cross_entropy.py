@@ -0,0 +1,228 @@
+import logging
+
+import torch
+import triton
+
+from liger_kernel.ops.cross_entropy import liger_cross_entropy_kernel
+from liger_kernel.ops.fused_linear_cross_entropy import MAX_FUSED_SIZE
+from liger_kernel.ops.fused_linear_cross_entropy import shift_targets
+from liger_kernel.ops.utils import amp_custom_bwd
+from liger_kernel.ops.utils import amp_custom_fwd
+from liger_kernel.ops.utils import element_mul_kernel
+from liger_kernel.ops.utils import is_hip
+from liger_kernel.ops.utils import plan_chunk_size
+
+logger = logging.getLogger(__name__)
+
+
+def fused_linear_multi_head_cross_entropy_forward(
+    _input,
+    weights,
+    target,
+    shifts,
+    head_weights=None,
+    ignore_index=-100,
+    reduction="mean",
+    softcap=None,
+    accum_dtype=None,
+    max_chunk_bytes=None,
+):
+    assert reduction in {"mean", "sum"}, f"reduction must be 'mean' or 'sum'. Got: {reduction}"
+    assert _input.ndim == 3 and target.shape == _input.shape[:2], (
+        f"expected _input of shape (B, T, H) and target of shape (B, T). Got: {_input.shape} and {target.shape}"
+    )
+    n_heads = len(weights)
+    assert len(shifts) == n_heads, f"expected one target shift per head. Got: {len(shifts)} for {n_heads} heads"
+    head_weights = [1.0] * n_heads if head_weights is None else list(head_weights)
+    assert len(head_weights) == n_heads, f"expected one loss weight per head. Got: {len(head_weights)}"
+    assert all(w >= 0 for w in head_weights), f"head loss weights must be non-negative. Got: {head_weights}"
+    device = _input.device
+    input_requires_grad = _input.requires_grad
+
+    B, T, H = _input.shape
+    BT = B * T
+    _input = _input.reshape(BT, H)
+    V = max(weight.shape[0] for weight in weights)
+
+    # one head's logits chunk (+ its float copy in the kernel) is alive at a time, the heads share the input chunk
+    plan = plan_chunk_size(
+        BT,
+        H,
+        V,
+        _input.dtype,
+        max_chunk_bytes=max_chunk_bytes,
+        accum_dtype=accum_dtype,
+        has_grad_weight=input_requires_grad and any(weight.requires_grad for weight in weights),
+        device=device,
+        has_grad_input=input_requires_grad,
+    )
+    logger.debug("fused_linear_multi_head_cross_entropy_forward chunk plan: %s", plan)
+    chunk_size = plan.chunk_size
+    num_chunks = plan.num_chunks
+
+    grad_input = torch.zeros_like(_input) if input_requires_grad else None
+    grad_weights = [
+        torch.zeros_like(weight, dtype=accum_dtype or weight.dtype)
+        if input_requires_grad and weight.requires_grad
+        else None
+        for weight in weights
+    ]
+
+    targets = [shift_targets(target, shift, ignore_index).reshape(BT) for shift in shifts]
+    # The kernel divides the loss and the gradient of every row by `n_non_ignore` with reduction="mean", and by 1 for
+    # the sum, so that loss_1d holds the unweighted loss of every head.
+    n_non_ignores = [(head_target != ignore_index).sum().item() for head_target in targets]
+    normalizers = [max(n, 1) if reduction == "mean" else 1 for n in n_non_ignores]
+    loss_1d = torch.zeros(n_heads, BT, dtype=torch.float32, device=device)
+
+    for chunk_id in range(num_chunks):
+        start_idx = chunk_id * chunk_size
+        end_idx = min((chunk_id + 1) * chunk_size, BT)
+        _input_chunk = _input[start_idx:end_idx]  # chunk_size x H
+
+        for head, weight in enumerate(weights):
+            # when doing matmul, use the original precision
+            logits_chunk = (_input_chunk @ weight.t()).contiguous()  # chunk_size x V
+            target_chunk = targets[head][start_idx:end_idx]
+            loss_1d_slice = loss_1d[head, start_idx:end_idx]
+            n_cols = weight.shape[0]
+
+            # Here we calculate the gradient of logits_chunk in place so we can save memory.
+            liger_cross_entropy_kernel[(logits_chunk.shape[0],)](
+                X_ptr=logits_chunk,
+                X_stride=logits_chunk.stride(-2),
+                Y_ptr=target_chunk,
+                Y_stride=target_chunk.stride(-1),  # always 1
+                weight_ptr=None,
+                loss_ptr=loss_1d_slice,
+                z_loss_ptr=None,
+                loss_stride=loss_1d_slice.stride(-1),  # always 1
+                token_accuracy_ptr=None,
+                token_accuracy_stride=0,
+                predicted_tokens_ptr=None,
+                predicted_tokens_stride=0,
+                n_cols=n_cols,
+                n_non_ignore=normalizers[head],
+                sum_non_ignore_weight=normalizers[head],
+                weight_sum=0.0,
+                ignore_index=ignore_index,
+                lse_square_scale=0.0,
+                label_smoothing=0.0,
+                reduction="mean",
+                softcap=softcap,
+                RETURN_Z_LOSS=False,
+                RETURN_TOKEN_ACCURACY=False,
+                RETURN_PREDICTED_TOKENS=False,
+                HAS_WEIGHT=False,
+                HAS_SOFTCAPPING=True if softcap is not None else False,
+                HAS_GRADIENTS=input_requires_grad,
+                BLOCK_SIZE=min(MAX_FUSED_SIZE, triton.next_power_of_2(n_cols)),
+                num_warps=32 if not is_hip() else 16,
+            )
+
+            # a head with a zero loss weight (switched off, or not ramped in yet) only reports its loss
+            if not input_requires_grad or head_weights[head] == 0:
+                continue
+
+            grad_logits_chunk = logits_chunk  # chunk_size x V
+            if head_weights[head] != 1:
+                grad_logits_chunk.mul_(head_weights[head])
+            # the input gradient of all heads is summed into the same rows
+            grad_input[start_idx:end_idx].addmm_(grad_logits_chunk, weight)
+            if grad_weights[head] is not None:
+                # in-place add upcasts to the accumulator dtype without materializing a (V, H) fp32 copy
+                grad_weights[head].add_(torch.mm(grad_logits_chunk.t(), _input_chunk))
+
+    # unweighted loss of every head, e.g. for logging
+    head_losses = loss_1d.sum(dim=-1)
+    loss = (head_losses * torch.tensor(head_weights, dtype=torch.float32, device=device)).sum()
+
+    grad_input = grad_input.view(B, T, H) if grad_input is not None else None
+    grad_weights = [
+        grad_weight.to(weight.dtype) if grad_weight is not None else None
+        for grad_weight, weight in zip(grad_weights, weights)
+    ]
+    return loss, head_losses, grad_input, grad_weights
+
+
+class LigerMultiHeadFusedLinearCrossEntropyFunction(torch.autograd.Function):
+    @staticmethod
+    @amp_custom_fwd
+    def forward(
+        ctx,
+        _input,
+        target,
+        shifts,
+        head_weights=None,
+        ignore_index=-100,
+        reduction="mean",
+        softcap=None,
+        accum_dtype=None,
+        max_chunk_bytes=None,
+        *weights,
+    ):
+        """
+        Fusing several lm_heads (e.g. Medusa or multi-token-prediction heads) with their cross entropy losses. Every
+        chunk of `_input` is loaded once and goes through all the heads, whose input gradients are summed in place.
+
+        _input: (B, T, H) where B is batch size, T is sequence length, H is hidden dimension.
+        target: (B, T) labels, already shifted for a head with shift 0.
+        shifts: head i predicts target[:, t + shifts[i]] from _input[:, t]; positions past the end are ignored.
+        head_weights: non-negative loss weight of every head, e.g. 0 to switch a head off (its loss is still reported).
+            Default: `None`, i.e. 1 for every head.
+        ignore_index: the index to ignore in the target
+        reduction: "mean" averages every head over its own non-ignored tokens, "sum" sums them. The head losses are
+            then summed with their weights.
+        softcap (float): the upper threshold for scaling logits to the range (-softcap, +softcap)
+        accum_dtype (torch.dtype): the dtype of intermediate result buffers for the weight gradient accumulations.
+        max_chunk_bytes (Optional[Union[int, str]]): memory budget in bytes used to pick the chunk size, see `plan_chunk_size`.
+        weights: the (V, H) weight of every head.
+
+        Returns the weighted total loss and the (n_heads,) unweighted loss of every head, which is not differentiable.
+        """
+        loss, head_losses, grad_input, grad_weights = fused_linear_multi_head_cross_entropy_forward(
+            _input=_input,
+            weights=weights,
+            target=target,
+            shifts=shifts,
+            head_weights=head_weights,
+            ignore_index=ignore_index,
+            reduction=reduction,
+            softcap=softcap,
+            accum_dtype=accum_dtype,
+            max_chunk_bytes=max_chunk_bytes,
+        )
+        ctx.save_for_backward(grad_input, *grad_weights)
+        ctx.mark_non_differentiable(head_losses)
+        return loss, head_losses
+
+    @staticmethod
+    @amp_custom_bwd
+    def backward(ctx, grad_output, grad_output2):
+        grad_input, *grad_weights = ctx.saved_tensors
+        # If cross entropy is the last layer, grad_output is 1.0. Skip the mul to save time
+        if not torch.equal(grad_output, torch.tensor(1.0, device=grad_output.device)):
+            for grad in (grad_input, *grad_weights):
+                if grad is None:
+                    continue
+                grad_2d = grad.view(-1, grad.shape[-1])
+                element_mul_kernel[(grad_2d.shape[0],)](
+                    grad_2d,
+                    grad_2d.stride(-2),
+                    grad_output,
+                    grad_2d.shape[-1],
+                    BLOCK_SIZE=min(MAX_FUSED_SIZE, triton.next_power_of_2(grad_2d.shape[-1])),
+                    num_warps=32 if not is_hip() else 16,
+                )
+        return (
+            grad_input,
+            None,  # target
+            None,  # shifts
+            None,  # head_weights
+            None,  # ignore_index
+            None,  # reduction
+            None,  # softcap
+            None,  # accum_dtype
+            None,  # max_chunk_bytes
+            *grad_weights,
+        )
@@ -0,0 +1,348 @@
+import logging
+import operator
+
+import torch
+import triton
+import triton.language as tl
+
+from liger_kernel.ops.fused_linear_cross_entropy import fused_linear_cross_entropy_backward
+from liger_kernel.ops.utils import amp_custom_bwd
+from liger_kernel.ops.utils import amp_custom_fwd
+from liger_kernel.ops.utils import compare_version
+from liger_kernel.ops.utils import is_hip
+from liger_kernel.ops.utils import plan_chunk_size
+from liger_kernel.utils import infer_device
+from liger_kernel.utils import is_npu_available
+
+if compare_version("triton", operator.ge, "3.0.0") and not is_npu_available():
+    try:
+        # typical import path with dispatch available
+        from triton.language.extra.libdevice import tanh
+    except ModuleNotFoundError:
+        # for working with NGC containers
+        from triton.language.extra.cuda.libdevice import tanh
+else:
+    from triton.language.math import tanh
+
+logger = logging.getLogger(__name__)
+
+MAX_FUSED_SIZE = 2048 if infer_device() == "npu" else 65536 // 2
+
+
+@triton.jit
+def liger_soft_target_cross_entropy_kernel(
+    X_ptr,
+    X_stride,
+    Y_ptr,
+    Y_stride,
+    P_ptr,
+    P_stride,
+    loss_ptr,
+    loss_stride,
+    n_cols,
+    n_targets,
+    n_non_ignore,
+    ignore_index,
+    softcap,
+    reduction: tl.constexpr,
+    HAS_SOFTCAPPING: tl.constexpr,
+    HAS_GRADIENTS: tl.constexpr,
+    BLOCK_SIZE: tl.constexpr,
+    BLOCK_K: tl.constexpr,
+):
+    """
+    Cross entropy -sum_k p_k * log softmax(X)_{y_k} against a sparse target distribution: every row has `n_targets`
+    (class, probability) pairs, e.g. the top-k of a teacher. Like `liger_cross_entropy_kernel`, the gradient overwrites
+    the logits in place.
+
+    Parameters:
+    X_ptr: Pointer to input tensor.
+    X_stride (int): The stride of the input tensor.
+    Y_ptr: Pointer to the (n_rows, n_targets) target classes. Entries equal to ignore_index are padding.
+    Y_stride (int): The stride of the target classes.
+    P_ptr: Pointer to the (n_rows, n_targets) target probabilities.
+    P_stride (int): The stride of the target probabilities.
+    loss_ptr: Pointer to tensor to store the loss.
+    loss_stride (int): The stride of the loss tensor.
+    n_cols (int): The number of columns in the input tensor.
+    n_targets (int): The number of (class, probability) pairs per row.
+    n_non_ignore (float): The number of rows with at least one target class.
+    ignore_index (int): The padding index of the target classes. A row with only padding is ignored.
+    softcap (float): The upper threshold for scaling logits to the range (-softcap, +softcap).
+    reduction (str): The string for the reduction to apply
+    BLOCK_SIZE (int): The block size for Triton operations.
+    BLOCK_K (int): The block size of the target pairs, at least n_targets.
+    HAS_SOFTCAPPING (bool): The boolean value to determine whether applying soft-capping or not.
+    HAS_GRADIENTS (bool): The boolean value to determine whether calculating gradients in forward pass.
+    """
+    program_id = tl.program_id(0).to(tl.int64)
+    X_ptr += program_id * X_stride
+    Y_ptr += program_id * Y_stride
+    P_ptr += program_id * P_stride
+    loss_ptr += program_id * loss_stride
+
+    k_offsets = tl.arange(0, BLOCK_K)
+    y = tl.load(Y_ptr + k_offsets, mask=k_offsets < n_targets, other=ignore_index)
+    is_target = y != ignore_index
+    if tl.sum(is_target.to(tl.int32)) == 0:
+        for i in range(0, n_cols, BLOCK_SIZE):
+            X_offsets = i + tl.arange(0, BLOCK_SIZE)
+            tl.store(X_ptr + X_offsets, 0.0, mask=X_offsets < n_cols)
+        return
+
+    y = tl.where(is_target, y, 0)
+    p = tl.load(P_ptr + k_offsets, mask=is_target, other=0.0).cast(tl.float32)
+    p_sum = tl.sum(p)
+    # the target logits are read before the gradient pass overwrites them
+    X_y = tl.load(X_ptr + y, mask=is_target, other=0.0).cast(tl.float32)
+    if HAS_SOFTCAPPING:
+        intermediate_y = tanh(X_y / softcap)
+        X_y = softcap * intermediate_y
+
+    # [Online softmax] first pass: find max + sum, see liger_cross_entropy_kernel
+    m = float("-inf")
+    d = 0.0
+    for i in range(0, n_cols, BLOCK_SIZE):
+        X_offsets = i + tl.arange(0, BLOCK_SIZE)
+        X_block = tl.load(X_ptr + X_offsets, mask=X_offsets < n_cols, other=float("-inf")).cast(tl.float32)
+        if HAS_SOFTCAPPING:
+            X_block = softcap * tanh(X_block / softcap)
+        m_new = tl.maximum(m, tl.max(X_block))
+        d = d * tl.exp(m - m_new) + tl.sum(tl.exp(X_block - m_new))
+        m = m_new
+    lse = m + tl.log(d)
+
+    # loss = -sum_k p_k * (X_{y_k} - lse) = sum_k(p_k) * lse - sum_k p_k * X_{y_k}
+    # dx_i = sum_k(p_k) * softmax(x_i) - p_k if i == y_k else sum_k(p_k) * softmax(x_i)
+    if HAS_GRADIENTS:
+        for i in range(0, n_cols, BLOCK_SIZE):
+            X_offsets = i + tl.arange(0, BLOCK_SIZE)
+            X_block = tl.load(X_ptr + X_offsets, mask=X_offsets < n_cols, other=float("-inf")).cast(tl.float32)
+            if HAS_SOFTCAPPING:
+                intermediate = tanh(X_block / softcap)
+                X_block = softcap * intermediate
+            X_block = tl.exp(X_block - m) / d * p_sum
+            if reduction == "mean":
+                X_block = X_block / n_non_ignore
+            if HAS_SOFTCAPPING:
+                X_block = X_block * (1 - intermediate * intermediate)
+            tl.store(X_ptr + X_offsets, X_block, mask=X_offsets < n_cols)
+
+        # the gradient pass must be written before the target classes are overwritten
+        tl.debug_barrier()
+
+        dX_y = tl.exp(X_y - m) / d * p_sum - p
+        if reduction == "mean":
+            dX_y = dX_y / n_non_ignore
+        if HAS_SOFTCAPPING:
+            dX_y = dX_y * (1 - intermediate_y * intermediate_y)
+        tl.store(X_ptr + y, dX_y, mask=is_target)
+
+    loss = p_sum * lse - tl.sum(p * X_y)
+    if reduction == "mean":
+        loss = loss / n_non_ignore
+    tl.store(loss_ptr, loss)
+
+
+def _merge_duplicate_targets(target_indices, target_probs, ignore_index):
+    """
+    Sum the probabilities of the classes that appear several times in a row, so that every class is written once by the
+    kernel. The merged pairs are moved to the front of the row, the remaining slots are padded with ignore_index.
+    """
+    target_indices, order = target_indices.sort(dim=-1)
+    target_probs = target_probs.gather(-1, order)
+    is_first = torch.ones_like(target_indices, dtype=torch.bool)
+    is_first[:, 1:] = target_indices[:, 1:] != target_indices[:, :-1]
+    slot = is_first.cumsum(dim=-1) - 1
+    merged_indices = torch.full_like(target_indices, ignore_index).scatter_(-1, slot, target_indices)
+    merged_probs = torch.zeros_like(target_probs, dtype=torch.float32).scatter_add_(-1, slot, target_probs.float())
+    return merged_indices, merged_probs
+
+
+def fused_linear_soft_target_cross_entropy_forward(
+    _input,
+    weight,
+    target_indices,
+    target_probs,
+    bias=None,
+    ignore_index=-100,
+    reduction="mean",
+    softcap=None,
+    accum_dtype=None,
+    max_chunk_bytes=None,
+):
+    assert target_indices.shape == target_probs.shape, (
+        f"target_indices and target_probs must have the same shape. Got: {target_indices.shape} and {target_probs.shape}"
+    )
+    # the gradients are summed over the rows in forward, so a per-row grad_output could not be applied in backward
+    assert reduction in {"mean", "sum"}, f"reduction must be 'mean' or 'sum'. Got: {reduction}"
+    device = _input.device
+    input_requires_grad = _input.requires_grad
+
+    BT, H = _input.shape
+    V = weight.shape[0]
+    K = target_indices.shape[-1]
+    BLOCK_SIZE = min(MAX_FUSED_SIZE, triton.next_power_of_2(V))
+
+    # logits chunk (+ the copy made by adding the bias)
+    plan = plan_chunk_size(
+        BT,
+        H,
+        V,
+        _input.dtype,
+        max_chunk_bytes=max_chunk_bytes,
+        n_logits=1 + (bias is not None),
+        accum_dtype=accum_dtype,
+        has_grad_weight=input_requires_grad and weight.requires_grad,
+        device=device,
+        has_grad_input=input_requires_grad,
+    )
+    logger.debug("fused_linear_soft_target_cross_entropy_forward chunk plan: %s", plan)
+    chunk_size = plan.chunk_size
+    num_chunks = plan.num_chunks
+
+    grad_input = torch.zeros_like(_input, device=device) if input_requires_grad else None
+    if input_requires_grad:
+        grad_weight = (
+            torch.zeros_like(weight, dtype=accum_dtype or weight.dtype, device=device) if weight.requires_grad else None
+        )
+        grad_bias = torch.zeros_like(bias, dtype=accum_dtype or bias.dtype, device=device) if bias is not None else None
+    else:
+        grad_weight = grad_bias = None
+
+    loss_1d = torch.zeros(BT, dtype=torch.float32, device=device)
+    # the kernel stores the gradient of each target class once per pair: a repeated class would keep only the last one
+    if K > 1:
+        target_indices, target_probs = _merge_duplicate_targets(target_indices, target_probs, ignore_index)
+    target_indices = target_indices.contiguous()
+    target_probs = target_probs.contiguous()
+    # rows whose target classes are all padding are ignored
+    n_non_ignore = (target_indices != ignore_index).any(dim=-1).sum().item()
+
+    for chunk_id in range(num_chunks):
+        start_idx = chunk_id * chunk_size
+        end_idx = min((chunk_id + 1) * chunk_size, BT)
+        _input_chunk = _input[start_idx:end_idx]  # chunk_size x H
+
+        # when doing matmul, use the original precision
+        logits_chunk = _input_chunk @ weight.t()  # chunk_size x V
+        if bias is not None:
+            logits_chunk = logits_chunk + bias
+        logits_chunk = logits_chunk.contiguous()
+        target_indices_chunk = target_indices[start_idx:end_idx]
+        target_probs_chunk = target_probs[start_idx:end_idx]
+        loss_1d_slice = loss_1d[start_idx:end_idx]
+
+        # Here we calculate the gradient of logits_chunk in place so we can save memory.
+        liger_soft_target_cross_entropy_kernel[(logits_chunk.shape[0],)](
+            X_ptr=logits_chunk,
+            X_stride=logits_chunk.stride(-2),
+            Y_ptr=target_indices_chunk,
+            Y_stride=target_indices_chunk.stride(-2),
+            P_ptr=target_probs_chunk,
+            P_stride=target_probs_chunk.stride(-2),
+            loss_ptr=loss_1d_slice,
+            loss_stride=loss_1d_slice.stride(-1),  # always 1
+            n_cols=V,
+            n_targets=K,
+            n_non_ignore=n_non_ignore,
+            ignore_index=ignore_index,
+            softcap=softcap,
+            reduction=reduction,
+            HAS_SOFTCAPPING=True if softcap is not None else False,
+            HAS_GRADIENTS=input_requires_grad,
+            BLOCK_SIZE=BLOCK_SIZE,
+            BLOCK_K=triton.next_power_of_2(K),
+            num_warps=32 if not is_hip() else 16,
+        )
+
+        if not input_requires_grad:
+            continue
+
+        grad_logits_chunk = logits_chunk  # chunk_size x V
+        grad_input[start_idx:end_idx] = grad_logits_chunk @ weight
+        if grad_weight is not None:
+            grad_weight.add_(torch.mm(grad_logits_chunk.t(), _input_chunk))
+        if grad_bias is not None:
+            grad_bias.add_(grad_logits_chunk.sum(dim=0))
+
+    loss = torch.sum(loss_1d)
+
+    grad_weight = grad_weight.to(weight.dtype) if grad_weight is not None else None
+    grad_bias = grad_bias.to(bias.dtype) if grad_bias is not None else None
+
+    return loss, grad_input, grad_weight, grad_bias
+
+
+class LigerFusedLinearSoftTargetCrossEntropyFunction(torch.autograd.Function):
+    @staticmethod
+    @amp_custom_fwd
+    def forward(
+        ctx,
+        _input,
+        weight,
+        target_indices,
+        target_probs,
+        bias=None,
+        ignore_index=-100,
+        reduction="mean",
+        softcap=None,
+        accum_dtype=None,
+        max_chunk_bytes=None,
+    ):
+        """
+        Fusing the last linear layer with a cross entropy against sparse soft targets, -sum_k p_k * log q_{y_k}, e.g. for
+        distillation from the top-k of a teacher or mixup-style label mixing. The gradients are computed chunk by chunk in
+        the forward pass, as in `LigerFusedLinearCrossEntropyFunction`.
+
+        _input: (B*T, H) where B is batch size, T is sequence length, H is hidden dimension.
+        weight: (V, H) where V is the number of classes
+        target_indices: (B*T, K) target classes of every row, padded with ignore_index. The probabilities of a class
+            repeated in a row add up
+        target_probs: (B*T, K) probability of every target class. Rows need not sum to 1.
+        bias: (V) where V is the number of classes
+        ignore_index: the padding index of target_indices. Rows with only padding get zero loss and gradients
+        reduction: reduction to apply. "mean" averages over the rows that have at least one target class, "sum" sums
+            over the rows. "none" is not supported, as the gradients are summed over the rows in the forward pass
+        softcap (float): the upper threshold for scaling logits to the range (-softcap, +softcap)
+        accum_dtype (torch.dtype): the dtype of intermediate result buffers for weight and bias gradient accumulations.
+        max_chunk_bytes (Optional[Union[int, str]]): memory budget in bytes used to pick the chunk size, see `plan_chunk_size`.
+        """
+        loss, grad_input, grad_weight, grad_bias = fused_linear_soft_target_cross_entropy_forward(
+            _input=_input,
+            weight=weight,
+            target_indices=target_indices,
+            target_probs=target_probs,
+            bias=bias,
+            ignore_index=ignore_index,
+            reduction=reduction,
+            softcap=softcap,
+            accum_dtype=accum_dtype,
+            max_chunk_bytes=max_chunk_bytes,
+        )
+        ctx.save_for_backward(
+            grad_input.detach() if grad_input is not None else None,
+            grad_weight.detach() if grad_weight is not None else None,
+            grad_bias.detach() if grad_bias is not None else None,
+        )
+        return loss
+
+    @staticmethod
+    @amp_custom_bwd
+    def backward(ctx, grad_output):
+        (grad_input, grad_weight, grad_bias) = ctx.saved_tensors
+        grad_input, grad_weight, grad_bias = fused_linear_cross_entropy_backward(
+            grad_output, grad_input, grad_weight, grad_bias
+        )
+        return (
+            grad_input,
+            grad_weight,
+            None,
+            None,
+            grad_bias,
+            None,  # ignore_index
+            None,  # reduction
+            None,  # softcap
+            None,  # accum_dtype
+            None,  # max_chunk_bytes
+        )
@@ -2,6 +2,10 @@ import torch
 import triton
 import triton.language as tl
 
+from liger_kernel.ops.fused_linear_cross_entropy import fused_linear_cross_entropy_backward
+from liger_kernel.ops.fused_linear_cross_entropy import fused_linear_cross_entropy_forward
+from liger_kernel.ops.utils import plan_chunk_size
+
 # Loss type constants for Triton constexpr branching
 # GRPO/DAPO/BNPO/DR_GRPO all use the same per-token loss computation (standard PPO clipping)
 _LOSS_TYPE_GRPO: tl.constexpr = tl.constexpr(0)
@@ -78,6 +82,43 @@ def fused_selective_log_softmax(logits: torch.Tensor, input_ids: torch.Tensor, t
     return log_p
 
 
+# same as fused_selective_log_softmax, but from the hidden states (B, L+1, H) and the lm_head weight (V, H): the logits
+# are only materialized chunk by chunk by fused linear cross entropy, whose kernel computes the logsumexp online, and
+# logp = -loss. Peak memory is O(chunk_size * V) instead of O(B * L * V). It does not require grad.
+@torch.no_grad
+def fused_linear_selective_log_softmax(
+    hidden_states: torch.Tensor,
+    weight: torch.Tensor,
+    input_ids: torch.Tensor,
+    temperature: float = 0.9,
+    mask=None,
+    bias=None,
+    max_chunk_bytes=None,
+):
+    B, L_ADD_1, H = hidden_states.shape
+    L = L_ADD_1 - 1
+    target = input_ids[:, -L:].reshape(B * L)
+    if mask is not None:
+        # masked tokens are ignored (logp = 0 as in fused_selective_log_softmax) and skip the lm_head matmul
+        target = target.masked_fill(mask[:, -L:].reshape(B * L) == 0, -100)
+    # logits / temperature = (hidden_states / temperature) @ weight.T + bias / temperature
+    _input = hidden_states[:, :-1].reshape(B * L, H)
+    if temperature != 1.0:
+        _input = _input / temperature
+        bias = bias / temperature if bias is not None else None
+    loss = fused_linear_cross_entropy_forward(
+        _input=_input,
+        weight=weight.detach(),
+        target=target,
+        bias=bias,
+        ignore_index=-100,
+        reduction="none",
+        compact_ignored_tokens=mask is not None,
+        max_chunk_bytes=max_chunk_bytes,
+    )[0]
+    return loss.float().neg_().view(B, L)
+
+
 # @triton.autotune([triton.Config({"BLOCK_N":BLOCK_N}, num_stages=ns, num_warps=nw)
 #                   for BLOCK_N in [2048, 4096, 8192]
 #                   for ns in [1, 2, 4]
@@ -547,6 +588,67 @@ def _reduce_loss(per_token_loss, mask, loss_type, max_completion_length, B, L):
     raise ValueError(f"Unknown loss_type: {loss_type}. Expected one of: grpo, bnpo, dr_grpo, dapo, cispo, sapo, luspo")
 
 
+def _reduce_loss_grad(dloss_input, mask, loss_type, max_completion_length, B, L):
+    """Gradient of `_reduce_loss` with respect to the per-token loss."""
+    if loss_type == "grpo" or loss_type == "sapo":
+        seq_lens_bwd = mask.sum(-1, keepdim=True).clamp(min=1.0)
+        return dloss_input * mask / (seq_lens_bwd * B)
+    elif loss_type == "bnpo":
+        return dloss_input * mask / mask.sum().clamp(min=1.0)
+    elif loss_type == "dr_grpo":
+        max_len = max_completion_length if max_completion_length is not None else L
+        return dloss_input * mask / (B * max_len)
+    elif loss_type == "dapo" or loss_type == "cispo":
+        return dloss_input * mask / _compute_dapo_normalizer(mask)
+    elif loss_type == "luspo":
+        # loss = mean(per_token_loss * seq_lens), mean divides by B*L
+        # (expanded to (B, L): the kernels read the per-token gradient through its strides)
+        seq_lens_bwd = mask.sum(-1, keepdim=True).clamp(min=1.0)
+        return (dloss_input * seq_lens_bwd / (B * L)).expand(B, L)
+    raise ValueError(f"Unknown loss_type: {loss_type}")
+
+
+def _check_grpo_loss_args(loss_type, delta, importance_sampling_level, sapo_temperature_pos, sapo_temperature_neg):
+    # Validate loss_type
+    if loss_type not in _str_to_loss_type:
+        raise ValueError(f"Unknown loss_type '{loss_type}'. Supported types: {list(_str_to_loss_type.keys())}")
+
+    # Validate delta + loss_type combinations
+    if delta is not None and loss_type in ("cispo", "sapo"):
+        raise ValueError(f"delta (two-sided clipping) is not supported for loss_type='{loss_type}'.")
+
+    # Validate sequence-level + loss_type combinations
+    if importance_sampling_level == "sequence" and loss_type in ("cispo", "sapo"):
+        raise ValueError(
+            f"Sequence-level importance sampling is not supported for loss_type='{loss_type}'. "
+            f"Use importance_sampling_level='token' instead."
+        )
+
+    # Validate SAPO temperatures to prevent division by zero or numerical instability
+    if loss_type == "sapo":
+        if sapo_temperature_pos <= 0:
+            raise ValueError(f"sapo_temperature_pos must be positive, got {sapo_temperature_pos}")
+        if sapo_temperature_neg <= 0:
+            raise ValueError(f"sapo_temperature_neg must be positive, got {sapo_temperature_neg}")
+
+
+def _prepare_vllm_is_ratio(vllm_is_ratio, B, L):
+    """Returns the vLLM IS ratio passed to the kernels and its row stride (1 for (B,) and (B, 1), L for (B, L))."""
+    if vllm_is_ratio is None:
+        return None, L  # default to per-token (unused when ptr is None)
+    assert vllm_is_ratio.dim() in (1, 2), (
+        f"vllm_is_ratio must be 1D (B,) or 2D (B, L) / (B, 1), got {vllm_is_ratio.dim()}D"
+    )
+    if vllm_is_ratio.dim() == 2:
+        assert vllm_is_ratio.shape[0] == B and vllm_is_ratio.shape[1] in (1, L), (
+            f"vllm_is_ratio shape must be ({B}, 1) or ({B}, {L}), got {tuple(vllm_is_ratio.shape)}"
+        )
+    else:
+        assert vllm_is_ratio.shape[0] == B, f"vllm_is_ratio shape must be ({B},), got {tuple(vllm_is_ratio.shape)}"
+    vllm_is_ratio = vllm_is_ratio.contiguous()
+    return vllm_is_ratio, vllm_is_ratio.shape[1] if vllm_is_ratio.dim() > 1 else 1
+
+
 class GrpoLossFunction(torch.autograd.Function):
     @staticmethod
     def forward(
@@ -579,31 +681,11 @@ class GrpoLossFunction(torch.autograd.Function):
             f"importance_sampling_level must be 'token' or 'sequence', got {importance_sampling_level}"
         )
 
-        # Validate loss_type
-        if loss_type not in _str_to_loss_type:
-            raise ValueError(f"Unknown loss_type '{loss_type}'. Supported types: {list(_str_to_loss_type.keys())}")
-
-        # Validate delta + loss_type combinations
-        if delta is not None and loss_type in ("cispo", "sapo"):
-            raise ValueError(f"delta (two-sided clipping) is not supported for loss_type='{loss_type}'.")
+        _check_grpo_loss_args(loss_type, delta, importance_sampling_level, sapo_temperature_pos, sapo_temperature_neg)
 
         # Map delta to float for Triton (Triton can't handle None)
         delta_val = 0.0 if delta is None else float(delta)
 
-        # Validate sequence-level + loss_type combinations
-        if importance_sampling_level == "sequence" and loss_type in ("cispo", "sapo"):
-            raise ValueError(
-                f"Sequence-level importance sampling is not supported for loss_type='{loss_type}'. "
-                f"Use importance_sampling_level='token' instead."
-            )
-
-        # Validate SAPO temperatures to prevent division by zero or numerical instability
-        if loss_type == "sapo":
-            if sapo_temperature_pos <= 0:
-                raise ValueError(f"sapo_temperature_pos must be positive, got {sapo_temperature_pos}")
-            if sapo_temperature_neg <= 0:
-                raise ValueError(f"sapo_temperature_neg must be positive, got {sapo_temperature_neg}")
-
         # Convert loss_type string to integer for Triton constexpr
         loss_type_int = _str_to_loss_type[loss_type]
 
@@ -616,23 +698,7 @@ class GrpoLossFunction(torch.autograd.Function):
         mask = completion_mask.float() if completion_mask is not None else torch.ones(B, L, device=logits.device)
 
         # Handle vLLM IS ratio
-        vllm_is_ratio_ptr = None
-        vllm_is_ratio_stride = L  # default to per-token (unused when ptr is None)
-        if vllm_is_ratio is not None:
-            assert vllm_is_ratio.dim() in (1, 2), (
-                f"vllm_is_ratio must be 1D (B,) or 2D (B, L) / (B, 1), got {vllm_is_ratio.dim()}D"
-            )
-            if vllm_is_ratio.dim() == 2:
-                assert vllm_is_ratio.shape[0] == B and vllm_is_ratio.shape[1] in (1, L), (
-                    f"vllm_is_ratio shape must be ({B}, 1) or ({B}, {L}), got {tuple(vllm_is_ratio.shape)}"
-                )
-            else:
-                assert vllm_is_ratio.shape[0] == B, (
-                    f"vllm_is_ratio shape must be ({B},), got {tuple(vllm_is_ratio.shape)}"
-                )
-            vllm_is_ratio = vllm_is_ratio.contiguous()
-            vllm_is_ratio_ptr = vllm_is_ratio
-            vllm_is_ratio_stride = vllm_is_ratio.shape[1] if vllm_is_ratio.dim() > 1 else 1
+        vllm_is_ratio_ptr, vllm_is_ratio_stride = _prepare_vllm_is_ratio(vllm_is_ratio, B, L)
 
         # Allocate outputs
         loss = torch.zeros(B, L, device=logits.device, dtype=torch.float32)
@@ -821,22 +887,8 @@ class GrpoLossFunction(torch.autograd.Function):
         # Compute per-token gradient scaling based on loss_type
         if not reduce:
             dloss = dloss_input
-        elif loss_type == "grpo" or loss_type == "sapo":
-            seq_lens_bwd = mask.sum(-1, keepdim=True).clamp(min=1.0)
-            dloss = dloss_input * mask / (seq_lens_bwd * B)
-        elif loss_type == "bnpo":
-            dloss = dloss_input * mask / mask.sum().clamp(min=1.0)
-        elif loss_type == "dr_grpo":
-            max_len = max_completion_length if max_completion_length is not None else L
-            dloss = dloss_input * mask / (B * max_len)
-        elif loss_type == "dapo" or loss_type == "cispo":
-            dloss = dloss_input * mask / _compute_dapo_normalizer(mask)
-        elif loss_type == "luspo":
-            # loss = mean(per_token_loss * seq_lens), mean divides by B*L
-            seq_lens_bwd = mask.sum(-1, keepdim=True).clamp(min=1.0)
-            dloss = dloss_input * seq_lens_bwd / (B * L)
         else:
-            raise ValueError(f"Unknown loss_type: {loss_type}")
+            dloss = _reduce_loss_grad(dloss_input, mask, loss_type, max_completion_length, B, L)
 
         dlogits = logits.data if inplace else torch.empty_like(logits)
         kwargs = {"BLOCK_N": 4096, "num_stages": 1, "num_warps": 16}
@@ -928,3 +980,212 @@ class GrpoLossFunction(torch.autograd.Function):
             None,
             None,
         )
+
+
+class FusedLinearGrpoLossFunction(torch.autograd.Function):
+    """
+    GrpoLossFunction (token-level importance sampling, reduced loss) computed from the hidden states and the lm_head
+    weight instead of the full (B, L+1, V) logits.
+
+    The sequences are processed in chunks: the logits of a chunk are materialized, run through `_grpo_loss_fwd_kernel`
+    and then overwritten in place by `_grpo_loss_bwd_kernel` with their gradient, which is immediately turned into
+    grad_input / grad_weight / grad_bias as in fused linear cross entropy. Peak memory is O(chunk_size * V).
+    """
+
+    @staticmethod
+    def forward(
+        ctx,
+        _input,
+        weight,
+        bias,
+        old_logp,
+        ref_logp,
+        completion_ids,
+        advantages,
+        completion_mask,
+        temperature,
+        beta,
+        eps_low,
+        eps_high,
+        loss_type="grpo",
+        max_completion_length=None,
+        sapo_temperature_pos=1.0,
+        sapo_temperature_neg=1.05,
+        vllm_is_ratio=None,
+        delta=None,
+        use_bias_correction_kl=False,
+        max_chunk_bytes=None,
+    ):
+        """
+        Args:
+            _input (torch.Tensor): hidden states of shape (B, L+1, H); the last position of every sequence is not scored.
+            weight (torch.Tensor): lm_head weight of shape (V, H).
+            bias (Optional[torch.Tensor]): lm_head bias of shape (V,).
+            max_chunk_bytes (Optional[Union[int, str]]): see `plan_chunk_size`. The chunks contain whole sequences.
+            See GrpoLossFunction for the other arguments.
+        """
+        assert completion_ids.is_contiguous()
+        assert old_logp is None or old_logp.is_contiguous()
+        assert (ref_logp is not None and ref_logp.is_contiguous()) if beta != 0.0 else True
+        _check_grpo_loss_args(loss_type, delta, "token", sapo_temperature_pos, sapo_temperature_neg)
+        delta_val = 0.0 if delta is None else float(delta)
+        loss_type_int = _str_to_loss_type[loss_type]
+
+        _input = _input.contiguous()
+        B, L_ADD_1, H = _input.shape
+        L = L_ADD_1 - 1
+        V = weight.shape[0]
+        device = _input.device
+
+        if completion_mask is not None:
+            assert completion_mask.is_contiguous()
+        mask = completion_mask.float() if completion_mask is not None else torch.ones(B, L, device=device)
+        vllm_is_ratio, vllm_is_ratio_stride = _prepare_vllm_is_ratio(vllm_is_ratio, B, L)
+
+        loss = torch.zeros(B, L, device=device, dtype=torch.float32)
+        lse = torch.zeros_like(loss)
+        is_clipped = torch.zeros_like(loss)
+        kl = torch.zeros_like(loss) if beta != 0.0 else None
+
+        input_requires_grad = _input.requires_grad
+        grad_input = torch.zeros(B * L_ADD_1, H, dtype=_input.dtype, device=device) if input_requires_grad else None
+        grad_weight = torch.zeros_like(weight) if input_requires_grad and weight.requires_grad else None
+        grad_bias = torch.zeros_like(bias) if input_requires_grad and bias is not None else None
+        # the reduction only depends on the mask, so the per-token loss gradient is known before the chunk loop;
+        # grad_output is applied in backward
+        dloss = _reduce_loss_grad(1.0, mask, loss_type, max_completion_length, B, L).float()
+
+        # logits chunk (+ the copy made by adding the bias), chunked over whole sequences
+        plan = plan_chunk_size(
+            B * L_ADD_1,
+            H,
+            V,
+            _input.dtype,
+            max_chunk_bytes=max_chunk_bytes,
+            n_logits=1 + (bias is not None),
+            has_grad_weight=grad_weight is not None,
+            device=device,
+            has_grad_input=input_requires_grad,
+        )
+        seqs_per_chunk = max(1, plan.chunk_size // L_ADD_1)
+
+        for start in range(0, B, seqs_per_chunk):
+            end = min(start + seqs_per_chunk, B)
+            n_seqs = end - start
+            _input_chunk = _input[start:end].view(-1, H)
+            logits_chunk = _input_chunk @ weight.t()
+            if bias is not None:
+                logits_chunk = logits_chunk + bias
+            logits_chunk = logits_chunk.view(n_seqs, L_ADD_1, V)
+            old_logp_chunk = old_logp[start:end] if old_logp is not None else None
+            ref_logp_chunk = ref_logp[start:end] if beta != 0.0 else None
+            completion_mask_chunk = completion_mask[start:end] if completion_mask is not None else None
+            vllm_is_ratio_chunk = vllm_is_ratio[start:end] if vllm_is_ratio is not None else None
+
+            _grpo_loss_fwd_kernel[(n_seqs, L)](
+                logits_chunk,
+                old_logp_chunk,
+                ref_logp_chunk,
+                completion_ids[start:end],
+                completion_mask_chunk,
+                advantages[start:end],
+                vllm_is_ratio_chunk,
+                vllm_is_ratio_stride,
+                loss[start:end],
+                lse[start:end],
+                kl[start:end] if kl is not None else None,
+                is_clipped[start:end],
+                temperature,
+                beta,
+                eps_low,
+                eps_high,
+                loss_type_int,
+                sapo_temperature_pos,
+                sapo_temperature_neg,
+                delta_val,
+                use_bias_correction_kl,
+                L,
+                V,
+                BLOCK_N=2048,
+                num_stages=2,
+                num_warps=1,
+            )
+
+            if input_requires_grad:
+                dloss_chunk = dloss[start:end]
+                # in-place: the logits chunk becomes its gradient
+                _grpo_loss_bwd_kernel[(n_seqs, L)](
+                    dloss_chunk,
+                    logits_chunk,
+                    logits_chunk,
+                    old_logp_chunk,
+                    ref_logp_chunk,
+                    completion_ids[start:end],
+                    advantages[start:end],
+                    completion_mask_chunk,
+                    lse[start:end],
+                    vllm_is_ratio_chunk,
+                    vllm_is_ratio_stride,
+                    temperature,
+                    beta,
+                    eps_low,
+                    eps_high,
+                    loss_type_int,
+                    sapo_temperature_pos,
+                    sapo_temperature_neg,
+                    delta_val,
+                    use_bias_correction_kl,
+                    *dloss_chunk.stride(),
+                    L,
+                    V,
+                    BLOCK_N=4096,
+                    num_stages=1,
+                    num_warps=16,
+                )
+                logits_chunk[:, -1, :] = 0
+                grad_logits_chunk = logits_chunk.view(-1, V)
+                grad_input[start * L_ADD_1 : end * L_ADD_1] = grad_logits_chunk @ weight
+                if grad_weight is not None:
+                    grad_weight.addmm_(grad_logits_chunk.t(), _input_chunk)
+                if grad_bias is not None:
+                    grad_bias.add_(grad_logits_chunk.sum(dim=0))
+
+        ctx.save_for_backward(grad_input, grad_weight, grad_bias)
+        ctx.input_shape = _input.shape
+
+        mask_sum = mask.sum().clamp(min=1.0)
+        kl_mean = (kl * mask).sum() / mask_sum if kl is not None else None
+        clip_ratio = (is_clipped.float() * mask).sum() / mask_sum
+        reduced_loss = _reduce_loss(loss, mask, loss_type, max_completion_length, B, L)
+        return reduced_loss, kl_mean, clip_ratio
+
+    @staticmethod
+    def backward(ctx, grad_output, *grad_metrics):
+        grad_input, grad_weight, grad_bias = ctx.saved_tensors
+        if grad_input is not None:
+            grad_input, grad_weight, grad_bias = fused_linear_cross_entropy_backward(
+                grad_output, grad_input, grad_weight, grad_bias
+            )
+            grad_input = grad_input.view(ctx.input_shape)
+        return (
+            grad_input,
+            grad_weight,
+            grad_bias,
+            None,  # old_logp
+            None,  # ref_logp
+            None,  # completion_ids
+            None,  # advantages
+            None,  # completion_mask
+            None,  # temperature
+            None,  # beta
+            None,  # eps_low
+            None,  # eps_high
+            None,  # loss_type
+            None,  # max_completion_length
+            None,  # sapo_temperature_pos
+            None,  # sapo_temperature_neg
+            None,  # vllm_is_ratio
+            None,  # delta
+            None,  # use_bias_correction_kl
+            None,  # max_chunk_bytes
+        )
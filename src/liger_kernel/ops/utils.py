@@ -14,7 +14,10 @@ import functools
 import importlib
 import operator
 
+from dataclasses import dataclass
 from typing import Callable
+from typing import Optional
+from typing import Union
 
 import torch
 import triton
@@ -150,3 +153,100 @@ def set_large_grf_mode(kernel_args: dict):
     else:
         # API was changed in https://github.com/intel/intel-xpu-backend-for-triton/pull/5430
         kernel_args["grf_mode"] = "large"
+
+
+@dataclass
+class ChunkPlan:
+    """Chunking decision made by `plan_chunk_size`, returned so that callers can log it."""
+
+    chunk_size: int
+    num_chunks: int
+    bytes_per_row: int
+    fixed_bytes: int
+    max_chunk_bytes: Optional[int] = None
+
+
+def get_free_memory_bytes(device) -> Optional[int]:
+    """Return the free memory in bytes on `device`, or None if it cannot be queried (e.g. on cpu)."""
+    device = torch.device(device)
+    try:
+        if device.type == "cuda":
+            return torch.cuda.mem_get_info(device)[0]
+        if device.type == "xpu":
+            return torch.xpu.mem_get_info(device)[0]
+        if device.type == "npu":
+            return torch.npu.mem_get_info(device)[0]
+    except (AttributeError, RuntimeError):
+        pass
+    return None
+
+
+def plan_chunk_size(
+    BT: int,
+    H: int,
+    V: int,
+    dtype: torch.dtype,
+    max_chunk_bytes: Optional[Union[int, str]] = None,
+    n_logits: int = 1,
+    n_fp32_logits: int = 0,
+    accum_dtype: Optional[torch.dtype] = None,
+    has_grad_weight: bool = True,
+    device=None,
+    n_cols: Optional[int] = None,
+    has_grad_input: bool = True,
+) -> ChunkPlan:
+    """
+    Pick the number of rows processed per chunk by the fused linear losses (FLCE, fused linear JSD).
+
+    Every chunk materializes `n_logits` tensors of shape (chunk_size, V) in `dtype` and `n_fp32_logits` in fp32 (e.g. the
+    extra softmax copies of token scaling or the fp32 log-probs of JSD). Independently of the chunk size, the weight
+    gradient needs a (V, H) accumulator in `accum_dtype` and the transient (V, H) `grad_logits.t() @ input` in `dtype`.
+
+    Args:
+        BT (int): total number of rows.
+        H (int): hidden size.
+        V (int): vocab size.
+        dtype (torch.dtype): dtype of the logits.
+        max_chunk_bytes (Optional[Union[int, str]]): memory budget in bytes for the weight gradient buffers and the logits
+            chunks (the (BT, H) input and its gradient are not counted). "auto" uses the memory currently free on `device`.
+            If None (or if the free memory cannot be queried), the default heuristic keeps the logits chunk about the size
+            of the (BT, H) input.
+        n_logits (int): number of (chunk_size, V) tensors in `dtype` alive at the peak of a chunk.
+        n_fp32_logits (int): number of (chunk_size, V) fp32 tensors alive at the peak of a chunk.
+        accum_dtype (Optional[torch.dtype]): dtype of the weight gradient accumulator.
+        has_grad_weight (bool): whether the weight gradient is computed.
+        device: device used to query the free memory when `max_chunk_bytes` is "auto".
+        n_cols (Optional[int]): number of columns of the per-chunk logits tensors when the vocab is processed in tiles of
+            `n_cols` columns. Default: `None`, i.e. `V`.
+        has_grad_input (bool): whether the (BT, H) input gradient is allocated. Without it, the default heuristic lets the
+            logits chunk take the memory of the input gradient as well, i.e. about twice the size of the (BT, H) input.
+    """
+    if max_chunk_bytes == "auto":
+        max_chunk_bytes = get_free_memory_bytes(device) if device is not None else None
+
+    n_cols = V if n_cols is None else min(n_cols, V)
+    bytes_per_row = n_cols * (n_logits * dtype.itemsize + n_fp32_logits * torch.float32.itemsize)
+    fixed_bytes = 0
+    if has_grad_weight:
+        # the weight gradient accumulator plus the transient per-chunk update added into it
+        fixed_bytes = V * H * ((accum_dtype or dtype).itemsize + dtype.itemsize)
+
+    if max_chunk_bytes is None:
+        # inputs have shape: BT x H, materialized logits have shape: BT x V
+        # to keep the logits chunk as large as the input: inc_factor = (V+H-1)//H, chunk_size = (BT + inc_factor - 1)//inc_factor
+        # for ex: BT = 4096*4, V = 32000, H = 4096 ==> inc_factor = 8, chunk_size = 2048
+        # without the input gradient: inc_factor = (V+2H-1)//(2H), e.g. chunk_size = 4096 in the example above
+        inc_factor = triton.cdiv(n_cols, H if has_grad_input else 2 * H)
+        chunk_size = triton.next_power_of_2(triton.cdiv(max(BT, 1), inc_factor))
+    else:
+        # largest power of 2 that fits the budget, but no larger than needed to cover all rows at once
+        max_rows = max(1, (max_chunk_bytes - fixed_bytes) // bytes_per_row)
+        chunk_size = min(1 << (max_rows.bit_length() - 1), triton.next_power_of_2(max(BT, 1)))
+
+    return ChunkPlan(
+        chunk_size=chunk_size,
+        num_chunks=triton.cdiv(BT, chunk_size),
+        bytes_per_row=bytes_per_row,
+        fixed_bytes=fixed_bytes,
+        max_chunk_bytes=max_chunk_bytes,
+    )
@@ -0,0 +1,299 @@
+import logging
+
+import torch
+import torch.distributed as dist
+import triton
+
+from liger_kernel.ops.fused_linear_cross_entropy import _cross_entropy_grad_logits
+from liger_kernel.ops.fused_linear_cross_entropy import _cross_entropy_loss_from_stats
+from liger_kernel.ops.fused_linear_cross_entropy import fused_linear_cross_entropy_backward
+from liger_kernel.ops.utils import amp_custom_bwd
+from liger_kernel.ops.utils import amp_custom_fwd
+from liger_kernel.ops.utils import plan_chunk_size
+
+logger = logging.getLogger(__name__)
+
+
+def vocab_parallel_fused_linear_cross_entropy_forward(
+    _input,
+    weight,
+    target,
+    bias=None,
+    ce_weight=None,
+    ignore_index=-100,
+    lse_square_scale=0.0,
+    label_smoothing=0.0,
+    reduction="mean",
+    softcap=None,
+    return_z_loss=False,
+    accum_dtype=None,
+    process_group=None,
+    max_chunk_bytes=None,
+):
+    """
+    Fused linear cross entropy with the lm_head sharded along the vocab dimension across the ranks of `process_group`.
+
+    Every rank holds the same `_input` (BT, H) and `target` (BT,) with global vocab ids, and a contiguous shard
+    `weight` (V / world_size, H) (and `bias` / `ce_weight` (V / world_size,)) starting at rank * V / world_size.
+    For each chunk of rows, the local logits are reduced to per-row statistics that are all-reduced across the shards:
+    the max (one MAX all-reduce), then the sum of exponentials, the target logit and the label smoothing sum (one SUM
+    all-reduce). The class weights of the targets are gathered once for all rows before the chunk loop. The loss is then identical on all ranks, and each rank gets the gradient
+    of its own weight shard. The partial input gradients of the shards are summed with a single all-reduce at the end.
+    """
+    # the weight gradient is summed over the rows in forward, so a per-row grad_output of reduction="none" could not
+    # be applied to it in backward
+    assert reduction in {"mean", "sum"}, f"reduction must be 'mean' or 'sum'. Got: {reduction}"
+    device = _input.device
+    input_requires_grad = _input.requires_grad
+
+    world_size = dist.get_world_size(process_group)
+    rank = dist.get_rank(process_group)
+
+    BT, H = _input.shape
+    V_local = weight.shape[0]
+    V = V_local * world_size
+    vocab_start_index = rank * V_local
+
+    # fp32 logits, softmax and gradient (+ the bias copy in the input dtype)
+    plan = plan_chunk_size(
+        BT,
+        H,
+        V_local,
+        _input.dtype,
+        max_chunk_bytes=max_chunk_bytes,
+        n_logits=1 + (bias is not None),
+        n_fp32_logits=3,
+        accum_dtype=accum_dtype,
+        has_grad_weight=input_requires_grad and weight.requires_grad,
+        device=device,
+    )
+    chunk_size = plan.chunk_size
+    if max_chunk_bytes == "auto":
+        # the free memory differs across ranks, but all of them must run the same collectives
+        chunk_size = torch.tensor(chunk_size, device=device)
+        dist.all_reduce(chunk_size, op=dist.ReduceOp.MIN, group=process_group)
+        chunk_size = chunk_size.item()
+    num_chunks = triton.cdiv(BT, chunk_size)
+    logger.debug("vocab_parallel_fused_linear_cross_entropy_forward chunk plan: %s, chunk_size=%d", plan, chunk_size)
+
+    if input_requires_grad:
+        grad_input = torch.zeros_like(_input, device=device)
+        grad_weight = (
+            torch.zeros_like(weight, dtype=accum_dtype or weight.dtype, device=device) if weight.requires_grad else None
+        )
+        grad_bias = torch.zeros_like(bias, dtype=accum_dtype or bias.dtype, device=device) if bias is not None else None
+    else:
+        grad_input = grad_weight = grad_bias = None
+
+    target_mask = target != ignore_index
+    # position of each target in the local shard, and whether it falls into it
+    local_target = target - vocab_start_index
+    in_shard = target_mask & (local_target >= 0) & (local_target < V_local)
+    local_target = local_target.where(in_shard, 0)
+
+    n_non_ignore = target_mask.sum()
+    eps = label_smoothing / V
+    weight_y = weight_sum = sum_non_ignore_weight = None
+    if ce_weight is not None:
+        assert ce_weight.shape[0] == V_local, (
+            f"If given, ce_weight has to be the local shard of size V / world_size. Got: {ce_weight.shape}"
+        )
+        ce_weight = ce_weight.float()
+        # class weight of every target, gathered from the shard that owns it
+        weight_y = ce_weight.gather(0, local_target) * in_shard
+        weight_sum = ce_weight.sum()
+        stats = torch.cat([weight_y, weight_sum.view(1)])
+        dist.all_reduce(stats, group=process_group)
+        weight_y, weight_sum = stats[:BT], stats[BT]
+        sum_non_ignore_weight = (weight_y * target_mask).sum()
+
+    loss_1d = torch.zeros(BT, dtype=torch.float32, device=device)
+    z_loss_1d = torch.zeros(BT, dtype=torch.float32, device=device) if return_z_loss else None
+
+    for chunk_id in range(num_chunks):
+        start_idx = chunk_id * chunk_size
+        end_idx = min((chunk_id + 1) * chunk_size, BT)
+        _input_chunk = _input[start_idx:end_idx]  # chunk_size x H
+        target_mask_chunk = target_mask[start_idx:end_idx]
+        in_shard_chunk = in_shard[start_idx:end_idx]
+        local_target_chunk = local_target[start_idx:end_idx].unsqueeze(-1)
+
+        # when doing matmul, use the original precision
+        logits_chunk = _input_chunk @ weight.t()  # chunk_size x V_local
+        if bias is not None:
+            logits_chunk = logits_chunk + bias
+        logits_chunk = logits_chunk.float()
+        if softcap is not None:
+            intermediate = torch.tanh(logits_chunk / softcap)
+            logits_chunk = softcap * intermediate
+
+        # 1. global max of every row
+        m = logits_chunk.max(dim=-1).values
+        dist.all_reduce(m, op=dist.ReduceOp.MAX, group=process_group)
+
+        # 2. global sum of exponentials, target logit and label smoothing term of every row
+        exp_logits = torch.exp(logits_chunk - m.unsqueeze(-1))
+        stats = [exp_logits.sum(dim=-1), logits_chunk.gather(-1, local_target_chunk).squeeze(-1) * in_shard_chunk]
+        if label_smoothing > 0:
+            if ce_weight is not None:
+                stats.append(-eps * (logits_chunk * ce_weight).sum(dim=-1))
+            else:
+                stats.append(-eps * logits_chunk.sum(dim=-1))
+        stats = torch.stack(stats)
+        dist.all_reduce(stats, group=process_group)
+        d, x_y = stats[0], stats[1]
+        lse = m + torch.log(d)
+
+        weight_y_chunk = weight_y[start_idx:end_idx] if ce_weight is not None else None
+        loss, z_loss = _cross_entropy_loss_from_stats(
+            lse,
+            x_y,
+            stats[2] if label_smoothing > 0 else None,
+            weight_y_chunk,
+            weight_sum,
+            target_mask_chunk,
+            V,
+            lse_square_scale,
+            label_smoothing,
+            reduction,
+            n_non_ignore,
+            sum_non_ignore_weight,
+        )
+        loss_1d[start_idx:end_idx] = loss
+        if return_z_loss:
+            z_loss_1d[start_idx:end_idx] = z_loss
+
+        if not input_requires_grad:
+            continue
+
+        # gradient of the loss w.r.t. the local logits
+        one_hot_y = torch.zeros_like(logits_chunk).scatter_(
+            -1, local_target_chunk, in_shard_chunk.unsqueeze(-1).float()
+        )
+        grad_logits_chunk = _cross_entropy_grad_logits(
+            logits_chunk,
+            lse,
+            one_hot_y,
+            weight_y_chunk,
+            ce_weight,
+            weight_sum,
+            target_mask_chunk,
+            V,
+            lse_square_scale,
+            label_smoothing,
+            reduction,
+            n_non_ignore,
+            sum_non_ignore_weight,
+        )
+        if softcap is not None:
+            grad_logits_chunk = grad_logits_chunk * (1 - intermediate * intermediate)
+        grad_logits_chunk = grad_logits_chunk.to(_input.dtype)
+
+        grad_input[start_idx:end_idx] = grad_logits_chunk @ weight
+        if grad_weight is not None:
+            grad_weight.add_(torch.mm(grad_logits_chunk.t(), _input_chunk))
+        if grad_bias is not None:
+            grad_bias.add_(grad_logits_chunk.sum(dim=0))
+
+    if input_requires_grad:
+        # the input is shared by all shards: its gradient is the sum of their contributions
+        dist.all_reduce(grad_input, group=process_group)
+
+    loss = torch.sum(loss_1d)
+    z_loss = torch.sum(z_loss_1d) if return_z_loss else None
+
+    grad_weight = grad_weight.to(weight.dtype) if grad_weight is not None else None
+    grad_bias = grad_bias.to(bias.dtype) if grad_bias is not None else None
+
+    return loss, z_loss, grad_input, grad_weight, grad_bias
+
+
+class LigerVocabParallelFusedLinearCrossEntropyFunction(torch.autograd.Function):
+    @staticmethod
+    @amp_custom_fwd
+    def forward(
+        ctx,
+        _input,
+        weight,
+        target,
+        bias=None,
+        ce_weight=None,
+        ignore_index=-100,
+        lse_square_scale=0.0,
+        label_smoothing=0.0,
+        reduction="mean",
+        softcap=None,
+        return_z_loss: bool = False,
+        accum_dtype=None,
+        process_group=None,
+        max_chunk_bytes=None,
+    ):
+        """
+        Fusing the last linear layer with cross-entropy loss for a lm_head sharded along the vocab dimension
+        (tensor parallelism). The gradients are computed in the forward pass, as in `LigerFusedLinearCrossEntropyFunction`.
+
+        _input: (B*T, H), the same on all ranks of `process_group`.
+        target: (B*T) where each value is in [0, V-1], the same on all ranks.
+        weight: (V / world_size, H), the shard of this rank, which holds the classes [rank * V / world_size, (rank + 1) * V / world_size)
+        bias: (V / world_size), the shard of this rank
+        ce_weight: (V / world_size), the shard of this rank of the manual rescaling weight given to each class
+        ignore_index: the index to ignore in the target
+        lse_square_scale (float): The scaler of (logsumexp(_input)) ^ 2 adding to the loss for the stability of training.
+        label_smoothing (float): The amount of smoothing when computing the loss, where 0.0 means no smoothing.
+        reduction: reduction to apply, "mean" or "sum" ("none" is not supported)
+        softcap (float): The upper threshold for scaling logits to the range (-softcap, +softcap).
+        return_z_loss (bool): When `return_z_loss` is `True`, also returns the z loss.
+        accum_dtype (torch.dtype): the dtype of intermediate result buffers for weight and bias gradient accumulations. Default: `None`
+        process_group (torch.distributed.ProcessGroup): the tensor parallel group the vocab is sharded across. Default: `None`, the default group
+        max_chunk_bytes (Optional[Union[int, str]]): memory budget in bytes used to pick the chunk size. See `plan_chunk_size`. Default: `None`
+        """
+        loss, z_loss, grad_input, grad_weight, grad_bias = vocab_parallel_fused_linear_cross_entropy_forward(
+            _input=_input,
+            weight=weight,
+            target=target,
+            bias=bias,
+            ce_weight=ce_weight,
+            ignore_index=ignore_index,
+            lse_square_scale=lse_square_scale,
+            label_smoothing=label_smoothing,
+            reduction=reduction,
+            softcap=softcap,
+            return_z_loss=return_z_loss,
+            accum_dtype=accum_dtype,
+            process_group=process_group,
+            max_chunk_bytes=max_chunk_bytes,
+        )
+        ctx.save_for_backward(
+            grad_input.detach() if grad_input is not None else None,
+            grad_weight.detach() if grad_weight is not None else None,
+            grad_bias.detach() if grad_bias is not None else None,
+        )
+        ctx.return_z_loss = return_z_loss
+        return loss, z_loss
+
+    @staticmethod
+    @amp_custom_bwd
+    def backward(ctx, grad_output, grad_output2):
+        if ctx.return_z_loss:
+            del grad_output2  # z_loss is only for logging
+        (grad_input, grad_weight, grad_bias) = ctx.saved_tensors
+        if grad_input is not None:
+            grad_input, grad_weight, grad_bias = fused_linear_cross_entropy_backward(
+                grad_output, grad_input, grad_weight, grad_bias
+            )
+        return (
+            grad_input,
+            grad_weight,
+            None,
+            grad_bias,
+            None,  # ce_weight
+            None,  # ignore_index
+            None,  # lse_square_scale
+            None,  # label_smoothing
+            None,  # reduction
+            None,  # softcap
+            None,  # return_z_loss
+            None,  # accum_dtype
+            None,  # process_group
+            None,  # max_chunk_bytes
+        )
@@ -7,6 +7,9 @@ from liger_kernel.transformers.cross_entropy import LigerCrossEntropyLoss  # noq
 from liger_kernel.transformers.dyt import LigerDyT  # noqa: F401
 from liger_kernel.transformers.fused_add_rms_norm import LigerFusedAddRMSNorm  # noqa: F401
 from liger_kernel.transformers.fused_linear_cross_entropy import LigerFusedLinearCrossEntropyLoss  # noqa: F401
+from liger_kernel.transformers.fused_linear_cross_entropy import LigerFusedLinearSoftTargetCrossEntropyLoss  # noqa: F401
+from liger_kernel.transformers.fused_linear_cross_entropy import LigerMultiHeadFusedLinearCrossEntropyLoss  # noqa: F401
+from liger_kernel.transformers.fused_linear_cross_entropy import LigerVocabParallelFusedLinearCrossEntropyLoss  # noqa: F401
 from liger_kernel.transformers.fused_linear_jsd import LigerFusedLinearJSD  # noqa: F401
 from liger_kernel.transformers.geglu import LigerGEGLUMLP  # noqa: F401
 from liger_kernel.transformers.jsd import LigerJSD  # noqa: F401
@@ -167,6 +170,8 @@ __all__ = [
     "LigerDyT",
     "LigerFusedLinearCrossEntropyLoss",
     "LigerFusedLinearJSD",
+    "LigerFusedLinearSoftTargetCrossEntropyLoss",
+    "LigerMultiHeadFusedLinearCrossEntropyLoss",
     "LigerGEGLUMLP",
     "LigerJSD",
     "LigerLayerNorm",
@@ -189,6 +194,7 @@ __all__ = [
     "LigerMultiTokenAttention",
     "LigerSoftmax",
     "LigerSparsemax",
+    "LigerVocabParallelFusedLinearCrossEntropyLoss",
 ]
 
 # Add transformer-dependent symbols only if available
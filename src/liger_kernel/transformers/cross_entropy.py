@@ -18,6 +18,10 @@ class LigerCrossEntropyLoss(torch.nn.Module):
         return_z_loss: bool = False,
         return_token_accuracy: bool = False,
         return_predicted_tokens: bool = False,
+        sync_free: bool = False,
+        check_target_bounds: bool = False,
+        return_topk: int = 0,
+        return_entropy: bool = False,
     ):
         super().__init__()
         assert (label_smoothing >= 0) and (label_smoothing <= 1), (
@@ -38,24 +42,46 @@ class LigerCrossEntropyLoss(torch.nn.Module):
         self.return_z_loss = return_z_loss
         self.return_token_accuracy = return_token_accuracy
         self.return_predicted_tokens = return_predicted_tokens
+        self.sync_free = sync_free
+        self.check_target_bounds = check_target_bounds
+        self.return_topk = return_topk
+        self.return_entropy = return_entropy
 
     def forward(self, _input: torch.Tensor, target: torch.Tensor):
-        loss, z_loss, token_accuracy, predicted_tokens = LigerCrossEntropyFunction.apply(
-            _input,
-            target,
-            self.weight,
-            self.ignore_index,
-            self.lse_square_scale,
-            self.label_smoothing,
-            self.reduction,
-            self.softcap,
-            self.return_z_loss,
-            self.return_token_accuracy,
-            self.return_predicted_tokens,
+        loss, z_loss, token_accuracy, predicted_tokens, topk_ids, topk_logprobs, entropy = (
+            LigerCrossEntropyFunction.apply(
+                _input,
+                target,
+                self.weight,
+                self.ignore_index,
+                self.lse_square_scale,
+                self.label_smoothing,
+                self.reduction,
+                self.softcap,
+                self.return_z_loss,
+                self.return_token_accuracy,
+                self.return_predicted_tokens,
+                self.sync_free,
+                self.check_target_bounds,
+                self.return_topk,
+                self.return_entropy,
+            )
         )
-        if not self.return_z_loss and not self.return_token_accuracy and not self.return_predicted_tokens:
+        if (
+            not self.return_z_loss
+            and not self.return_token_accuracy
+            and not self.return_predicted_tokens
+            and not self.return_topk
+            and not self.return_entropy
+        ):
             return loss
 
         return CrossEntropyOutput(
-            loss=loss, z_loss=z_loss, token_accuracy=token_accuracy, predicted_tokens=predicted_tokens
+            loss=loss,
+            z_loss=z_loss,
+            token_accuracy=token_accuracy,
+            predicted_tokens=predicted_tokens,
+            topk_ids=topk_ids,
+            topk_logprobs=topk_logprobs,
+            entropy=entropy,
         )
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from typing import Optional
+from typing import Union
 
 import torch
 
@@ -9,6 +10,7 @@ from liger_kernel.ops import LigerDyTFunction
 from liger_kernel.ops import LigerFusedAddRMSNormFunction
 from liger_kernel.ops import LigerFusedLinearCrossEntropyFunction
 from liger_kernel.ops import LigerFusedLinearJSDFunction
+from liger_kernel.ops import LigerFusedLinearSoftTargetCrossEntropyFunction
 from liger_kernel.ops import LigerFusedNeighborhoodAttentionFunction
 from liger_kernel.ops import LigerGELUMulFunction
 from liger_kernel.ops import LigerGroupNormFunction
@@ -18,6 +20,7 @@ from liger_kernel.ops import LigerLayerNormFunction
 from liger_kernel.ops import LigerMHCCoeffsFunction
 from liger_kernel.ops import LigerMHCPostResFunction
 from liger_kernel.ops import LigerMHCPreFunction
+from liger_kernel.ops import LigerMultiHeadFusedLinearCrossEntropyFunction
 from liger_kernel.ops import LigerMultiTokenAttentionFunction
 from liger_kernel.ops import LigerPolyNormFunction
 from liger_kernel.ops import LigerQwen2VLMRopeFunction
@@ -28,6 +31,8 @@ from liger_kernel.ops import LigerSiLUMulFunction
 from liger_kernel.ops import LigerSoftmaxFunction
 from liger_kernel.ops import LigerSparsemaxFunction
 from liger_kernel.ops import LigerTVDLossFunction
+from liger_kernel.ops import LigerVocabParallelFusedLinearCrossEntropyFunction
+from liger_kernel.ops import fused_linear_cross_entropy_sequence_nll
 
 
 @dataclass
@@ -36,6 +41,9 @@ class CrossEntropyOutput:
     z_loss: Optional[torch.Tensor] = None
     token_accuracy: Optional[torch.Tensor] = None
     predicted_tokens: Optional[torch.Tensor] = None
+    topk_ids: Optional[torch.Tensor] = None
+    topk_logprobs: Optional[torch.Tensor] = None
+    entropy: Optional[torch.Tensor] = None
 
 
 # conform to the function signature in https://pytorch.org/docs/stable/generated/torch.nn.functional.cross_entropy.html
@@ -54,8 +62,12 @@ def liger_cross_entropy(
     return_z_loss: bool = False,
     return_token_accuracy: bool = False,
     return_predicted_tokens: bool = False,
+    sync_free: bool = False,
+    check_target_bounds: bool = False,
+    return_topk: int = 0,
+    return_entropy: bool = False,
 ):
-    loss, z_loss, token_accuracy, predicted_tokens = LigerCrossEntropyFunction.apply(
+    loss, z_loss, token_accuracy, predicted_tokens, topk_ids, topk_logprobs, entropy = LigerCrossEntropyFunction.apply(
         input,
         target,
         weight,
@@ -67,13 +79,29 @@ def liger_cross_entropy(
         return_z_loss,
         return_token_accuracy,
         return_predicted_tokens,
+        sync_free,
+        check_target_bounds,
+        return_topk,
+        return_entropy,
     )
 
-    if not return_z_loss and not return_token_accuracy and not return_predicted_tokens:
+    if (
+        not return_z_loss
+        and not return_token_accuracy
+        and not return_predicted_tokens
+        and not return_topk
+        and not return_entropy
+    ):
         return loss
 
     return CrossEntropyOutput(
-        loss=loss, z_loss=z_loss, token_accuracy=token_accuracy, predicted_tokens=predicted_tokens
+        loss=loss,
+        z_loss=z_loss,
+        token_accuracy=token_accuracy,
+        predicted_tokens=predicted_tokens,
+        topk_ids=topk_ids,
+        topk_logprobs=topk_logprobs,
+        entropy=entropy,
     )
 
 
@@ -93,8 +121,118 @@ def liger_fused_linear_cross_entropy(
     use_token_scaling: bool = False,
     return_token_accuracy: bool = False,
     return_predicted_tokens: bool = False,
+    compact_ignored_tokens: bool = False,
+    sync_free: bool = False,
+    check_target_bounds: bool = False,
+    max_chunk_bytes: Optional[Union[int, str]] = None,
+    grad_mode: str = "eager",
+    accumulate_grad_weight: bool = False,
+    process_group=None,
+    vocab_tile_size: Optional[int] = None,
+    num_sampled: Optional[int] = None,
+    sampler: str = "log_uniform",
+    sampling_probs=None,
+    token_weights=None,
+    return_topk: int = 0,
+    return_entropy: bool = False,
+    shift: int = 0,
+    cu_seqlens=None,
 ):
-    loss, z_loss, token_accuracy, predicted_tokens = LigerFusedLinearCrossEntropyFunction.apply(
+    loss, z_loss, token_accuracy, predicted_tokens, topk_ids, topk_logprobs, entropy = (
+        LigerFusedLinearCrossEntropyFunction.apply(
+            input,
+            weight,
+            target,
+            bias,
+            ce_weight,
+            ignore_index,
+            lse_square_scale,
+            label_smoothing,
+            reduction,
+            softcap,
+            return_z_loss,
+            accum_dtype,
+            use_token_scaling,
+            return_token_accuracy,
+            return_predicted_tokens,
+            compact_ignored_tokens,
+            sync_free,
+            check_target_bounds,
+            max_chunk_bytes,
+            grad_mode,
+            accumulate_grad_weight,
+            process_group,
+            vocab_tile_size,
+            num_sampled,
+            sampler,
+            sampling_probs,
+            token_weights,
+            return_topk,
+            return_entropy,
+            shift,
+            cu_seqlens,
+        )
+    )
+
+    if (
+        not return_z_loss
+        and not return_token_accuracy
+        and not return_predicted_tokens
+        and not return_topk
+        and not return_entropy
+    ):
+        return loss
+
+    return CrossEntropyOutput(
+        loss=loss,
+        z_loss=z_loss,
+        token_accuracy=token_accuracy,
+        predicted_tokens=predicted_tokens,
+        topk_ids=topk_ids,
+        topk_logprobs=topk_logprobs,
+        entropy=entropy,
+    )
+
+
+def liger_fused_linear_cross_entropy_sequence_nll(
+    input,
+    weight,
+    target,
+    bias=None,
+    ignore_index: int = -100,
+    softcap: Optional[float] = None,
+    max_chunk_bytes: Optional[Union[int, str]] = None,
+    compact_ignored_tokens: bool = False,
+):
+    return fused_linear_cross_entropy_sequence_nll(
+        input,
+        weight,
+        target,
+        bias,
+        ignore_index,
+        softcap,
+        max_chunk_bytes,
+        compact_ignored_tokens,
+    )
+
+
+def liger_vocab_parallel_fused_linear_cross_entropy(
+    input,
+    weight,
+    target,
+    bias=None,
+    ce_weight=None,
+    ignore_index: int = -100,
+    lse_square_scale: float = 0.0,
+    label_smoothing: float = 0.0,
+    reduction: str = "mean",
+    softcap: Optional[float] = None,
+    return_z_loss: bool = False,
+    accum_dtype=None,
+    process_group=None,
+    max_chunk_bytes: Optional[Union[int, str]] = None,
+):
+    loss, z_loss = LigerVocabParallelFusedLinearCrossEntropyFunction.apply(
         input,
         weight,
         target,
@@ -107,17 +245,70 @@ def liger_fused_linear_cross_entropy(
         softcap,
         return_z_loss,
         accum_dtype,
-        use_token_scaling,
-        return_token_accuracy,
-        return_predicted_tokens,
+        process_group,
+        max_chunk_bytes,
     )
-
-    if not return_z_loss and not return_token_accuracy and not return_predicted_tokens:
+    if not return_z_loss:
         return loss
+    return CrossEntropyOutput(loss=loss, z_loss=z_loss)
 
-    return CrossEntropyOutput(
-        loss=loss, z_loss=z_loss, token_accuracy=token_accuracy, predicted_tokens=predicted_tokens
+
+def liger_fused_linear_soft_target_cross_entropy(
+    input,
+    weight,
+    target_indices,
+    target_probs,
+    bias=None,
+    ignore_index: int = -100,
+    reduction: str = "mean",
+    softcap: Optional[float] = None,
+    accum_dtype=None,
+    max_chunk_bytes: Optional[Union[int, str]] = None,
+):
+    return LigerFusedLinearSoftTargetCrossEntropyFunction.apply(
+        input,
+        weight,
+        target_indices,
+        target_probs,
+        bias,
+        ignore_index,
+        reduction,
+        softcap,
+        accum_dtype,
+        max_chunk_bytes,
+    )
+
+
+def liger_multi_head_fused_linear_cross_entropy(
+    input,
+    weights,
+    target,
+    shifts=None,
+    head_weights=None,
+    ignore_index: int = -100,
+    reduction: str = "mean",
+    softcap: Optional[float] = None,
+    accum_dtype=None,
+    max_chunk_bytes: Optional[Union[int, str]] = None,
+    return_head_losses: bool = False,
+):
+    weights = weights.unbind(0) if isinstance(weights, torch.Tensor) else tuple(weights)
+    shifts = list(shifts) if shifts is not None else list(range(1, len(weights) + 1))
+    loss, head_losses = LigerMultiHeadFusedLinearCrossEntropyFunction.apply(
+        input,
+        target,
+        shifts,
+        head_weights,
+        ignore_index,
+        reduction,
+        softcap,
+        accum_dtype,
+        max_chunk_bytes,
+        *weights,
     )
+    if not return_head_losses:
+        return loss
+    return loss, head_losses
 
 
 def liger_fused_linear_jsd(
@@ -129,6 +320,7 @@ def liger_fused_linear_jsd(
     jsd_beta: float = 0.5,
     ignore_index: int = -100,
     temperature: float = 1.0,
+    max_chunk_bytes: Optional[Union[int, str]] = None,
 ):
     return LigerFusedLinearJSDFunction.apply(
         student_input,
@@ -139,6 +331,7 @@ def liger_fused_linear_jsd(
         jsd_beta,
         ignore_index,
         temperature,
+        max_chunk_bytes,
     )
 
 
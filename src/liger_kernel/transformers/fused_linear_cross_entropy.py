@@ -1,8 +1,14 @@
+from typing import List
 from typing import Optional
+from typing import Sequence
+from typing import Union
 
 import torch
 
 from liger_kernel.ops import LigerFusedLinearCrossEntropyFunction
+from liger_kernel.ops import LigerFusedLinearSoftTargetCrossEntropyFunction
+from liger_kernel.ops import LigerMultiHeadFusedLinearCrossEntropyFunction
+from liger_kernel.ops import LigerVocabParallelFusedLinearCrossEntropyFunction
 from liger_kernel.transformers.functional import CrossEntropyOutput
 
 
@@ -20,6 +26,20 @@ class LigerFusedLinearCrossEntropyLoss(torch.nn.Module):
         use_token_scaling: bool = False,
         return_token_accuracy: bool = False,
         return_predicted_tokens: bool = False,
+        compact_ignored_tokens: bool = False,
+        sync_free: bool = False,
+        check_target_bounds: bool = False,
+        max_chunk_bytes: Optional[Union[int, str]] = None,
+        grad_mode: str = "eager",
+        accumulate_grad_weight: bool = False,
+        process_group: Optional[torch.distributed.ProcessGroup] = None,
+        vocab_tile_size: Optional[int] = None,
+        num_sampled: Optional[int] = None,
+        sampler: str = "log_uniform",
+        sampling_probs: Optional[torch.Tensor] = None,
+        return_topk: int = 0,
+        return_entropy: bool = False,
+        shift: int = 0,
     ):
         super().__init__()
         assert (label_smoothing >= 0) and (label_smoothing <= 1), (
@@ -29,8 +49,13 @@ class LigerFusedLinearCrossEntropyLoss(torch.nn.Module):
             "mean",
             "sum",
             "none",
-        }, f"reduction must be 'mean' or 'sum' or 'none'. Got: {reduction}"
+            "sequence_mean",
+        }, f"reduction must be 'mean', 'sum', 'none' or 'sequence_mean'. Got: {reduction}"
         assert softcap is None or softcap > 0, f"softcap must greater than 0.0 or None. Got: {softcap}"
+        assert grad_mode in {"eager", "deferred"}, f"grad_mode must be 'eager' or 'deferred'. Got: {grad_mode}"
+        assert sampler in {"uniform", "unigram", "log_uniform"}, (
+            f"sampler must be 'uniform', 'unigram' or 'log_uniform'. Got: {sampler}"
+        )
         self.ce_weight = ce_weight
         self.ignore_index = ignore_index
         self.lse_square_scale = lse_square_scale
@@ -42,9 +67,120 @@ class LigerFusedLinearCrossEntropyLoss(torch.nn.Module):
         self.use_token_scaling = use_token_scaling
         self.return_token_accuracy = return_token_accuracy
         self.return_predicted_tokens = return_predicted_tokens
+        self.compact_ignored_tokens = compact_ignored_tokens
+        self.sync_free = sync_free
+        self.check_target_bounds = check_target_bounds
+        self.max_chunk_bytes = max_chunk_bytes
+        self.grad_mode = grad_mode
+        self.accumulate_grad_weight = accumulate_grad_weight
+        self.process_group = process_group
+        self.vocab_tile_size = vocab_tile_size
+        self.num_sampled = num_sampled
+        self.sampler = sampler
+        self.sampling_probs = sampling_probs
+        self.return_topk = return_topk
+        self.return_entropy = return_entropy
+        self.shift = shift
+
+    def forward(self, lin_weight, _input, target, bias=None, token_weights=None, cu_seqlens=None):
+        loss, z_loss, token_accuracy, predicted_tokens, topk_ids, topk_logprobs, entropy = (
+            LigerFusedLinearCrossEntropyFunction.apply(
+                _input,
+                lin_weight,
+                target,
+                bias,
+                self.ce_weight,
+                self.ignore_index,
+                self.lse_square_scale,
+                self.label_smoothing,
+                self.reduction,
+                self.softcap,
+                self.return_z_loss,
+                self.accum_dtype,
+                self.use_token_scaling,
+                self.return_token_accuracy,
+                self.return_predicted_tokens,
+                self.compact_ignored_tokens,
+                self.sync_free,
+                self.check_target_bounds,
+                self.max_chunk_bytes,
+                self.grad_mode,
+                self.accumulate_grad_weight,
+                self.process_group,
+                self.vocab_tile_size,
+                # the sampled softmax is only used for training, eval steps get the exact loss
+                self.num_sampled if self.training else None,
+                self.sampler,
+                self.sampling_probs,
+                token_weights,
+                self.return_topk,
+                self.return_entropy,
+                self.shift,
+                cu_seqlens,
+            )
+        )
+        if (
+            not self.return_z_loss
+            and not self.return_token_accuracy
+            and not self.return_predicted_tokens
+            and not self.return_topk
+            and not self.return_entropy
+        ):
+            return loss
+
+        return CrossEntropyOutput(
+            loss=loss,
+            z_loss=z_loss,
+            token_accuracy=token_accuracy,
+            predicted_tokens=predicted_tokens,
+            topk_ids=topk_ids,
+            topk_logprobs=topk_logprobs,
+            entropy=entropy,
+        )
+
+
+class LigerVocabParallelFusedLinearCrossEntropyLoss(torch.nn.Module):
+    """
+    Fused linear cross entropy for a lm_head sharded along the vocab dimension (tensor parallelism).
+
+    `lin_weight` (and `bias`, `ce_weight`) are the shards of this rank: the classes
+    [rank * V / world_size, (rank + 1) * V / world_size) of `process_group`. `_input` and `target` (global class ids)
+    are the same on all ranks, and so is the returned loss. `reduction` is "mean" or "sum": the gradients are computed
+    in the forward pass, so a per-token loss (reduction="none") is not supported.
+    """
+
+    def __init__(
+        self,
+        ce_weight: Optional[torch.FloatTensor] = None,
+        ignore_index: int = -100,
+        lse_square_scale: float = 0.0,
+        label_smoothing: float = 0.0,
+        reduction: str = "mean",
+        softcap: Optional[float] = None,
+        return_z_loss: bool = False,
+        accum_dtype: Optional[torch.dtype] = None,
+        process_group: Optional[torch.distributed.ProcessGroup] = None,
+        max_chunk_bytes: Optional[Union[int, str]] = None,
+    ):
+        super().__init__()
+        assert (label_smoothing >= 0) and (label_smoothing <= 1), (
+            f"label_smoothing must be between 0.0 and 1.0. Got: {label_smoothing}"
+        )
+        assert reduction in {"mean", "sum"}, f"reduction must be 'mean' or 'sum'. Got: {reduction}"
+        assert softcap is None or softcap > 0, f"softcap must greater than 0.0 or None. Got: {softcap}"
+        self.ce_weight = ce_weight
+        self.ignore_index = ignore_index
+        self.lse_square_scale = lse_square_scale
+        self.label_smoothing = label_smoothing
+        self.reduction = reduction
+        self.softcap = softcap
+        self.return_z_loss = return_z_loss
+        self.accum_dtype = accum_dtype
+        self.process_group = process_group
+        self.max_chunk_bytes = max_chunk_bytes
 
     def forward(self, lin_weight, _input, target, bias=None):
-        loss, z_loss, token_accuracy, predicted_tokens = LigerFusedLinearCrossEntropyFunction.apply(
+        loss, z_loss = LigerVocabParallelFusedLinearCrossEntropyFunction.apply(
             _input,
             lin_weight,
             target,
@@ -57,13 +193,104 @@ class LigerFusedLinearCrossEntropyLoss(torch.nn.Module):
             self.softcap,
             self.return_z_loss,
             self.accum_dtype,
-            self.use_token_scaling,
-            self.return_token_accuracy,
-            self.return_predicted_tokens,
+            self.process_group,
+            self.max_chunk_bytes,
         )
-        if not self.return_z_loss and not self.return_token_accuracy and not self.return_predicted_tokens:
+        if not self.return_z_loss:
             return loss
+        return CrossEntropyOutput(loss=loss, z_loss=z_loss)
 
-        return CrossEntropyOutput(
-            loss=loss, z_loss=z_loss, token_accuracy=token_accuracy, predicted_tokens=predicted_tokens
+
+class LigerFusedLinearSoftTargetCrossEntropyLoss(torch.nn.Module):
+    """
+    Fused linear cross entropy against sparse soft targets: every row has K (class, probability) pairs, e.g. the top-k
+    of a teacher for distillation or the mixed labels of mixup. `target_indices` (B*T, K) are padded with
+    `ignore_index`, `target_probs` (B*T, K) need not sum to 1. `reduction` is "mean" or "sum".
+    """
+
+    def __init__(
+        self,
+        ignore_index: int = -100,
+        reduction: str = "mean",
+        softcap: Optional[float] = None,
+        accum_dtype: Optional[torch.dtype] = None,
+        max_chunk_bytes: Optional[Union[int, str]] = None,
+    ):
+        super().__init__()
+        assert reduction in {"mean", "sum"}, f"reduction must be 'mean' or 'sum'. Got: {reduction}"
+        assert softcap is None or softcap > 0, f"softcap must greater than 0.0 or None. Got: {softcap}"
+        self.ignore_index = ignore_index
+        self.reduction = reduction
+        self.softcap = softcap
+        self.accum_dtype = accum_dtype
+        self.max_chunk_bytes = max_chunk_bytes
+
+    def forward(self, lin_weight, _input, target_indices, target_probs, bias=None):
+        return LigerFusedLinearSoftTargetCrossEntropyFunction.apply(
+            _input,
+            lin_weight,
+            target_indices,
+            target_probs,
+            bias,
+            self.ignore_index,
+            self.reduction,
+            self.softcap,
+            self.accum_dtype,
+            self.max_chunk_bytes,
+        )
+
+
+class LigerMultiHeadFusedLinearCrossEntropyLoss(torch.nn.Module):
+    """
+    Fused linear cross entropy over several lm_heads sharing the same hidden states, e.g. the base lm_head and the
+    Medusa heads, or multi-token-prediction heads. Head i predicts `target[:, t + shifts[i]]` from `_input[:, t]`, and
+    the total loss is the sum of the head losses weighted by `head_weights`.
+
+    The heads are given either as a stacked (n_heads, V, H) weight or as a list of (V, H) weights. `_input` is (B, T, H)
+    and `target` the unshifted (B, T) labels. Default shifts are 1, 2, ..., n_heads.
+    """
+
+    def __init__(
+        self,
+        shifts: Optional[Sequence[int]] = None,
+        head_weights: Optional[Sequence[float]] = None,
+        ignore_index: int = -100,
+        reduction: str = "mean",
+        softcap: Optional[float] = None,
+        accum_dtype: Optional[torch.dtype] = None,
+        max_chunk_bytes: Optional[Union[int, str]] = None,
+        return_head_losses: bool = False,
+    ):
+        super().__init__()
+        assert reduction in {
+            "mean",
+            "sum",
+        }, f"reduction must be 'mean' or 'sum'. Got: {reduction}"
+        assert softcap is None or softcap > 0, f"softcap must greater than 0.0 or None. Got: {softcap}"
+        self.shifts = list(shifts) if shifts is not None else None
+        self.head_weights = list(head_weights) if head_weights is not None else None
+        self.ignore_index = ignore_index
+        self.reduction = reduction
+        self.softcap = softcap
+        self.accum_dtype = accum_dtype
+        self.max_chunk_bytes = max_chunk_bytes
+        self.return_head_losses = return_head_losses
+
+    def forward(self, lin_weights: Union[torch.Tensor, List[torch.Tensor]], _input, target):
+        weights = lin_weights.unbind(0) if isinstance(lin_weights, torch.Tensor) else tuple(lin_weights)
+        shifts = self.shifts if self.shifts is not None else list(range(1, len(weights) + 1))
+        loss, head_losses = LigerMultiHeadFusedLinearCrossEntropyFunction.apply(
+            _input,
+            target,
+            shifts,
+            self.head_weights,
+            self.ignore_index,
+            self.reduction,
+            self.softcap,
+            self.accum_dtype,
+            self.max_chunk_bytes,
+            *weights,
         )
+        if not self.return_head_losses:
+            return loss
+        return loss, head_losses
@@ -1,6 +1,7 @@
 import torch
 
 from liger_kernel.chunked_loss.fused_linear_ppo import LigerFusedLinearPPOBase
+from liger_kernel.ops import FusedLinearGrpoLossFunction
 from liger_kernel.ops import GrpoLossFunction
 
 
@@ -101,6 +102,75 @@ def triton_grpo_loss(
     return reduced_loss, metrics
 
 
+def triton_fused_linear_grpo_loss(
+    hidden_states,
+    weight,
+    old_logp,
+    ref_logp,
+    completion_ids,
+    advantages,
+    completion_mask=None,
+    bias=None,
+    temperature=0.9,
+    beta=0.04,
+    eps_low=0.2,
+    eps_high=0.4,
+    loss_type="dapo",
+    max_completion_length=None,
+    sapo_temperature_pos=1.0,
+    sapo_temperature_neg=1.05,
+    vllm_is_ratio=None,
+    delta=None,
+    use_bias_correction_kl=False,
+    max_chunk_bytes=None,
+):
+    """
+    Same as `triton_grpo_loss` with token-level importance sampling and reduce=True, but from the hidden states and the
+    lm_head weight: the (B, L+1, V) logits are never materialized, only a chunk of sequences at a time.
+
+    Args:
+        hidden_states: Hidden states before the lm_head (B, L+1, H)
+        weight: lm_head weight (V, H)
+        bias: lm_head bias (V,) or None
+        max_chunk_bytes: Memory budget of the logits chunks, see `plan_chunk_size`
+        See `triton_grpo_loss` for the other arguments.
+
+    Returns:
+        (loss, metrics) where metrics = [kl_mean, clip_ratio] or [clip_ratio]
+    """
+    assert hidden_states is not None and completion_ids is not None and advantages is not None, (
+        "must provide hidden_states, completion_ids and advantages"
+    )
+
+    reduced_loss, kl_mean, clip_ratio = FusedLinearGrpoLossFunction.apply(
+        hidden_states,
+        weight,
+        bias,
+        old_logp,
+        ref_logp,
+        completion_ids,
+        advantages,
+        completion_mask,
+        temperature,
+        beta,
+        eps_low,
+        eps_high,
+        loss_type,
+        max_completion_length,
+        sapo_temperature_pos,
+        sapo_temperature_neg,
+        vllm_is_ratio,
+        delta,
+        use_bias_correction_kl,
+        max_chunk_bytes,
+    )
+    metrics = []
+    if beta != 0.0 and kl_mean is not None:
+        metrics.append(kl_mean)
+    metrics.append(clip_ratio)
+    return reduced_loss, metrics
+
+
 def _reduce_grpo_loss(per_token_loss, completion_mask, loss_type, max_completion_length):
     mask = completion_mask
     if mask is None:
@@ -81,6 +81,7 @@ def lce_forward(
     loss = None
     token_accuracy = None
     predicted_tokens = None
+    entropy = None
 
     # if in training mode, don't materialize logits
     if skip_logits and labels is None:
@@ -100,7 +101,7 @@ def lce_forward(
             hidden_size=self.config.hidden_size,
             **kwargs,
         )
-        loss, _, token_accuracy, predicted_tokens = unpack_cross_entropy_result(result)
+        loss, _, token_accuracy, predicted_tokens, entropy = unpack_cross_entropy_result(result)
     else:
         logits = self.lm_head(kept_hidden_states)
         if labels is not None or shift_labels is not None:
@@ -111,6 +112,7 @@ def lce_forward(
         output = ((loss,) + output) if loss is not None else output
         output = output + (token_accuracy,) if token_accuracy is not None else output
         output = output + (predicted_tokens,) if predicted_tokens is not None else output
+        output = output + (entropy,) if entropy is not None else output
         return output
 
     # Return custom output class with token_accuracy field
@@ -122,4 +124,5 @@ def lce_forward(
         attentions=outputs.attentions,
         token_accuracy=token_accuracy,
         predicted_tokens=predicted_tokens,
+        entropy=entropy,
     )
@@ -92,6 +92,7 @@ def lce_forward(
     loss = None
     token_accuracy = None
     predicted_tokens = None
+    entropy = None
 
     if skip_logits and labels is None and shift_labels is None:
         raise ValueError("skip_logits is True, but labels and shift_labels are None")
@@ -110,7 +111,7 @@ def lce_forward(
             hidden_size=self.config.hidden_size,
             **kwargs,
         )
-        loss, _, token_accuracy, predicted_tokens = unpack_cross_entropy_result(result)
+        loss, _, token_accuracy, predicted_tokens, entropy = unpack_cross_entropy_result(result)
     else:
         logits = self.lm_head(kept_hidden_states)
         if labels is not None or shift_labels is not None:
@@ -130,6 +131,8 @@ def lce_forward(
             output_tuple = output_tuple + (token_accuracy,)
         if predicted_tokens is not None:
             output_tuple = output_tuple + (predicted_tokens,)
+        if entropy is not None:
+            output_tuple = output_tuple + (entropy,)
         return output_tuple
 
     # Return custom output class with token_accuracy field
@@ -141,4 +144,5 @@ def lce_forward(
         attentions=outputs.attentions,
         token_accuracy=token_accuracy,
         predicted_tokens=predicted_tokens,
+        entropy=entropy,
     )
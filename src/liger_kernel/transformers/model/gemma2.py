@@ -100,6 +100,7 @@ def lce_forward(
     loss = None
     token_accuracy = None
     predicted_tokens = None
+    entropy = None
 
     if skip_logits and labels is None and shift_labels is None:
         raise ValueError("skip_logits is True, but labels and shift_labels are None")
@@ -119,7 +120,7 @@ def lce_forward(
             final_logit_softcapping=self.config.final_logit_softcapping,
             **kwargs,
         )
-        loss, _, token_accuracy, predicted_tokens = unpack_cross_entropy_result(result)
+        loss, _, token_accuracy, predicted_tokens, entropy = unpack_cross_entropy_result(result)
 
     else:
         logits = self.lm_head(kept_hidden_states)
@@ -143,6 +144,7 @@ def lce_forward(
         output_tuple = (loss,) + output_tuple if loss is not None else output_tuple
         output_tuple = output_tuple + (token_accuracy,) if token_accuracy is not None else output_tuple
         output_tuple = output_tuple + (predicted_tokens,) if predicted_tokens is not None else output_tuple
+        output_tuple = output_tuple + (entropy,) if entropy is not None else output_tuple
         return output_tuple
 
     # Return custom output class with token_accuracy field
@@ -154,4 +156,5 @@ def lce_forward(
         attentions=outputs.attentions,
         token_accuracy=token_accuracy,
         predicted_tokens=predicted_tokens,
+        entropy=entropy,
     )
@@ -99,6 +99,7 @@ def causal_forward(
     logits = None
     token_accuracy = None
     predicted_tokens = None
+    entropy = None
 
     if skip_logits is None:
         skip_logits = self.training and (labels is not None or shift_labels is not None)
@@ -114,7 +115,7 @@ def causal_forward(
             final_logit_softcapping=self.config.final_logit_softcapping,
             **loss_kwargs,
         )
-        loss, _, token_accuracy, predicted_tokens = unpack_cross_entropy_result(result)
+        loss, _, token_accuracy, predicted_tokens, entropy = unpack_cross_entropy_result(result)
     else:
         logits = self.lm_head(kept_hidden_states)
         if self.config.final_logit_softcapping is not None:
@@ -135,6 +136,7 @@ def causal_forward(
         output_tuple = (loss,) + output_tuple if loss is not None else output_tuple
         output_tuple = output_tuple + (token_accuracy,) if token_accuracy is not None else output_tuple
         output_tuple = output_tuple + (predicted_tokens,) if predicted_tokens is not None else output_tuple
+        output_tuple = output_tuple + (entropy,) if entropy is not None else output_tuple
         return output_tuple
 
     # Return custom output class with token_accuracy field
@@ -146,6 +148,7 @@ def causal_forward(
         attentions=outputs.attentions,
         token_accuracy=token_accuracy,
         predicted_tokens=predicted_tokens,
+        entropy=entropy,
     )
 
 
@@ -246,6 +249,7 @@ def multimodal_forward(
     logits = None
     token_accuracy = None
     predicted_tokens = None
+    entropy = None
     if skip_logits and labels is None:
         raise ValueError("skip_logits is True, but labels is None")
 
@@ -280,7 +284,7 @@ def multimodal_forward(
             final_logit_softcapping=getattr(self.config.text_config, "final_logit_softcapping", None),
             **lm_kwargs,
         )
-        loss, _, token_accuracy, predicted_tokens = unpack_cross_entropy_result(result)
+        loss, _, token_accuracy, predicted_tokens, entropy = unpack_cross_entropy_result(result)
 
     else:
         logits = self.lm_head(kept_hidden_states)
@@ -329,6 +333,7 @@ def multimodal_forward(
         output = (loss,) + output if loss is not None else output
         output = output + (token_accuracy,) if token_accuracy is not None else output
         output = output + (predicted_tokens,) if predicted_tokens is not None else output
+        output = output + (entropy,) if entropy is not None else output
         return output
 
     return LigerGemma3CausalLMOutputWithPast(
@@ -340,4 +345,5 @@ def multimodal_forward(
         image_hidden_states=outputs.image_hidden_states,
         token_accuracy=token_accuracy,
         predicted_tokens=predicted_tokens,
+        entropy=entropy,
     )
@@ -118,6 +118,7 @@ def lce_forward(
     loss = None
     token_accuracy = None
     predicted_tokens = None
+    entropy = None
 
     if skip_logits and labels is None and shift_labels is None:
         raise ValueError("skip_logits is True, but labels and shift_labels are None")
@@ -136,7 +137,7 @@ def lce_forward(
             hidden_size=self.config.hidden_size,
             **kwargs,
         )
-        loss, _, token_accuracy, predicted_tokens = unpack_cross_entropy_result(result)
+        loss, _, token_accuracy, predicted_tokens, entropy = unpack_cross_entropy_result(result)
 
     else:
         logits = self.lm_head(kept_hidden_states)
@@ -154,6 +155,7 @@ def lce_forward(
         output = ((loss,) + output) if loss is not None else output
         output = output + (token_accuracy,) if token_accuracy is not None else output
         output = output + (predicted_tokens,) if predicted_tokens is not None else output
+        output = output + (entropy,) if entropy is not None else output
         return output
 
     # Build output kwargs and include aux_loss only if present (depends on transformers version)
@@ -166,6 +168,7 @@ def lce_forward(
         rope_deltas=outputs.rope_deltas,
         token_accuracy=token_accuracy,
         predicted_tokens=predicted_tokens,
+        entropy=entropy,
     )
     if hasattr(outputs, "aux_loss"):
         output_kwargs["aux_loss"] = outputs.aux_loss
@@ -1,10 +1,10 @@
+import functools
 import inspect
 
 from typing import Optional
 from typing import Tuple
 
 import torch
-import torch.nn as nn
 
 import liger_kernel.transformers.functional as F
 
@@ -13,18 +13,21 @@ from liger_kernel.transformers.functional import CrossEntropyOutput
 
 def unpack_cross_entropy_result(
     result,
-) -> Tuple[torch.Tensor, Optional[torch.Tensor], Optional[torch.Tensor], Optional[torch.Tensor]]:
+) -> Tuple[
+    torch.Tensor, Optional[torch.Tensor], Optional[torch.Tensor], Optional[torch.Tensor], Optional[torch.Tensor]
+]:
     if isinstance(result, CrossEntropyOutput):
-        return result.loss, result.z_loss, result.token_accuracy, result.predicted_tokens
+        return result.loss, result.z_loss, result.token_accuracy, result.predicted_tokens, result.entropy
 
     if isinstance(result, tuple):
         loss = result[0]
         z_loss = result[1] if len(result) > 1 else None
         token_accuracy = result[2] if len(result) > 2 else None
         predicted_tokens = result[3] if len(result) > 3 else None
-        return loss, z_loss, token_accuracy, predicted_tokens
+        entropy = result[4] if len(result) > 4 else None
+        return loss, z_loss, token_accuracy, predicted_tokens, entropy
 
-    return result, None, None, None
+    return result, None, None, None, None
 
 
 def fixed_fused_linear_cross_entropy(
@@ -37,6 +40,8 @@ def fixed_fused_linear_cross_entropy(
     accum_dtype: Optional[torch.dtype] = None,
     return_token_accuracy: bool = False,
     return_predicted_tokens: bool = False,
+    process_group=None,
+    return_entropy: bool = False,
     **kwargs,
 ):
     reduction = "sum" if num_items_in_batch is not None else "mean"
@@ -50,20 +55,30 @@ def fixed_fused_linear_cross_entropy(
         accum_dtype=accum_dtype,
         return_token_accuracy=return_token_accuracy,
         return_predicted_tokens=return_predicted_tokens,
+        return_entropy=return_entropy,
+        # num_items_in_batch is already the global count: only the "mean" reduction needs the context-parallel group
+        process_group=process_group if reduction == "mean" else None,
         **kwargs,
     )
 
-    loss, _, token_accuracy, predicted_tokens = unpack_cross_entropy_result(result)
+    loss, _, token_accuracy, predicted_tokens, entropy = unpack_cross_entropy_result(result)
 
     if reduction == "sum":
         loss = loss / num_items_in_batch
 
-    if return_token_accuracy or return_predicted_tokens:
-        return CrossEntropyOutput(loss=loss, token_accuracy=token_accuracy, predicted_tokens=predicted_tokens)
+    if return_token_accuracy or return_predicted_tokens or return_entropy:
+        return CrossEntropyOutput(
+            loss=loss, token_accuracy=token_accuracy, predicted_tokens=predicted_tokens, entropy=entropy
+        )
 
     return loss
 
 
+@functools.lru_cache(maxsize=None)
+def _fused_linear_cross_entropy_params():
+    return frozenset(inspect.signature(F.liger_fused_linear_cross_entropy).parameters)
+
+
 def LigerForCausalLMLoss(
     hidden_states,
     lm_head_weight,
@@ -75,21 +90,25 @@ def LigerForCausalLMLoss(
     final_logit_softcapping: Optional[float] = None,
     return_token_accuracy: bool = False,
     return_predicted_tokens: bool = False,
+    process_group=None,
+    return_entropy: bool = False,
     **kwargs,
 ):
-    # Filter out inapplicable kwargs to liger_fused_linear_cross_entropy
-    applicable_params = inspect.signature(F.liger_fused_linear_cross_entropy).parameters
+    # Filter out inapplicable kwargs to liger_fused_linear_cross_entropy (the parameter set is computed once)
+    applicable_params = _fused_linear_cross_entropy_params()
     kwargs = {k: v for k, v in kwargs.items() if k in applicable_params}
 
     # Skip upcast since intermediate values for the loss are all fp32 in kernel
     if shift_labels is None:
-        # Shift so that token < n predict n
-        labels = nn.functional.pad(labels, (0, 1), value=ignore_index)
-        shift_labels = labels[..., 1:].contiguous()
+        # Shift so that token < n predict n: the kernel reads label n + 1 for token n in place (shift=1), so that no
+        # padded and shifted copy of the labels is made
+        shift_labels = labels
+        kwargs["shift"] = 1
+    else:
+        # Flatten the tokens
+        shift_labels = shift_labels.view(-1)
 
-    # Flatten the tokens
     hidden_states = hidden_states.view(-1, hidden_size)
-    shift_labels = shift_labels.view(-1)
     # Enable model parallelism
     shift_labels = shift_labels.to(hidden_states.device)
     result = fixed_fused_linear_cross_entropy(
@@ -101,6 +120,8 @@ def LigerForCausalLMLoss(
         final_logit_softcapping,
         return_token_accuracy=return_token_accuracy,
         return_predicted_tokens=return_predicted_tokens,
+        process_group=process_group,
+        return_entropy=return_entropy,
         **kwargs,
     )
     return result
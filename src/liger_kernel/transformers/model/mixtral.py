@@ -100,6 +100,7 @@ def lce_forward(
     loss = None
     token_accuracy = None
     predicted_tokens = None
+    entropy = None
 
     if skip_logits and labels is None and shift_labels is None:
         raise ValueError("skip_logits is True, but labels and shift_labels are None")
@@ -118,7 +119,7 @@ def lce_forward(
             hidden_size=self.config.hidden_size,
             **kwargs,
         )
-        loss, _, token_accuracy, predicted_tokens = unpack_cross_entropy_result(result)
+        loss, _, token_accuracy, predicted_tokens, entropy = unpack_cross_entropy_result(result)
 
     else:
         logits = self.lm_head(kept_hidden_states)
@@ -151,6 +152,8 @@ def lce_forward(
             output_tuple = output_tuple + (token_accuracy,)
         if predicted_tokens is not None:
             output_tuple = output_tuple + (predicted_tokens,)
+        if entropy is not None:
+            output_tuple = output_tuple + (entropy,)
         return (loss,) + output_tuple if loss is not None else output_tuple
 
     # Return custom output class with token_accuracy field
@@ -164,4 +167,5 @@ def lce_forward(
         router_logits=outputs.router_logits if return_dict else outputs[-1],
         token_accuracy=token_accuracy,
         predicted_tokens=predicted_tokens,
+        entropy=entropy,
     )
@@ -85,12 +85,14 @@ except Exception:
 class LigerCausalLMOutputWithPast(CausalLMOutputWithPast):
     token_accuracy: Optional[torch.FloatTensor] = None
     predicted_tokens: Optional[torch.LongTensor] = None
+    entropy: Optional[torch.FloatTensor] = None
 
 
 @dataclass
 class LigerMoeCausalLMOutputWithPast(MoeCausalLMOutputWithPast):
     token_accuracy: Optional[torch.FloatTensor] = None
     predicted_tokens: Optional[torch.LongTensor] = None
+    entropy: Optional[torch.FloatTensor] = None
 
 
 if _Gemma3CausalLMOutputWithPast is not None:
@@ -99,6 +101,7 @@ if _Gemma3CausalLMOutputWithPast is not None:
     class LigerGemma3CausalLMOutputWithPast(_Gemma3CausalLMOutputWithPast):
         token_accuracy: Optional[torch.FloatTensor] = None
         predicted_tokens: Optional[torch.LongTensor] = None
+        entropy: Optional[torch.FloatTensor] = None
 
 
 if _Glm4vMoeCausalLMOutputWithPast is not None:
@@ -107,6 +110,7 @@ if _Glm4vMoeCausalLMOutputWithPast is not None:
     class LigerGlm4vMoeCausalLMOutputWithPast(_Glm4vMoeCausalLMOutputWithPast):
         token_accuracy: Optional[torch.FloatTensor] = None
         predicted_tokens: Optional[torch.LongTensor] = None
+        entropy: Optional[torch.FloatTensor] = None
 
 
 if _LlavaCausalLMOutputWithPast is not None:
@@ -115,6 +119,7 @@ if _LlavaCausalLMOutputWithPast is not None:
     class LigerLlavaCausalLMOutputWithPast(_LlavaCausalLMOutputWithPast):
         token_accuracy: Optional[torch.FloatTensor] = None
         predicted_tokens: Optional[torch.LongTensor] = None
+        entropy: Optional[torch.FloatTensor] = None
 
 
 if _InternVLCausalLMOutputWithPast is not None:
@@ -123,6 +128,7 @@ if _InternVLCausalLMOutputWithPast is not None:
     class LigerInternVLCausalLMOutputWithPast(_InternVLCausalLMOutputWithPast):
         token_accuracy: Optional[torch.FloatTensor] = None
         predicted_tokens: Optional[torch.LongTensor] = None
+        entropy: Optional[torch.FloatTensor] = None
 
 
 if _PaliGemmaCausalLMOutputWithPast is not None:
@@ -131,6 +137,7 @@ if _PaliGemmaCausalLMOutputWithPast is not None:
     class LigerPaliGemmaCausalLMOutputWithPast(_PaliGemmaCausalLMOutputWithPast):
         token_accuracy: Optional[torch.FloatTensor] = None
         predicted_tokens: Optional[torch.LongTensor] = None
+        entropy: Optional[torch.FloatTensor] = None
 
 
 if _Qwen2_5_VLCausalLMOutputWithPast is not None:
@@ -139,6 +146,7 @@ if _Qwen2_5_VLCausalLMOutputWithPast is not None:
     class LigerQwen2_5_VLCausalLMOutputWithPast(_Qwen2_5_VLCausalLMOutputWithPast):
         token_accuracy: Optional[torch.FloatTensor] = None
         predicted_tokens: Optional[torch.LongTensor] = None
+        entropy: Optional[torch.FloatTensor] = None
 
 
 if _Qwen2VLCausalLMOutputWithPast is not None:
@@ -147,6 +155,7 @@ if _Qwen2VLCausalLMOutputWithPast is not None:
     class LigerQwen2VLCausalLMOutputWithPast(_Qwen2VLCausalLMOutputWithPast):
         token_accuracy: Optional[torch.FloatTensor] = None
         predicted_tokens: Optional[torch.LongTensor] = None
+        entropy: Optional[torch.FloatTensor] = None
 
 
 if _Qwen3VLCausalLMOutputWithPast is not None:
@@ -155,6 +164,7 @@ if _Qwen3VLCausalLMOutputWithPast is not None:
     class LigerQwen3VLCausalLMOutputWithPast(_Qwen3VLCausalLMOutputWithPast):
         token_accuracy: Optional[torch.FloatTensor] = None
         predicted_tokens: Optional[torch.LongTensor] = None
+        entropy: Optional[torch.FloatTensor] = None
 
 
 if _Qwen3VLMoeCausalLMOutputWithPast is not None:
@@ -163,6 +173,7 @@ if _Qwen3VLMoeCausalLMOutputWithPast is not None:
     class LigerQwen3VLMoeCausalLMOutputWithPast(_Qwen3VLMoeCausalLMOutputWithPast):
         token_accuracy: Optional[torch.FloatTensor] = None
         predicted_tokens: Optional[torch.LongTensor] = None
+        entropy: Optional[torch.FloatTensor] = None
 
 
 if _Qwen3_5CausalLMOutputWithPast is not None:
@@ -171,3 +182,4 @@ if _Qwen3_5CausalLMOutputWithPast is not None:
     class LigerQwen3_5CausalLMOutputWithPast(_Qwen3_5CausalLMOutputWithPast):
         token_accuracy: Optional[torch.FloatTensor] = None
         predicted_tokens: Optional[torch.LongTensor] = None
+        entropy: Optional[torch.FloatTensor] = None
@@ -136,6 +136,7 @@ def lce_forward(
     logits = None
     token_accuracy = None
     predicted_tokens = None
+    entropy = None
 
     if skip_logits and labels is None and shift_labels is None:
         raise ValueError("skip_logits is True, but labels and shift_labels are None")
@@ -153,7 +154,7 @@ def lce_forward(
             hidden_size=_get_hidden_size(self.config),
             **kwargs,
         )
-        loss, _, token_accuracy, predicted_tokens = unpack_cross_entropy_result(result)
+        loss, _, token_accuracy, predicted_tokens, entropy = unpack_cross_entropy_result(result)
     else:
         logits = self.lm_head(hidden_states)
 
@@ -171,6 +172,7 @@ def lce_forward(
         output = (loss,) + output_tuple if loss is not None else output_tuple
         output = output + (token_accuracy,) if token_accuracy is not None else output
         output = output + (predicted_tokens,) if predicted_tokens is not None else output
+        output = output + (entropy,) if entropy is not None else output
         return output
 
     # Return Qwen2.5-VL output with token accuracy
@@ -183,4 +185,5 @@ def lce_forward(
         rope_deltas=outputs.rope_deltas,
         token_accuracy=token_accuracy,
         predicted_tokens=predicted_tokens,
+        entropy=entropy,
     )
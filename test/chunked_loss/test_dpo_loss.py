@@ -2,7 +2,9 @@ import pytest
 import torch
 import torch.nn.functional as F
 
+from liger_kernel.chunked_loss import LigerFusedLinearCPOLoss
 from liger_kernel.chunked_loss import LigerFusedLinearDPOLoss
+from liger_kernel.chunked_loss import LigerFusedLinearSimPOLoss
 from liger_kernel.chunked_loss.dpo_loss import LigerFusedLinearDPOFunction
 from liger_kernel.chunked_loss.functional import liger_fused_linear_dpo
 from liger_kernel.utils import infer_device
@@ -936,3 +938,176 @@ def test_invalid_loss_type():
         # Should not raise an exception
         loss_fn = LigerFusedLinearDPOLoss(loss_type=loss_type)
         assert loss_fn.loss_type == loss_type
+
+
+@pytest.mark.parametrize("chunk_size", [2, 8, "auto"])
+@pytest.mark.parametrize("bias", [True, False])
+def test_chunk_size_does_not_change_results(chunk_size, bias):
+    """
+    One pair per chunk is the reference: uneven chunks (chunk_size=2), a single chunk (chunk_size=8) and the chunks
+    picked from the free memory (chunk_size="auto") match it.
+    """
+    B, T, H, V = 2 * 5, 47, 31, 123
+    dtype = torch.float32
+    _input = torch.randn(B, T, H, device=device, dtype=dtype)
+    ref_input = torch.randn(B, T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B, T), device=device, dtype=torch.long)
+    target[:, : T // 3] = -100
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    ref_weight = torch.randn(V, H, device=device, dtype=dtype)
+    _bias = torch.randn(V, device=device, dtype=dtype) if bias else None
+
+    outputs = []
+    for size in (1, chunk_size):
+        input_ = _input.detach().clone().requires_grad_(True)
+        weight_ = weight.detach().clone().requires_grad_(True)
+        bias_ = _bias.detach().clone().requires_grad_(True) if bias else None
+        loss, aux_outputs = LigerFusedLinearDPOFunction.apply(
+            input_,
+            weight_,
+            target,
+            bias_,
+            ref_input,
+            ref_weight,
+            None,
+            -100,
+            0.1,
+            True,  # compute_nll_loss
+            False,  # compiled
+            True,  # use_ref_model
+            False,  # average_log_prob
+            size,  # chunk_size
+        )
+        (loss * 2.0).backward()
+        outputs.append((loss, aux_outputs, input_.grad, weight_.grad, bias_.grad if bias else None))
+
+    (loss1, aux_outputs1, *grads1), (loss2, aux_outputs2, *grads2) = outputs
+    assert_verbose_allclose(loss1, loss2, atol=1e-5, rtol=1e-5)
+    for aux1, aux2 in zip(aux_outputs1, aux_outputs2):
+        assert_verbose_allclose(aux1, aux2, atol=1e-5, rtol=1e-5)
+    for grad1, grad2 in zip(grads1, grads2):
+        if grad1 is not None:
+            assert_verbose_allclose(grad1, grad2, atol=1e-5, rtol=1e-5)
+
+
+def test_auto_chunk_size_fits_memory_budget(monkeypatch):
+    from liger_kernel.chunked_loss import chunk_planner
+
+    B, T, H, V = 2 * 8, 47, 31, 123
+    _input = torch.randn(B, T, H, device=device)
+    weight = torch.randn(V, H, device=device)
+    rows_per_pair = 2 * T
+    # weight gradient buffers, plus the fp32 log_softmax, its gradient and the backward softmax of 3 pairs
+    free_bytes = 2 * (V * H * 4 * 2 + 3 * rows_per_pair * V * (4 + 3 * 4))
+
+    monkeypatch.setattr(chunk_planner, "get_free_memory_bytes", lambda device: free_bytes)
+    # 3 pairs fit, rounded down to 2 by the power of 2 row count
+    assert chunk_planner.resolve_chunk_size("auto", _input, weight, rows_per_item=rows_per_pair) == 2
+    # the free memory is queried again on every call: once it shrinks, so do the chunks
+    monkeypatch.setattr(chunk_planner, "get_free_memory_bytes", lambda device: free_bytes // 2)
+    assert chunk_planner.resolve_chunk_size("auto", _input, weight, rows_per_item=rows_per_pair) == 1
+    monkeypatch.setattr(chunk_planner, "get_free_memory_bytes", lambda device: 0)
+    assert chunk_planner.resolve_chunk_size("auto", _input, weight, rows_per_item=rows_per_pair) == 1
+    assert chunk_planner.resolve_chunk_size("auto", _input[:2], weight, rows_per_item=rows_per_pair) == 1
+    assert chunk_planner.resolve_chunk_size(4, _input, weight, rows_per_item=rows_per_pair) == 4
+
+
+def _dpo_loss(beta, _input, weight, target, ref_input, ref_weight):
+    return LigerFusedLinearDPOFunction.apply(
+        _input, weight, target, None, ref_input, ref_weight, None, -100, beta, False, True
+    )[0]
+
+
+def _simpo_loss(value, _input, weight, target, ref_input, ref_weight):
+    return LigerFusedLinearSimPOLoss(gamma=value, label_smoothing=value / 2)(weight, _input, target)[0]
+
+
+def _cpo_loss(label_smoothing, _input, weight, target, ref_input, ref_weight):
+    return LigerFusedLinearCPOLoss(label_smoothing=label_smoothing)(weight, _input, target)[0]
+
+
+# DPO beta, SimPO gamma and label_smoothing, CPO label_smoothing (the last two in loss_kwargs)
+@pytest.mark.parametrize("loss_fn", [_dpo_loss, _simpo_loss, _cpo_loss])
+def test_compiled_step_is_reused_across_calls(loss_fn):
+    from liger_kernel.chunked_loss.compiled_steps import compiled_step_cache_clear
+    from liger_kernel.chunked_loss.compiled_steps import compiled_step_cache_info
+
+    B, T, H, V = 2 * 2, 15, 8, 32
+    _input = torch.randn(B, T, H, device=device)
+    ref_input = torch.randn(B, T, H, device=device)
+    target = torch.randint(0, V, (B, T), device=device, dtype=torch.long)
+    weight = torch.randn(V, H, device=device)
+    ref_weight = torch.randn(V, H, device=device)
+
+    compiled_step_cache_clear()
+    infos = []
+    for value in (0.1, 0.2, 0.3):
+        input_ = _input.detach().clone().requires_grad_(True)
+        loss = loss_fn(value, input_, weight, target, ref_input, ref_weight)
+        loss.backward()
+        infos.append(compiled_step_cache_info())
+
+    # compiled on the first call only (unless an earlier test already did): the hyperparameters are graph inputs
+    assert [(info.misses, info.currsize) for info in infos] == [(1, 1)] * 3
+    assert [info.hits for info in infos] == [0, 1, 2]
+    assert infos[0].recompiles <= 1 and infos[-1].recompiles == infos[0].recompiles
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3])
+@pytest.mark.parametrize(
+    "bias, compute_nll_loss, average_log_prob, ref",
+    [
+        (True, True, False, "input"),
+        (False, False, True, "input"),
+        (True, False, False, "logps"),
+        (False, True, True, None),
+    ],
+)
+def test_triton_kernel_matches_torch_func(chunk_size, bias, compute_nll_loss, average_log_prob, ref):
+    B, T, H, V = 2 * 5, 47, 31, 123
+    dtype = torch.float32
+    _input = torch.randn(B, T, H, device=device, dtype=dtype)
+    ref_input = torch.randn(B, T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B, T), device=device, dtype=torch.long)
+    target[:, : T // 3] = -100
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    ref_weight = torch.randn(V, H, device=device, dtype=dtype)
+    _bias = torch.randn(V, device=device, dtype=dtype) if bias else None
+    ref_logps = -torch.rand(B, device=device) * 100 if ref == "logps" else None
+
+    outputs = []
+    for use_triton_kernel in (False, True):
+        input_ = _input.detach().clone().requires_grad_(True)
+        weight_ = weight.detach().clone().requires_grad_(True)
+        bias_ = _bias.detach().clone().requires_grad_(True) if bias else None
+        loss, aux_outputs = LigerFusedLinearDPOFunction.apply(
+            input_,
+            weight_,
+            target,
+            bias_,
+            ref_input if ref == "input" else None,
+            ref_weight if ref == "input" else None,
+            None,
+            -100,
+            0.1,
+            compute_nll_loss,
+            False,  # compiled
+            ref is not None,  # use_ref_model
+            average_log_prob,
+            chunk_size,
+            "sigmoid",
+            ref_logps[: B // 2] if ref == "logps" else None,
+            ref_logps[B // 2 :] if ref == "logps" else None,
+            use_triton_kernel,
+        )
+        (loss * 2.0).backward()
+        outputs.append((loss, aux_outputs, input_.grad, weight_.grad, bias_.grad if bias else None))
+
+    (loss1, aux_outputs1, *grads1), (loss2, aux_outputs2, *grads2) = outputs
+    assert_verbose_allclose(loss1, loss2, atol=1e-5, rtol=1e-5)
+    assert len(aux_outputs1) == len(aux_outputs2)
+    for aux1, aux2 in zip(aux_outputs1, aux_outputs2):
+        assert_verbose_allclose(aux1, aux2, atol=1e-4, rtol=1e-5)
+    for grad1, grad2 in zip(grads1, grads2):
+        if grad1 is not None:
+            assert_verbose_allclose(grad1, grad2, atol=1e-5, rtol=1e-5)
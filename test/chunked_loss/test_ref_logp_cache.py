@@ -0,0 +1,170 @@
+import pytest
+import torch
+
+from liger_kernel.chunked_loss import LigerFusedLinearDPOLoss
+from liger_kernel.chunked_loss import LigerFusedLinearGRPOLoss
+from liger_kernel.chunked_loss import LigerFusedLinearKTOLoss
+from liger_kernel.chunked_loss import RefLogpCache
+from liger_kernel.chunked_loss.ref_logp_cache import ref_per_token_logps
+from liger_kernel.chunked_loss.ref_logp_cache import ref_sequence_logps
+from liger_kernel.utils import infer_device
+from test.utils import assert_verbose_allclose
+from test.utils import set_seed
+
+device = infer_device()
+
+set_seed()
+
+B, T, H, V = 8, 47, 31, 123
+
+
+def _loss_and_grads(loss_fn, _input, weight, *args, **kwargs):
+    _input = _input.detach().clone().requires_grad_(True)
+    weight = weight.detach().clone().requires_grad_(True)
+    loss, *_ = loss_fn(_input, weight, *args, **kwargs)
+    loss.backward()
+    return loss, _input.grad, weight.grad
+
+
+def _assert_same(expected, actual):
+    for x, y in zip(expected, actual):
+        assert_verbose_allclose(x, y, atol=1e-5, rtol=1e-5)
+
+
+def test_create_write_and_reopen(tmp_path):
+    path = str(tmp_path / "ref_logps.bin")
+    cache = RefLogpCache.create(path, num_samples=10, seq_len=6)
+    logps = -torch.rand(3, 4)
+    cache.write([7, 2, 5], logps)
+
+    cache = RefLogpCache(path)
+    assert len(cache) == 10 and cache.seq_len == 6 and cache.dtype == torch.float32
+    loaded = cache.load(torch.tensor([5, 7]))
+    assert_verbose_allclose(loaded[:, :4], logps[[2, 0]])
+    assert torch.all(loaded[:, 4:] == 0)
+    assert cache.load([2], seq_len=4).shape == (1, 4)
+    with pytest.raises(AssertionError):
+        cache.load([2], seq_len=7)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2])
+def test_dpo_with_cached_ref_logps(tmp_path, chunk_size):
+    _input = torch.randn(B, T, H, device=device)
+    ref_input = torch.randn(B, T, H, device=device)
+    target = torch.randint(0, V, (B, T), device=device, dtype=torch.long)
+    target[:, : T // 3] = -100
+    weight = torch.randn(V, H, device=device)
+    ref_weight = torch.randn(V, H, device=device)
+    # the chosen sequences of the batch are samples 10-13 of the dataset, the rejected ones 0-3
+    chosen_ids, rejected_ids = torch.arange(10, 14), torch.arange(4)
+
+    cache = RefLogpCache.create(str(tmp_path / "ref_logps.bin"), num_samples=14)
+    cache.precompute(
+        [(torch.cat([chosen_ids, rejected_ids]), ref_input, target)],
+        lambda ref_input, target: ref_sequence_logps(ref_input, ref_weight, target, chunk_size=3),
+    )
+
+    dpo_loss = LigerFusedLinearDPOLoss(compiled=False, chunk_size=chunk_size)
+    expected = _loss_and_grads(
+        lambda _input, weight: dpo_loss(weight, _input, target, ref_input=ref_input, ref_weight=ref_weight),
+        _input,
+        weight,
+    )
+    actual = _loss_and_grads(
+        lambda _input, weight: dpo_loss(
+            weight,
+            _input,
+            target,
+            ref_chosen_logps=cache.load(chosen_ids, device),
+            ref_rejected_logps=cache.load(rejected_ids, device),
+        ),
+        _input,
+        weight,
+    )
+    _assert_same(expected, actual)
+
+
+def test_kto_with_cached_ref_logps(tmp_path):
+    _input = torch.randn(B, T, H, device=device)
+    ref_input = torch.randn(B, T, H, device=device)
+    target = torch.randint(0, V, (B, T), device=device, dtype=torch.long)
+    weight = torch.randn(V, H, device=device)
+    ref_weight = torch.randn(V, H, device=device)
+    preference_labels = torch.randint(2, (B,), dtype=torch.bool, device=device)
+    kl = torch.randn(1, device=device)
+    sample_ids = torch.randperm(2 * B)[:B]
+
+    cache = RefLogpCache.create(str(tmp_path / "ref_logps.bin"), num_samples=2 * B)
+    cache.write(sample_ids, ref_sequence_logps(ref_input, ref_weight, target))
+
+    kto_loss = LigerFusedLinearKTOLoss(compiled=False, use_ref_model=True)
+    expected = _loss_and_grads(
+        lambda _input, weight: kto_loss(
+            _input,
+            weight,
+            target,
+            preference_labels=preference_labels,
+            ref_input=ref_input,
+            ref_weight=ref_weight,
+            kl=kl,
+        ),
+        _input,
+        weight,
+    )
+    actual = _loss_and_grads(
+        lambda _input, weight: kto_loss(
+            _input,
+            weight,
+            target,
+            preference_labels=preference_labels,
+            kl=kl,
+            ref_logps=cache.load(sample_ids, device),
+        ),
+        _input,
+        weight,
+    )
+    _assert_same(expected, actual)
+
+
+def test_grpo_with_cached_ref_per_token_logps(tmp_path):
+    _input = torch.randn(B, T, H, device=device)
+    ref_input = torch.randn(B, T, H, device=device)
+    selected_token_ids = torch.randint(0, V, (B, T), device=device)
+    attention_mask = torch.ones(B, T, device=device)
+    attention_mask[:, -5:] = 0
+    advantages = torch.randn(B, device=device)
+    weight = torch.randn(V, H, device=device)
+    ref_weight = torch.randn(V, H, device=device)
+    sample_ids = torch.arange(B)
+
+    # the cache holds completions of up to 2 * T tokens, the batch is padded to T
+    cache = RefLogpCache.create(str(tmp_path / "ref_logps.bin"), num_samples=B, seq_len=2 * T)
+    cache.write(sample_ids, ref_per_token_logps(ref_input, ref_weight, selected_token_ids, temperature=0.7))
+
+    grpo_loss = LigerFusedLinearGRPOLoss(compiled=False, use_ref_model=True, temperature=0.7)
+    expected = _loss_and_grads(
+        lambda _input, weight: grpo_loss(
+            _input,
+            weight,
+            selected_token_ids,
+            attention_mask,
+            advantages,
+            ref_input=ref_input,
+            ref_weight=ref_weight,
+        ),
+        _input,
+        weight,
+    )
+    actual = _loss_and_grads(
+        lambda _input, weight: grpo_loss(
+            _input,
+            weight,
+            selected_token_ids,
+            attention_mask,
+            advantages,
+            ref_per_token_logps=cache.load(sample_ids, device, seq_len=T),
+        ),
+        _input,
+        weight,
+    )
+    _assert_same(expected, actual)
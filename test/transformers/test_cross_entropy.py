@@ -512,7 +512,9 @@ def _test_correctness_functional(
     )
     y1 = result.loss
     y1_z = result.z_loss
-    y2, y2_z, _, _ = LigerCrossEntropyFunction.apply(x2, target, None, 0, 1e-4, 0.1, "mean", 30.0, True, False, False)
+    y2, y2_z, _, _, _, _, _ = LigerCrossEntropyFunction.apply(
+        x2, target, None, 0, 1e-4, 0.1, "mean", 30.0, True, False, False
+    )
 
     assert torch.allclose(y1, y2, atol=atol, rtol=rtol)
     assert torch.allclose(y1_z, y2_z, atol=atol, rtol=rtol)
@@ -1265,3 +1267,202 @@ def test_correctness_with_predicted_tokens(B, T, V, ignore_index, dtype):
     # Verify backward still works
     result.loss.backward()
     assert _input.grad is not None
+
+
+@pytest.mark.parametrize(
+    "B, T, V",
+    [
+        (2, 128, 512),
+        (3, 47, 31),  # weird shapes
+    ],
+)
+@pytest.mark.parametrize("reduction", ["mean", "sum", "none"])
+@pytest.mark.parametrize("has_weight", [True, False])
+def test_correctness_with_sync_free(B, T, V, reduction, has_weight):
+    torch.manual_seed(42)
+
+    _tensor = torch.randn(B * T, V, device=device, dtype=torch.float32)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 4]] = -100
+    weight = torch.rand(V, device=device, dtype=torch.float32) if has_weight else None
+
+    outputs = []
+    for sync_free in (False, True):
+        _input = _tensor.detach().clone().requires_grad_(True)
+        liger_ce = LigerCrossEntropyLoss(
+            weight=weight,
+            reduction=reduction,
+            label_smoothing=0.1,
+            lse_square_scale=1e-4,
+            return_z_loss=True,
+            return_token_accuracy=True,
+            sync_free=sync_free,
+        )
+        if sync_free and device == "cuda":
+            torch.cuda.set_sync_debug_mode("error")
+        try:
+            result = liger_ce(_input, target)
+            result.loss.backward(torch.ones_like(result.loss))
+        finally:
+            if device == "cuda":
+                torch.cuda.set_sync_debug_mode("default")
+        outputs.append((result, _input.grad))
+
+    (ref, ref_grad), (out, grad) = outputs
+    assert_verbose_allclose(ref.loss, out.loss, atol=1e-6, rtol=1e-6)
+    assert_verbose_allclose(ref.z_loss, out.z_loss, atol=1e-6, rtol=1e-6)
+    assert_verbose_allclose(ref.token_accuracy, out.token_accuracy, atol=1e-6, rtol=1e-6)
+    assert_verbose_allclose(ref_grad, grad, atol=1e-6, rtol=1e-6)
+
+
+def test_sync_free_check_target_bounds():
+    _input = torch.randn(4, 8, device=device)
+    target = torch.tensor([0, 1, 8, -100], device=device)
+    with pytest.raises(AssertionError):
+        LigerCrossEntropyLoss(sync_free=True, check_target_bounds=True)(_input, target)
+
+
+@pytest.mark.parametrize(
+    "B, T, V",
+    [
+        (2, 128, 512),
+        (3, 47, 31),  # weird shapes
+    ],
+)
+@pytest.mark.parametrize("k", [1, 5, 20])
+@pytest.mark.parametrize("reduction", ["mean", "none"])
+def test_correctness_with_topk(B, T, V, k, reduction):
+    torch.manual_seed(42)
+
+    _tensor = torch.randn(B * T, V, device=device, dtype=torch.float32)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 4]] = -100
+
+    # the kernel overwrites its input with the gradients
+    expected_logprobs, expected_ids = torch.log_softmax(_tensor, dim=-1).topk(k, dim=-1)
+
+    _input = _tensor.detach().clone().requires_grad_(True)
+    result = liger_cross_entropy(_input, target, reduction=reduction, return_topk=k)
+    assert isinstance(result, CrossEntropyOutput)
+    assert result.topk_ids.shape == result.topk_logprobs.shape == (B * T, k)
+    assert result.topk_ids.dtype == torch.int64
+
+    non_ignore_mask = target != -100
+    assert torch.equal(result.topk_ids[non_ignore_mask], expected_ids[non_ignore_mask])
+    assert_verbose_allclose(
+        result.topk_logprobs[non_ignore_mask], expected_logprobs[non_ignore_mask], atol=1e-5, rtol=1e-5
+    )
+    assert torch.all(result.topk_ids[~non_ignore_mask] == -1)
+    assert torch.all(result.topk_logprobs[~non_ignore_mask] == 0)
+
+    # the top-k does not change the loss nor its gradients
+    _input_ref = _tensor.detach().clone().requires_grad_(True)
+    loss_ref = liger_cross_entropy(_input_ref, target, reduction=reduction)
+    assert_verbose_allclose(result.loss, loss_ref, atol=1e-6, rtol=1e-6)
+    result.loss.backward(torch.ones_like(result.loss))
+    loss_ref.backward(torch.ones_like(loss_ref))
+    assert_verbose_allclose(_input.grad, _input_ref.grad, atol=1e-6, rtol=1e-6)
+
+
+def test_topk_merge_across_blocks():
+    """The running top-k is merged block by block when the row does not fit in one block."""
+    torch.manual_seed(42)
+    n_rows, n_cols, k = 8, 123, 7
+    X = torch.randn(n_rows, n_cols, device=device, dtype=torch.float32)
+    # ties are broken by the smallest index
+    X[0, 100] = X[0, 3] = X[0].max() + 1
+    Y = torch.randint(0, n_cols, (n_rows,), device=device)
+    expected_logprobs, expected_ids = torch.log_softmax(X, dim=-1).topk(k, dim=-1)
+
+    loss = torch.zeros(n_rows, dtype=torch.float32, device=device)
+    topk_ids = torch.full((n_rows, k), -1, dtype=torch.int64, device=device)
+    topk_logprobs = torch.zeros(n_rows, k, dtype=torch.float32, device=device)
+    liger_cross_entropy_kernel[(n_rows,)](
+        X_ptr=X,
+        X_stride=X.stride(-2),
+        Y_ptr=Y,
+        Y_stride=Y.stride(-1),
+        weight_ptr=X,  # dummy ptr, not used
+        loss_ptr=loss,
+        z_loss_ptr=loss,  # dummy ptr, not used
+        loss_stride=loss.stride(-1),
+        token_accuracy_ptr=None,
+        token_accuracy_stride=0,
+        predicted_tokens_ptr=None,
+        predicted_tokens_stride=0,
+        n_cols=n_cols,
+        n_non_ignore=n_rows,
+        sum_non_ignore_weight=n_rows,  # not used
+        weight_sum=0.0,  # not used
+        ignore_index=-100,
+        lse_square_scale=0.0,
+        label_smoothing=0.0,
+        reduction="mean",
+        softcap=0.0,
+        RETURN_Z_LOSS=0,
+        RETURN_TOKEN_ACCURACY=0,
+        RETURN_PREDICTED_TOKENS=0,
+        HAS_WEIGHT=False,
+        HAS_SOFTCAPPING=False,
+        HAS_GRADIENTS=False,
+        topk_ids_ptr=topk_ids,
+        topk_logprobs_ptr=topk_logprobs,
+        topk_stride=topk_ids.stride(-2),
+        TOPK=k,
+        BLOCK_K=8,
+        BLOCK_SIZE=16,
+    )
+
+    assert topk_ids[0, 0] == 3 and topk_ids[0, 1] == 100
+    assert torch.equal(topk_ids[1:], expected_ids[1:])
+    assert_verbose_allclose(topk_logprobs, expected_logprobs, atol=1e-5, rtol=1e-5)
+
+
+@pytest.mark.parametrize(
+    "B, T, V",
+    [
+        (2, 128, 512),
+        (3, 47, 31),  # weird shapes
+    ],
+)
+@pytest.mark.parametrize("reduction", ["mean", "sum", "none"])
+@pytest.mark.parametrize(
+    "dtype, atol, rtol",
+    [
+        (torch.float32, 1e-5, 1e-5),
+        pytest.param(
+            torch.bfloat16,
+            1e-3,
+            1e-3,
+            marks=pytest.mark.skipif(not supports_bfloat16(), reason="bfloat16 not supported on this GPU"),
+        ),
+    ],
+)
+def test_correctness_with_entropy(B, T, V, reduction, dtype, atol, rtol):
+    torch.manual_seed(42)
+
+    _tensor = torch.randn(B * T, V, device=device, dtype=dtype) * 3
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 4]] = -100
+    non_ignore_mask = target != -100
+
+    # the kernel overwrites its input with the gradients
+    logprobs = torch.log_softmax(_tensor.float(), dim=-1)
+    expected_entropy = -(logprobs.exp() * logprobs).sum(dim=-1).where(non_ignore_mask, 0.0)
+    if reduction != "none":
+        expected_entropy = expected_entropy.sum() / non_ignore_mask.sum()
+
+    _input = _tensor.detach().clone().requires_grad_(True)
+    liger_ce = LigerCrossEntropyLoss(reduction=reduction, return_entropy=True)
+    result = liger_ce(_input, target)
+    assert isinstance(result, CrossEntropyOutput)
+    assert result.entropy.dtype == torch.float32
+    assert_verbose_allclose(result.entropy, expected_entropy, atol=atol, rtol=rtol)
+
+    # the entropy does not change the loss nor its gradients
+    _input_ref = _tensor.detach().clone().requires_grad_(True)
+    loss_ref = LigerCrossEntropyLoss(reduction=reduction)(_input_ref, target)
+    assert_verbose_allclose(result.loss, loss_ref, atol=1e-6, rtol=1e-6)
+    result.loss.backward(torch.ones_like(result.loss))
+    loss_ref.backward(torch.ones_like(loss_ref))
+    assert_verbose_allclose(_input.grad, _input_ref.grad, atol=1e-6, rtol=1e-6)
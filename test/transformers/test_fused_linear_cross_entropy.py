@@ -1,16 +1,26 @@
+import math
+import tempfile
+
 from typing import Optional
 
 import pytest
 import torch
+import torch.multiprocessing as mp
 
 from test.transformers.test_cross_entropy import CrossEntropyWithZLoss
 from test.utils import assert_verbose_allclose
 from test.utils import set_seed
 
 from liger_kernel.ops import LigerFusedLinearCrossEntropyFunction
+from liger_kernel.ops import LigerVocabParallelFusedLinearCrossEntropyFunction
+from liger_kernel.ops import fused_linear_cross_entropy_forward
+from liger_kernel.ops.utils import plan_chunk_size
 from liger_kernel.transformers.functional import CrossEntropyOutput
 from liger_kernel.transformers.functional import liger_fused_linear_cross_entropy
+from liger_kernel.transformers.functional import liger_fused_linear_cross_entropy_sequence_nll
 from liger_kernel.transformers.fused_linear_cross_entropy import LigerFusedLinearCrossEntropyLoss
+from liger_kernel.transformers.fused_linear_cross_entropy import LigerVocabParallelFusedLinearCrossEntropyLoss
+from liger_kernel.utils import infer_comm_backend
 from liger_kernel.utils import infer_device
 
 device = infer_device()
@@ -399,7 +409,7 @@ def test_correctness_functional(B, T, H, V, scalar, dtype, bias, ce_weight, atol
     else:
         y1, z1 = result
 
-    y2, z2, _, _ = LigerFusedLinearCrossEntropyFunction.apply(
+    y2, z2, _, _, _, _, _ = LigerFusedLinearCrossEntropyFunction.apply(
         x2, weight, target, bias, ce_weight, -100, 1e-4, 0.1, "mean", 30.0, True, torch.float32, False, False, False
     )
 
@@ -1022,3 +1032,1092 @@ def test_correctness_with_predicted_tokens(B, T, H, V, reduction, dtype, bias, i
     # Verify backward still works
     result.loss.backward()
     assert _input.grad is not None
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize(
+    "reduction, dtype, atol, rtol",
+    [
+        ("mean", torch.float32, 1e-5, 5e-4),
+        ("sum", torch.float32, 1e-3, 5e-2),
+        ("none", torch.float32, 1e-5, 5e-4),
+    ],
+)
+@pytest.mark.parametrize("bias", [True, False])
+@pytest.mark.parametrize("ignore_ratio", [0.6, 1.0])
+def test_correctness_with_compact_ignored_tokens(B, T, H, V, reduction, dtype, bias, ignore_ratio, atol, rtol):
+    """Dropping ignored rows before the chunk loop must not change any output or gradient."""
+    torch.manual_seed(42)
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    bias_tensor = torch.randn(V, device=device, dtype=dtype) if bias else None
+    ce_weight = torch.rand(V, device=device, dtype=torch.float32)
+
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: int(B * T * ignore_ratio)]] = -100
+
+    outputs = []
+    for compact in (False, True):
+        _input = _tensor.detach().clone().requires_grad_(True)
+        w = weight.detach().clone().requires_grad_(True)
+        b = bias_tensor.detach().clone().requires_grad_(True) if bias else None
+        result = liger_fused_linear_cross_entropy(
+            input=_input,
+            weight=w,
+            target=target,
+            bias=b,
+            ce_weight=ce_weight,
+            lse_square_scale=1e-4,
+            label_smoothing=0.1,
+            reduction=reduction,
+            return_z_loss=True,
+            return_token_accuracy=True,
+            return_predicted_tokens=True,
+            compact_ignored_tokens=compact,
+        )
+        result.loss.sum().backward()
+        outputs.append((result, _input.grad, w.grad, b.grad if bias else None))
+
+    (ref, ref_grad_input, ref_grad_weight, ref_grad_bias), (out, grad_input, grad_weight, grad_bias) = outputs
+    assert out.loss.shape == ref.loss.shape
+    assert_verbose_allclose(ref.loss, out.loss, atol=atol, rtol=rtol)
+    assert_verbose_allclose(ref.z_loss, out.z_loss, atol=atol, rtol=rtol)
+    if ignore_ratio < 1.0:
+        assert_verbose_allclose(ref.token_accuracy, out.token_accuracy, atol=atol, rtol=rtol)
+    assert torch.equal(ref.predicted_tokens, out.predicted_tokens)
+    assert_verbose_allclose(ref_grad_input, grad_input, atol=atol, rtol=rtol)
+    assert_verbose_allclose(ref_grad_weight, grad_weight, atol=atol, rtol=rtol)
+    if bias:
+        assert_verbose_allclose(ref_grad_bias, grad_bias, atol=atol, rtol=rtol)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("reduction", ["mean", "sum"])
+@pytest.mark.parametrize("bias", [True, False])
+@pytest.mark.parametrize("has_ce_weight", [True, False])
+def test_correctness_with_sync_free(B, T, H, V, reduction, bias, has_ce_weight):
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    bias_tensor = torch.randn(V, device=device, dtype=dtype) if bias else None
+    ce_weight = torch.rand(V, device=device, dtype=torch.float32) if has_ce_weight else None
+
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 3]] = -100
+
+    outputs = []
+    for sync_free in (False, True):
+        _input = _tensor.detach().clone().requires_grad_(True)
+        w = weight.detach().clone().requires_grad_(True)
+        b = bias_tensor.detach().clone().requires_grad_(True) if bias else None
+        if sync_free and device == "cuda":
+            torch.cuda.set_sync_debug_mode("error")
+        try:
+            result = liger_fused_linear_cross_entropy(
+                input=_input,
+                weight=w,
+                target=target,
+                bias=b,
+                ce_weight=ce_weight,
+                lse_square_scale=1e-4,
+                label_smoothing=0.1,
+                reduction=reduction,
+                return_z_loss=True,
+                return_token_accuracy=True,
+                sync_free=sync_free,
+            )
+            result.loss.backward()
+        finally:
+            if device == "cuda":
+                torch.cuda.set_sync_debug_mode("default")
+        outputs.append((result, _input.grad, w.grad, b.grad if bias else None))
+
+    (ref, ref_grad_input, ref_grad_weight, ref_grad_bias), (out, grad_input, grad_weight, grad_bias) = outputs
+    assert_verbose_allclose(ref.loss, out.loss, atol=1e-6, rtol=1e-6)
+    assert_verbose_allclose(ref.z_loss, out.z_loss, atol=1e-6, rtol=1e-6)
+    assert_verbose_allclose(ref.token_accuracy, out.token_accuracy, atol=1e-6, rtol=1e-6)
+    assert_verbose_allclose(ref_grad_input, grad_input, atol=1e-6, rtol=1e-6)
+    assert_verbose_allclose(ref_grad_weight, grad_weight, atol=1e-6, rtol=1e-6)
+    if bias:
+        assert_verbose_allclose(ref_grad_bias, grad_bias, atol=1e-6, rtol=1e-6)
+
+
+def test_plan_chunk_size():
+    # default heuristic: logits chunk about the size of the input
+    plan = plan_chunk_size(4096 * 4, 4096, 32000, torch.bfloat16)
+    assert (plan.chunk_size, plan.num_chunks) == (2048, 8)
+
+    # without the input gradient, the logits chunk can grow to about twice the size of the input
+    plan = plan_chunk_size(4096 * 4, 4096, 32000, torch.bfloat16, has_grad_input=False)
+    assert (plan.chunk_size, plan.num_chunks) == (4096, 4)
+
+    # budget: 2 bf16 (V,H) buffers + chunk_size rows of V bf16 logits
+    bytes_per_row = 32000 * 2
+    fixed_bytes = 2 * 32000 * 4096 * 2
+    plan = plan_chunk_size(4096 * 4, 4096, 32000, torch.bfloat16, max_chunk_bytes=fixed_bytes + 1000 * bytes_per_row)
+    assert (plan.chunk_size, plan.num_chunks) == (512, 32)
+    assert plan.bytes_per_row == bytes_per_row and plan.fixed_bytes == fixed_bytes
+
+    # fp32 accumulator and extra fp32 logits are accounted for
+    plan = plan_chunk_size(
+        4096 * 4,
+        4096,
+        32000,
+        torch.bfloat16,
+        max_chunk_bytes=fixed_bytes + 1000 * bytes_per_row,
+        n_fp32_logits=1,
+        accum_dtype=torch.float32,
+    )
+    assert plan.bytes_per_row == 3 * bytes_per_row and plan.fixed_bytes == 3 * fixed_bytes // 2
+    assert plan.chunk_size == 1
+
+    # a large budget never goes beyond a single chunk covering all rows
+    plan = plan_chunk_size(100, 64, 128, torch.float32, max_chunk_bytes=1 << 40)
+    assert (plan.chunk_size, plan.num_chunks) == (128, 1)
+
+    # "auto" falls back to the default heuristic when the free memory cannot be queried
+    assert plan_chunk_size(100, 64, 128, torch.float32, max_chunk_bytes="auto", device="cpu").chunk_size == (
+        plan_chunk_size(100, 64, 128, torch.float32).chunk_size
+    )
+
+
+@pytest.mark.parametrize("B, T, H, V", [(4, 47, 31, 123)])
+@pytest.mark.parametrize("max_chunk_bytes", [1, 40 * 123 * 4 + 2 * 123 * 31 * 4, 1 << 30])
+def test_correctness_with_max_chunk_bytes(B, T, H, V, max_chunk_bytes):
+    dtype = torch.float32
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    _weight = torch.randn(V, H, device=device, dtype=dtype)
+    _weight1 = _weight.detach().clone().requires_grad_(True)
+    _weight2 = _weight.detach().clone().requires_grad_(True)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+
+    loss1 = LigerFusedLinearCrossEntropyLoss()(_weight1, _input1, target)
+    loss2 = LigerFusedLinearCrossEntropyLoss(max_chunk_bytes=max_chunk_bytes)(_weight2, _input2, target)
+    assert_verbose_allclose(loss1, loss2, atol=1e-5, rtol=1e-5)
+
+    loss1.backward()
+    loss2.backward()
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=1e-5, rtol=1e-5)
+    assert_verbose_allclose(_weight1.grad, _weight2.grad, atol=1e-5, rtol=1e-5)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("reduction", ["mean", "sum"])
+@pytest.mark.parametrize("bias", [True, False])
+@pytest.mark.parametrize(
+    "use_token_scaling, compact_ignored_tokens, accum_dtype",
+    [(False, False, None), (True, False, None), (False, True, torch.float32)],
+)
+def test_correctness_with_deferred_grad_mode(
+    B, T, H, V, reduction, bias, use_token_scaling, compact_ignored_tokens, accum_dtype
+):
+    """Recomputing the gradients in backward must match the gradients computed in forward."""
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    bias_tensor = torch.randn(V, device=device, dtype=dtype) if bias else None
+    ce_weight = torch.rand(V, device=device, dtype=torch.float32)
+
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 3]] = -100
+
+    outputs = []
+    for grad_mode in ("eager", "deferred"):
+        _input = _tensor.detach().clone().requires_grad_(True)
+        w = weight.detach().clone().requires_grad_(True)
+        b = bias_tensor.detach().clone().requires_grad_(True) if bias else None
+        result = liger_fused_linear_cross_entropy(
+            input=_input,
+            weight=w,
+            target=target,
+            bias=b,
+            ce_weight=ce_weight,
+            lse_square_scale=1e-4,
+            label_smoothing=0.1,
+            reduction=reduction,
+            return_z_loss=True,
+            accum_dtype=accum_dtype,
+            use_token_scaling=use_token_scaling,
+            compact_ignored_tokens=compact_ignored_tokens,
+            grad_mode=grad_mode,
+        )
+        # a non-unit grad_output, as with loss scaling
+        (result.loss * 2.5).backward()
+        outputs.append((result, _input.grad, w.grad, b.grad if bias else None))
+
+    (ref, ref_grad_input, ref_grad_weight, ref_grad_bias), (out, grad_input, grad_weight, grad_bias) = outputs
+    assert_verbose_allclose(ref.loss, out.loss, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(ref.z_loss, out.z_loss, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(ref_grad_input, grad_input, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(ref_grad_weight, grad_weight, atol=1e-4, rtol=5e-4)
+    if bias:
+        assert_verbose_allclose(ref_grad_bias, grad_bias, atol=1e-5, rtol=5e-4)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("grad_mode", ["eager", "deferred"])
+@pytest.mark.parametrize(
+    "bias, use_token_scaling, vocab_tile_size",
+    [(False, False, None), (True, True, None), (True, True, 50)],
+)
+def test_per_token_grad_output(B, T, H, V, grad_mode, bias, use_token_scaling, vocab_tile_size):
+    """A per-token grad_output of reduction="none" (e.g. advantages applied after the loss) is applied row by row."""
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    bias_tensor = torch.randn(V, device=device, dtype=dtype) if bias else None
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 3]] = -100
+    advantages = torch.randn(B * T, device=device, dtype=dtype)
+
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    weight1 = weight.detach().clone().requires_grad_(True)
+    bias1 = bias_tensor.detach().clone().requires_grad_(True) if bias else None
+    logits = _input1 @ weight1.t()
+    if bias:
+        logits = logits + bias1
+    ref = torch.nn.functional.cross_entropy(logits, target, reduction="none", label_smoothing=0.1)
+    if use_token_scaling:
+        probs = torch.softmax(logits.detach(), dim=-1)
+        ref = ref * probs.gather(-1, target.where(target != -100, 0).unsqueeze(-1)).squeeze(-1)
+    (ref * advantages).sum().backward()
+
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    weight2 = weight.detach().clone().requires_grad_(True)
+    bias2 = bias_tensor.detach().clone().requires_grad_(True) if bias else None
+    out = LigerFusedLinearCrossEntropyLoss(
+        reduction="none",
+        label_smoothing=0.1,
+        use_token_scaling=use_token_scaling,
+        grad_mode=grad_mode,
+        vocab_tile_size=vocab_tile_size,
+    )(weight2, _input2, target, bias2)
+    (out * advantages).sum().backward()
+
+    assert_verbose_allclose(ref, out, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(weight1.grad, weight2.grad, atol=1e-4, rtol=5e-4)
+    if bias:
+        assert_verbose_allclose(bias1.grad, bias2.grad, atol=1e-5, rtol=5e-4)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("grad_mode", ["eager", "deferred"])
+@pytest.mark.parametrize("use_main_grad", [True, False])
+def test_correctness_with_accumulate_grad_weight(B, T, H, V, grad_mode, use_main_grad):
+    """Accumulating several micro-batches in place must match the gradient accumulated by autograd."""
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    micro_batches = []
+    for _ in range(3):
+        target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+        target[torch.randperm(B * T)[: B * T // 3]] = -100
+        micro_batches.append((torch.randn(B * T, H, device=device, dtype=dtype), target))
+
+    weight1 = weight.detach().clone().requires_grad_(True)
+    weight2 = weight.detach().clone().requires_grad_(True)
+    if use_main_grad:
+        weight2.main_grad = torch.zeros(V, H, device=device, dtype=torch.float32)
+
+    ref_loss_fn = LigerFusedLinearCrossEntropyLoss(grad_mode=grad_mode)
+    loss_fn = LigerFusedLinearCrossEntropyLoss(grad_mode=grad_mode, accumulate_grad_weight=True)
+    for _tensor, target in micro_batches:
+        _input1 = _tensor.detach().clone().requires_grad_(True)
+        _input2 = _tensor.detach().clone().requires_grad_(True)
+        (ref_loss_fn(weight1, _input1, target) * 0.5).backward()
+        (loss_fn(weight2, _input2, target) * 0.5).backward()
+        assert_verbose_allclose(_input1.grad, _input2.grad, atol=1e-5, rtol=5e-4)
+
+    if use_main_grad:
+        assert weight2.grad is None
+        assert_verbose_allclose(weight1.grad, weight2.main_grad, atol=1e-4, rtol=5e-4)
+    else:
+        assert_verbose_allclose(weight1.grad, weight2.grad, atol=1e-4, rtol=5e-4)
+
+
+def test_accumulate_grad_weight_keeps_main_grad_precision():
+    """With grad_mode="eager", the weight gradient added into an fp32 main_grad is not downcast to a bf16 weight."""
+    torch.manual_seed(42)
+    B, T, H, V = 2, 47, 31, 123
+    weight = torch.randn(V, H, device=device, dtype=torch.bfloat16, requires_grad=True)
+    weight.main_grad = torch.zeros(V, H, device=device, dtype=torch.float32)
+    _input = torch.randn(B * T, H, device=device, dtype=torch.bfloat16, requires_grad=True)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+
+    loss = LigerFusedLinearCrossEntropyLoss(accumulate_grad_weight=True)(weight, _input, target)
+    _, saved_grad_weight, _ = loss.grad_fn.saved_tensors
+    assert saved_grad_weight.dtype == torch.float32
+    expected = saved_grad_weight.clone()
+    loss.backward()
+    assert weight.grad is None
+    assert_verbose_allclose(weight.main_grad, expected, atol=0, rtol=0)
+
+
+def _test_vocab_parallel_fused_linear_cross_entropy(
+    rank, world_size, B, T, H, V, reduction, bias, has_ce_weight, label_smoothing, lse_square_scale, softcap, file_name
+):
+    torch.distributed.init_process_group(
+        backend=infer_comm_backend() if device != "cpu" else "gloo",
+        init_method=f"file://{file_name}",
+        rank=rank,
+        world_size=world_size,
+    )
+    _device = f"{device}:{rank}" if device != "cpu" else "cpu"
+    # same seed on all ranks: the full tensors are identical everywhere and each rank keeps its shard of the vocab
+    torch.manual_seed(42)
+    dtype = torch.float32
+    weight = torch.randn(V, H, device=_device, dtype=dtype)
+    bias_tensor = torch.randn(V, device=_device, dtype=dtype) if bias else None
+    ce_weight = torch.rand(V, device=_device, dtype=torch.float32) if has_ce_weight else None
+    _tensor = torch.randn(B * T, H, device=_device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=_device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 3]] = -100
+    shard = slice(rank * V // world_size, (rank + 1) * V // world_size)
+
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    weight1 = weight.detach().clone().requires_grad_(True)
+    bias1 = bias_tensor.detach().clone().requires_grad_(True) if bias else None
+    logits = _input1 @ weight1.t()
+    if bias:
+        logits = logits + bias1
+    if softcap is not None:
+        logits = softcap * torch.tanh(logits / softcap)
+    ref_loss, ref_z_loss = CrossEntropyWithZLoss(
+        weight=ce_weight,
+        lse_square_scale=lse_square_scale,
+        reduction=reduction,
+        label_smoothing=label_smoothing,
+        return_z_loss=True,
+    )(logits, target)
+
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    weight2 = weight[shard].detach().clone().requires_grad_(True)
+    bias2 = bias_tensor[shard].detach().clone().requires_grad_(True) if bias else None
+    output = LigerVocabParallelFusedLinearCrossEntropyLoss(
+        ce_weight=ce_weight[shard] if has_ce_weight else None,
+        lse_square_scale=lse_square_scale,
+        label_smoothing=label_smoothing,
+        reduction=reduction,
+        softcap=softcap,
+        return_z_loss=True,
+    )(weight2, _input2, target, bias2)
+
+    assert_verbose_allclose(ref_loss, output.loss, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(ref_z_loss, output.z_loss, atol=1e-5, rtol=5e-4)
+
+    (ref_loss * 2.0).backward()
+    (output.loss * 2.0).backward()
+
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(weight1.grad[shard], weight2.grad, atol=1e-5, rtol=5e-4)
+    if bias:
+        assert_verbose_allclose(bias1.grad[shard], bias2.grad, atol=1e-5, rtol=5e-4)
+
+
+@pytest.mark.skipif(
+    device != "cpu" and torch.cuda.device_count() < 2,
+    reason="Requires 2 devices, or runs on cpu with the gloo backend",
+)
+@pytest.mark.parametrize("world_size, B, T, H, V", [(2, 2, 19, 31, 124)])
+@pytest.mark.parametrize("reduction", ["mean", "sum"])
+@pytest.mark.parametrize(
+    "bias, has_ce_weight, label_smoothing, lse_square_scale, softcap",
+    [
+        (False, False, 0.0, 0.0, None),
+        (True, True, 0.1, 1e-4, None),
+        (False, False, 0.1, 1e-4, 30.0),
+    ],
+)
+def test_vocab_parallel_correctness(
+    world_size, B, T, H, V, reduction, bias, has_ce_weight, label_smoothing, lse_square_scale, softcap
+):
+    with tempfile.NamedTemporaryFile() as f:
+        mp.spawn(
+            _test_vocab_parallel_fused_linear_cross_entropy,
+            args=(
+                world_size,
+                B,
+                T,
+                H,
+                V,
+                reduction,
+                bias,
+                has_ce_weight,
+                label_smoothing,
+                lse_square_scale,
+                softcap,
+                f.name,
+            ),
+            nprocs=world_size,
+            join=True,
+        )
+
+
+def test_vocab_parallel_rejects_reduction_none():
+    """The weight gradient is summed over the tokens in forward, so a per-token grad_output cannot be applied to it."""
+    _input = torch.randn(8, 31, device=device, requires_grad=True)
+    weight = torch.randn(62, 31, device=device, requires_grad=True)
+    target = torch.randint(0, 124, (8,), device=device)
+    with pytest.raises(AssertionError, match="reduction"):
+        LigerVocabParallelFusedLinearCrossEntropyLoss(reduction="none")
+    with pytest.raises(AssertionError, match="reduction"):
+        LigerVocabParallelFusedLinearCrossEntropyFunction.apply(
+            _input, weight, target, None, None, -100, 0.0, 0.0, "none"
+        )
+
+
+def _test_context_parallel_normalization(rank, world_size, B, T, H, V, grad_mode, sync_free, has_ce_weight, file_name):
+    torch.distributed.init_process_group(
+        backend=infer_comm_backend() if device != "cpu" else "gloo",
+        init_method=f"file://{file_name}",
+        rank=rank,
+        world_size=world_size,
+    )
+    _device = f"{device}:{rank}" if device != "cpu" else "cpu"
+    # same seed on all ranks: each rank keeps its slice of the sequences
+    torch.manual_seed(42)
+    dtype = torch.float32
+    weight = torch.randn(V, H, device=_device, dtype=dtype)
+    ce_weight = torch.rand(V, device=_device, dtype=torch.float32) if has_ce_weight else None
+    _tensor = torch.randn(B, T, H, device=_device, dtype=dtype)
+    target = torch.randint(0, V, (B, T), device=_device, dtype=torch.long)
+    # uneven number of ignored tokens across the slices
+    target[:, : T // 3] = -100
+    local = slice(rank * T // world_size, (rank + 1) * T // world_size)
+
+    _input1 = _tensor.detach().clone().view(-1, H).requires_grad_(True)
+    weight1 = weight.detach().clone().requires_grad_(True)
+    ref_loss = CrossEntropyWithZLoss(weight=ce_weight)(_input1 @ weight1.t(), target.view(-1))
+    ref_loss.backward()
+
+    _input2 = _tensor[:, local].detach().clone().reshape(-1, H).requires_grad_(True)
+    weight2 = weight.detach().clone().requires_grad_(True)
+    loss = liger_fused_linear_cross_entropy(
+        _input2,
+        weight2,
+        target[:, local].reshape(-1),
+        ce_weight=ce_weight,
+        sync_free=sync_free,
+        grad_mode=grad_mode,
+        process_group=torch.distributed.group.WORLD,
+    )
+    loss.backward()
+
+    # the sum of the losses and weight gradients of all ranks is the global token mean
+    total_loss = loss.detach().clone()
+    torch.distributed.all_reduce(total_loss)
+    torch.distributed.all_reduce(weight2.grad)
+    assert_verbose_allclose(ref_loss, total_loss, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(_input1.grad.view(B, T, H)[:, local].reshape(-1, H), _input2.grad, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(weight1.grad, weight2.grad, atol=1e-5, rtol=5e-4)
+
+
+@pytest.mark.skipif(
+    device != "cpu" and torch.cuda.device_count() < 2,
+    reason="Requires 2 devices, or runs on cpu with the gloo backend",
+)
+@pytest.mark.parametrize("world_size, B, T, H, V", [(2, 2, 38, 31, 123)])
+@pytest.mark.parametrize(
+    "grad_mode, sync_free, has_ce_weight",
+    [("eager", False, False), ("eager", True, True), ("deferred", False, True)],
+)
+def test_context_parallel_normalization(world_size, B, T, H, V, grad_mode, sync_free, has_ce_weight):
+    with tempfile.NamedTemporaryFile() as f:
+        mp.spawn(
+            _test_context_parallel_normalization,
+            args=(world_size, B, T, H, V, grad_mode, sync_free, has_ce_weight, f.name),
+            nprocs=world_size,
+            join=True,
+        )
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("vocab_tile_size", [32, 50, 123])
+@pytest.mark.parametrize("reduction", ["mean", "sum"])
+@pytest.mark.parametrize(
+    "grad_mode, has_ce_weight, use_token_scaling, compact_ignored_tokens",
+    [
+        ("eager", False, False, False),
+        ("eager", True, False, True),
+        ("eager", False, True, False),
+        ("deferred", True, False, False),
+    ],
+)
+def test_correctness_with_vocab_tile_size(
+    B, T, H, V, vocab_tile_size, reduction, grad_mode, has_ce_weight, use_token_scaling, compact_ignored_tokens
+):
+    """The vocab-tiled (online softmax) path must match the path materializing full rows of logits."""
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    bias = torch.randn(V, device=device, dtype=dtype)
+    ce_weight = torch.rand(V, device=device, dtype=torch.float32) if has_ce_weight else None
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 3]] = -100
+
+    outputs = []
+    for tile_size in (None, vocab_tile_size):
+        _input = _tensor.detach().clone().requires_grad_(True)
+        w = weight.detach().clone().requires_grad_(True)
+        b = bias.detach().clone().requires_grad_(True)
+        result = liger_fused_linear_cross_entropy(
+            input=_input,
+            weight=w,
+            target=target,
+            bias=b,
+            ce_weight=ce_weight,
+            lse_square_scale=1e-4,
+            label_smoothing=0.1,
+            reduction=reduction,
+            return_z_loss=True,
+            use_token_scaling=use_token_scaling,
+            return_token_accuracy=True,
+            return_predicted_tokens=True,
+            compact_ignored_tokens=compact_ignored_tokens,
+            grad_mode=grad_mode,
+            vocab_tile_size=tile_size,
+        )
+        (result.loss * 2.5).backward()
+        outputs.append((result, _input.grad, w.grad, b.grad))
+
+    (ref, ref_grad_input, ref_grad_weight, ref_grad_bias), (out, grad_input, grad_weight, grad_bias) = outputs
+    assert_verbose_allclose(ref.loss, out.loss, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(ref.z_loss, out.z_loss, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(ref.token_accuracy, out.token_accuracy, atol=1e-6, rtol=1e-6)
+    assert torch.equal(ref.predicted_tokens, out.predicted_tokens)
+    assert_verbose_allclose(ref_grad_input, grad_input, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(ref_grad_weight, grad_weight, atol=1e-4, rtol=5e-4)
+    assert_verbose_allclose(ref_grad_bias, grad_bias, atol=1e-5, rtol=5e-4)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("num_sampled", [16, 40])
+@pytest.mark.parametrize("reduction", ["mean", "sum"])
+@pytest.mark.parametrize("bias", [True, False])
+def test_correctness_with_sampled_softmax(B, T, H, V, num_sampled, reduction, bias):
+    """With a uniform sampler, the loss and gradients match a torch sampled softmax drawing the same negatives."""
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    bias_tensor = torch.randn(V, device=device, dtype=dtype) if bias else None
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 3]] = -100
+
+    # reference: the rows fit in a single chunk, which draws the negatives once from the global generator
+    torch.manual_seed(0)
+    sampled_ids = torch.randint(0, V, (num_sampled,), device=device)
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    weight1 = weight.detach().clone().requires_grad_(True)
+    bias1 = bias_tensor.detach().clone().requires_grad_(True) if bias else None
+    target_mask = target != -100
+    safe_target = target.where(target_mask, 0)
+    candidates = torch.cat([safe_target.unsqueeze(-1), sampled_ids.expand(B * T, -1)], dim=-1)
+    logits = (_input1.unsqueeze(1) * weight1[candidates]).sum(dim=-1)
+    if bias:
+        logits = logits + bias1[candidates]
+    logits = logits - math.log(num_sampled / V)
+    logits[:, 1:] = logits[:, 1:].masked_fill(sampled_ids == safe_target.unsqueeze(-1), float("-inf"))
+    ref = torch.nn.functional.cross_entropy(
+        logits, torch.zeros_like(target).where(target_mask, -100), reduction=reduction
+    )
+
+    torch.manual_seed(0)
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    weight2 = weight.detach().clone().requires_grad_(True)
+    bias2 = bias_tensor.detach().clone().requires_grad_(True) if bias else None
+    out = LigerFusedLinearCrossEntropyLoss(
+        reduction=reduction, max_chunk_bytes=2**30, num_sampled=num_sampled, sampler="uniform"
+    )(weight2, _input2, target, bias2)
+    assert_verbose_allclose(ref, out, atol=1e-5, rtol=5e-4)
+
+    ref.backward()
+    out.backward()
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(weight1.grad, weight2.grad, atol=1e-5, rtol=5e-4)
+    if bias:
+        assert_verbose_allclose(bias1.grad, bias2.grad, atol=1e-5, rtol=5e-4)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("sampler", ["uniform", "unigram", "log_uniform"])
+def test_sampled_softmax_eval_is_exact(B, T, H, V, sampler):
+    """In eval mode the sampled softmax loss falls back to the exact full softmax."""
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    _input = torch.randn(B * T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    sampling_probs = torch.rand(V, device=device) if sampler == "unigram" else None
+
+    loss_fn = LigerFusedLinearCrossEntropyLoss(num_sampled=16, sampler=sampler, sampling_probs=sampling_probs)
+    sampled = loss_fn(weight, _input, target)
+    assert torch.isfinite(sampled)
+
+    loss_fn.eval()
+    exact = loss_fn(weight, _input, target)
+    ref = torch.nn.functional.cross_entropy(_input @ weight.t(), target)
+    assert_verbose_allclose(ref, exact, atol=1e-5, rtol=5e-4)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+def test_sampled_softmax_unigram_only_touches_candidates(B, T, H, V):
+    """Only the weight rows of the targets and of the classes the sampler can draw get a gradient."""
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype, requires_grad=True)
+    _input = torch.randn(B * T, H, device=device, dtype=dtype, requires_grad=True)
+    target = torch.randint(0, V // 2, (B * T,), device=device, dtype=torch.long)
+    sampling_probs = torch.zeros(V, device=device)
+    sampling_probs[V // 2 : V // 2 + 10] = 1.0
+
+    loss = liger_fused_linear_cross_entropy(
+        _input, weight, target, num_sampled=32, sampler="unigram", sampling_probs=sampling_probs
+    )
+    loss.backward()
+    touched = (weight.grad != 0).any(dim=-1)
+    assert touched[V // 2 : V // 2 + 10].any()
+    assert not touched[V // 2 + 10 :].any()
+    assert torch.equal(touched[: V // 2], torch.isin(torch.arange(V // 2, device=device), target))
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("reduction", ["mean", "sum"])
+@pytest.mark.parametrize(
+    "grad_mode, vocab_tile_size, compact_ignored_tokens, use_token_scaling",
+    [
+        ("eager", None, False, False),
+        ("eager", None, True, True),
+        ("deferred", None, False, True),
+        ("eager", 50, False, True),
+        ("deferred", 50, True, False),
+    ],
+)
+def test_correctness_with_token_weights(
+    B, T, H, V, reduction, grad_mode, vocab_tile_size, compact_ignored_tokens, use_token_scaling
+):
+    """token_weights multiply the loss of every token and its gradient, on top of the token scaling."""
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 3]] = -100
+    token_weights = torch.rand(B * T, device=device, dtype=dtype)
+
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    weight1 = weight.detach().clone().requires_grad_(True)
+    logits = _input1 @ weight1.t()
+    ref = torch.nn.functional.cross_entropy(logits, target, reduction="none", label_smoothing=0.1)
+    if use_token_scaling:
+        probs = torch.softmax(logits.detach(), dim=-1)
+        ref = ref * probs.gather(-1, target.where(target != -100, 0).unsqueeze(-1)).squeeze(-1)
+    ref = (ref * token_weights).sum()
+    if reduction == "mean":
+        ref = ref / (target != -100).sum()
+    ref.backward()
+
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    weight2 = weight.detach().clone().requires_grad_(True)
+    out = LigerFusedLinearCrossEntropyLoss(
+        label_smoothing=0.1,
+        reduction=reduction,
+        use_token_scaling=use_token_scaling,
+        compact_ignored_tokens=compact_ignored_tokens,
+        grad_mode=grad_mode,
+        vocab_tile_size=vocab_tile_size,
+    )(weight2, _input2, target, token_weights=token_weights)
+    out.backward()
+
+    assert_verbose_allclose(ref, out, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(weight1.grad, weight2.grad, atol=1e-4, rtol=5e-4)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("k", [1, 5])
+@pytest.mark.parametrize(
+    "bias, vocab_tile_size, compact_ignored_tokens",
+    [
+        (False, None, False),
+        (True, None, True),
+        (True, 50, False),
+    ],
+)
+def test_correctness_with_topk(B, T, H, V, k, bias, vocab_tile_size, compact_ignored_tokens):
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    bias_tensor = torch.randn(V, device=device, dtype=dtype) if bias else None
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 3]] = -100
+
+    logits = _tensor @ weight.t()
+    if bias:
+        logits = logits + bias_tensor
+    expected_logprobs, expected_ids = torch.log_softmax(logits, dim=-1).topk(k, dim=-1)
+
+    _input = _tensor.detach().clone().requires_grad_(True)
+    result = liger_fused_linear_cross_entropy(
+        _input,
+        weight,
+        target,
+        bias_tensor,
+        compact_ignored_tokens=compact_ignored_tokens,
+        vocab_tile_size=vocab_tile_size,
+        return_topk=k,
+    )
+    assert result.topk_ids.shape == result.topk_logprobs.shape == (B * T, k)
+
+    non_ignore_mask = target != -100
+    assert torch.equal(result.topk_ids[non_ignore_mask], expected_ids[non_ignore_mask])
+    assert_verbose_allclose(
+        result.topk_logprobs[non_ignore_mask], expected_logprobs[non_ignore_mask], atol=1e-5, rtol=1e-5
+    )
+    assert torch.all(result.topk_ids[~non_ignore_mask] == -1)
+    assert torch.all(result.topk_logprobs[~non_ignore_mask] == 0)
+    assert not result.topk_logprobs.requires_grad
+    result.loss.backward()
+    assert _input.grad is not None
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("reduction", ["mean", "none"])
+@pytest.mark.parametrize(
+    "bias, vocab_tile_size, compact_ignored_tokens",
+    [
+        (False, None, False),
+        (True, None, True),
+        (True, 50, False),
+    ],
+)
+def test_correctness_with_entropy(B, T, H, V, reduction, bias, vocab_tile_size, compact_ignored_tokens):
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    bias_tensor = torch.randn(V, device=device, dtype=dtype) if bias else None
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 3]] = -100
+    non_ignore_mask = target != -100
+
+    logits = _tensor @ weight.t()
+    if bias:
+        logits = logits + bias_tensor
+    logprobs = torch.log_softmax(logits, dim=-1)
+    expected_entropy = -(logprobs.exp() * logprobs).sum(dim=-1).where(non_ignore_mask, 0.0)
+    if reduction != "none":
+        expected_entropy = expected_entropy.sum() / non_ignore_mask.sum()
+
+    _input = _tensor.detach().clone().requires_grad_(True)
+    result = liger_fused_linear_cross_entropy(
+        _input,
+        weight,
+        target,
+        bias_tensor,
+        reduction=reduction,
+        compact_ignored_tokens=compact_ignored_tokens,
+        vocab_tile_size=vocab_tile_size,
+        return_entropy=True,
+    )
+    assert_verbose_allclose(result.entropy, expected_entropy, atol=1e-5, rtol=1e-5)
+    result.loss.backward(torch.ones_like(result.loss))
+    assert _input.grad is not None
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("bias", [True, False])
+@pytest.mark.parametrize("compact_ignored_tokens", [True, False])
+def test_sequence_nll(B, T, H, V, bias, compact_ignored_tokens):
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype, requires_grad=True)
+    bias_tensor = torch.randn(V, device=device, dtype=dtype) if bias else None
+    _input = torch.randn(B, T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B, T), device=device, dtype=torch.long)
+    target[torch.rand(B, T, device=device) < 0.3] = -100
+    target[-1] = -100
+
+    logits = _input @ weight.detach().t()
+    if bias:
+        logits = logits + bias_tensor
+    expected_nll = torch.nn.functional.cross_entropy(logits.view(B * T, V), target.view(B * T), reduction="none").view(
+        B, T
+    )
+    expected_nll = expected_nll.sum(dim=-1)
+    expected_n_tokens = (target != -100).sum(dim=-1)
+
+    nll, n_tokens = liger_fused_linear_cross_entropy_sequence_nll(
+        _input, weight, target, bias_tensor, compact_ignored_tokens=compact_ignored_tokens
+    )
+    assert not nll.requires_grad
+    assert_verbose_allclose(nll, expected_nll, atol=1e-4, rtol=1e-5)
+    assert torch.equal(n_tokens, expected_n_tokens)
+    assert_verbose_allclose(
+        torch.exp(nll[:-1] / n_tokens[:-1]), torch.exp(expected_nll[:-1] / expected_n_tokens[:-1]), atol=1e-4, rtol=1e-5
+    )
+    # a fully ignored sequence contributes nothing
+    assert nll[-1] == 0 and n_tokens[-1] == 0
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("reduction", ["mean", "sum"])
+def test_forward_without_gradients(B, T, H, V, reduction):
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 3]] = -100
+
+    _input = _tensor.detach().clone().requires_grad_(True)
+    expected = fused_linear_cross_entropy_forward(_input, weight, target, reduction=reduction)
+    assert expected[-3] is not None
+
+    # no gradient buffer at all, same loss
+    output = fused_linear_cross_entropy_forward(_tensor, weight, target, reduction=reduction)
+    grad_input, grad_weight, grad_bias = output[-3:]
+    assert grad_input is None and grad_weight is None and grad_bias is None
+    assert_verbose_allclose(output[0], expected[0], atol=1e-5, rtol=1e-5)
+
+    with torch.no_grad():
+        loss = liger_fused_linear_cross_entropy(_tensor, weight, target, reduction=reduction)
+    assert_verbose_allclose(loss, expected[0], atol=1e-5, rtol=1e-5)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize("shift", [1, 3])
+@pytest.mark.parametrize("reduction", ["mean", "sum", "none"])
+@pytest.mark.parametrize(
+    "bias, has_ce_weight, compact_ignored_tokens, chunked",
+    [
+        (False, False, False, False),
+        (True, False, False, True),
+        (False, True, False, False),
+        (False, False, True, True),
+    ],
+)
+def test_correctness_with_shift(B, T, H, V, shift, reduction, bias, has_ce_weight, compact_ignored_tokens, chunked):
+    torch.manual_seed(42)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    bias_tensor = torch.randn(V, device=device, dtype=dtype) if bias else None
+    ce_weight = torch.rand(V, device=device, dtype=dtype) if has_ce_weight else None
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    labels = torch.randint(0, V, (B, T), device=device, dtype=torch.long)
+    labels[torch.rand(B, T, device=device) < 0.2] = -100
+    shifted_labels = torch.nn.functional.pad(labels, (0, shift), value=-100)[:, shift:].reshape(-1)
+    # chunks that do not start at a sequence boundary
+    max_chunk_bytes = 2 * V * H * 4 + 16 * V * 4 if chunked else None
+
+    kwargs = dict(
+        ce_weight=ce_weight,
+        reduction=reduction,
+        compact_ignored_tokens=compact_ignored_tokens,
+        max_chunk_bytes=max_chunk_bytes,
+        return_token_accuracy=True,
+    )
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    weight1 = weight.detach().clone().requires_grad_(True)
+    output1 = liger_fused_linear_cross_entropy(_input1, weight1, shifted_labels, bias_tensor, **kwargs)
+    output1.loss.backward(torch.ones_like(output1.loss))
+
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    weight2 = weight.detach().clone().requires_grad_(True)
+    output2 = liger_fused_linear_cross_entropy(_input2, weight2, labels, bias_tensor, shift=shift, **kwargs)
+    output2.loss.backward(torch.ones_like(output2.loss))
+
+    assert_verbose_allclose(output1.loss, output2.loss, atol=1e-5, rtol=1e-5)
+    assert_verbose_allclose(output1.token_accuracy, output2.token_accuracy, atol=1e-6, rtol=1e-6)
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=1e-5, rtol=1e-5)
+    assert_verbose_allclose(weight1.grad, weight2.grad, atol=1e-5, rtol=1e-5)
+
+
+@pytest.mark.parametrize("num_items_in_batch", [None, 100])
+def test_causal_lm_loss_without_label_copy(num_items_in_batch):
+    from liger_kernel.transformers.model.loss_utils import LigerForCausalLMLoss
+
+    torch.manual_seed(42)
+    B, T, H, V = 4, 47, 31, 123
+    weight = torch.randn(V, H, device=device)
+    hidden_states = torch.randn(B, T, H, device=device)
+    labels = torch.randint(0, V, (B, T), device=device, dtype=torch.long)
+    labels[torch.rand(B, T, device=device) < 0.2] = -100
+
+    shift_labels = torch.nn.functional.pad(labels, (0, 1), value=-100)[..., 1:].contiguous()
+    hidden_states1 = hidden_states.clone().requires_grad_(True)
+    loss1 = LigerForCausalLMLoss(
+        hidden_states1, weight, None, H, num_items_in_batch=num_items_in_batch, shift_labels=shift_labels
+    )
+    loss1.backward()
+
+    hidden_states2 = hidden_states.clone().requires_grad_(True)
+    loss2 = LigerForCausalLMLoss(
+        hidden_states2, weight, labels, H, num_items_in_batch=num_items_in_batch, not_a_flce_kwarg=True
+    )
+    loss2.backward()
+
+    assert_verbose_allclose(loss1, loss2, atol=1e-5, rtol=1e-5)
+    assert_verbose_allclose(hidden_states1.grad, hidden_states2.grad, atol=1e-5, rtol=1e-5)
+
+
+@pytest.mark.parametrize("seq_lens", [[47, 30, 64, 47], [1, 100, 87], [188]])
+@pytest.mark.parametrize(
+    "has_ce_weight, grad_mode, compact_ignored_tokens, chunked",
+    [
+        (False, "eager", False, False),
+        (False, "eager", True, True),
+        (True, "eager", False, True),
+        (False, "deferred", False, True),
+    ],
+)
+def test_correctness_with_sequence_mean(seq_lens, has_ce_weight, grad_mode, compact_ignored_tokens, chunked):
+    torch.manual_seed(42)
+    H, V = 31, 123
+    BT = sum(seq_lens)
+    dtype = torch.float32
+
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    ce_weight = torch.rand(V, device=device, dtype=dtype) if has_ce_weight else None
+    _tensor = torch.randn(BT, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (BT,), device=device, dtype=torch.long)
+    target[torch.rand(BT, device=device) < 0.2] = -100
+    cu_seqlens = torch.tensor([0] + seq_lens, device=device, dtype=torch.int32).cumsum(0, dtype=torch.int32)
+    if len(seq_lens) > 1:
+        # a sequence without any target does not count in the mean over the sequences
+        target[cu_seqlens[1] : cu_seqlens[2]] = -100
+
+    # reference: the mean cross entropy of every unpacked sequence, averaged over the sequences
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    weight1 = weight.detach().clone().requires_grad_(True)
+    seq_losses = [
+        torch.nn.functional.cross_entropy(x @ weight1.t(), y, weight=ce_weight)
+        for x, y in zip(_input1.split(seq_lens), target.split(seq_lens))
+        if (y != -100).any()
+    ]
+    loss1 = torch.stack(seq_losses).mean()
+    (loss1 * 2.0).backward()
+
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    weight2 = weight.detach().clone().requires_grad_(True)
+    liger_ce = LigerFusedLinearCrossEntropyLoss(
+        ce_weight=ce_weight,
+        reduction="sequence_mean",
+        grad_mode=grad_mode,
+        compact_ignored_tokens=compact_ignored_tokens,
+        max_chunk_bytes=2 * V * H * 4 + 16 * V * 4 if chunked else None,
+    )
+    loss2 = liger_ce(weight2, _input2, target, cu_seqlens=cu_seqlens)
+    (loss2 * 2.0).backward()
+
+    assert_verbose_allclose(loss1, loss2, atol=1e-5, rtol=1e-5)
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=1e-5, rtol=1e-5)
+    assert_verbose_allclose(weight1.grad, weight2.grad, atol=1e-5, rtol=1e-5)
+
+
+def test_sequence_mean_requires_cu_seqlens():
+    _input = torch.randn(8, 4, device=device)
+    weight = torch.randn(16, 4, device=device)
+    target = torch.randint(0, 16, (8,), device=device)
+    with pytest.raises(AssertionError, match="cu_seqlens"):
+        liger_fused_linear_cross_entropy(_input, weight, target, reduction="sequence_mean")
+    with pytest.raises(AssertionError, match="cu_seqlens"):
+        liger_fused_linear_cross_entropy(_input, weight, target, cu_seqlens=torch.tensor([0, 8], device=device))
@@ -448,3 +448,32 @@ def test_amp(autocast_dtype, atol, rtol):
         atol=atol,
         rtol=rtol,
     )
+
+
+@pytest.mark.parametrize("B, T, H, V", [(9, 7, 41, 41)])
+@pytest.mark.parametrize("max_chunk_bytes", [1, 1 << 30])
+def test_correctness_with_max_chunk_bytes(B, T, H, V, max_chunk_bytes):
+    dtype = torch.float32
+    _weight = torch.rand(V, H // 2, device=device, dtype=dtype)
+    _weight1 = _weight.detach().clone().requires_grad_(True)
+    _weight2 = _weight.detach().clone().requires_grad_(True)
+    teacher_weight = torch.rand(V, H, device=device, dtype=dtype)
+
+    _tensor = torch.rand(B * T, H // 2, device=device, dtype=dtype) * 0.5
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    teacher_input = torch.rand(B * T, H, device=device, dtype=dtype) * 0.5
+
+    label = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    label[:5] = -100
+
+    output1 = LigerFusedLinearJSD()(_input1, _weight1, teacher_input, teacher_weight, label)
+    output2 = LigerFusedLinearJSD(max_chunk_bytes=max_chunk_bytes)(
+        _input2, _weight2, teacher_input, teacher_weight, label
+    )
+    assert_verbose_allclose(output1, output2, atol=1e-5, rtol=5e-4)
+
+    output1.backward()
+    output2.backward()
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(_weight1.grad, _weight2.grad, atol=1e-5, rtol=5e-4)
@@ -0,0 +1,123 @@
+import pytest
+import torch
+
+from test.utils import assert_verbose_allclose
+from test.utils import set_seed
+
+from liger_kernel.transformers.functional import liger_fused_linear_cross_entropy
+from liger_kernel.transformers.functional import liger_multi_head_fused_linear_cross_entropy
+from liger_kernel.transformers.fused_linear_cross_entropy import LigerMultiHeadFusedLinearCrossEntropyLoss
+from liger_kernel.utils import infer_device
+
+device = infer_device()
+
+
+def torch_multi_head_ce(weights, x, target, shifts, head_weights, ignore_index=-100, reduction="mean"):
+    """Ground truth: one lm_head + cross entropy per head on the shifted hidden states and labels (Medusa style)."""
+    loss = 0.0
+    head_losses = []
+    for weight, shift, head_weight in zip(weights, shifts, head_weights):
+        T = x.shape[1]
+        logits = x[:, : T - shift] @ weight.t()
+        loss_i = torch.nn.functional.cross_entropy(
+            logits.float().reshape(-1, weight.shape[0]),
+            target[:, shift:].reshape(-1),
+            ignore_index=ignore_index,
+            reduction=reduction,
+        )
+        head_losses.append(loss_i)
+        loss = loss + head_weight * loss_i
+    return loss, torch.stack(head_losses)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (8, 128, 1024, 4096),
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+@pytest.mark.parametrize(
+    "shifts, head_weights",
+    [
+        ([1, 2, 3], None),
+        ([0, 2, 5, 1], [1.0, 0.8, 0.64, 0.5]),
+        ([1, 2, 3], [1.0, 0.0, 0.5]),  # a switched off head
+    ],
+)
+@pytest.mark.parametrize("stacked", [True, False])
+@pytest.mark.parametrize(
+    "reduction, dtype, accum_dtype, atol, rtol",
+    [
+        ("mean", torch.bfloat16, None, 5e-3, 5e-2),
+        ("mean", torch.bfloat16, torch.float32, 5e-3, 5e-2),
+        ("mean", torch.float32, None, 1e-5, 5e-4),
+        ("sum", torch.float32, None, 1e-3, 5e-4),
+    ],
+)
+def test_correctness(B, T, H, V, shifts, head_weights, stacked, reduction, dtype, accum_dtype, atol, rtol):
+    set_seed(42)
+    n_heads = len(shifts)
+    _weights = torch.randn(n_heads, V, H, device=device, dtype=dtype) * 0.1
+    _tensor = torch.randn(B, T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B, T), device=device, dtype=torch.long)
+    target[torch.rand(B, T, device=device) < 0.2] = -100
+
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    weights1 = [w.detach().clone().requires_grad_(True) for w in _weights]
+    loss1, head_losses1 = torch_multi_head_ce(
+        weights1, _input1, target, shifts, head_weights or [1.0] * n_heads, reduction=reduction
+    )
+    loss1.backward()
+
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    if stacked:
+        weights2 = _weights.detach().clone().requires_grad_(True)
+    else:
+        weights2 = [w.detach().clone().requires_grad_(True) for w in _weights]
+    liger_ce = LigerMultiHeadFusedLinearCrossEntropyLoss(
+        shifts=shifts,
+        head_weights=head_weights,
+        reduction=reduction,
+        accum_dtype=accum_dtype,
+        return_head_losses=True,
+    )
+    loss2, head_losses2 = liger_ce(weights2, _input2, target)
+    loss2.backward()
+
+    assert_verbose_allclose(loss1, loss2, atol=atol, rtol=rtol)
+    assert_verbose_allclose(head_losses1, head_losses2, atol=atol, rtol=rtol)
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=atol, rtol=rtol)
+    grads2 = weights2.grad.unbind(0) if stacked else [w.grad for w in weights2]
+    for weight1, grad2 in zip(weights1, grads2):
+        assert_verbose_allclose(weight1.grad, grad2, atol=atol, rtol=rtol)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+def test_single_head_matches_fused_linear_cross_entropy(B, T, H, V):
+    """One head with shift 0 is the usual fused linear cross entropy, including a scaled grad_output."""
+    set_seed(42)
+    dtype = torch.float32
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    _tensor = torch.randn(B, T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B, T), device=device, dtype=torch.long)
+    target[torch.rand(B, T, device=device) < 0.3] = -100
+
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    weight1 = weight.detach().clone().requires_grad_(True)
+    loss1 = liger_fused_linear_cross_entropy(_input1.view(B * T, H), weight1, target.view(B * T))
+    (loss1 * 3.0).backward()
+
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    weight2 = weight.detach().clone().requires_grad_(True)
+    loss2 = liger_multi_head_fused_linear_cross_entropy(_input2, [weight2], target, shifts=[0])
+    (loss2 * 3.0).backward()
+
+    assert_verbose_allclose(loss1, loss2, atol=1e-5, rtol=1e-5)
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=1e-5, rtol=1e-5)
+    assert_verbose_allclose(weight1.grad, weight2.grad, atol=1e-5, rtol=1e-5)
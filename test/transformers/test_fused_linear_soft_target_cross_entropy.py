@@ -0,0 +1,175 @@
+import pytest
+import torch
+
+from test.utils import assert_verbose_allclose
+from test.utils import set_seed
+
+from liger_kernel.transformers.functional import liger_fused_linear_cross_entropy
+from liger_kernel.transformers.functional import liger_fused_linear_soft_target_cross_entropy
+from liger_kernel.transformers.fused_linear_cross_entropy import LigerFusedLinearSoftTargetCrossEntropyLoss
+from liger_kernel.utils import infer_device
+
+device = infer_device()
+
+
+class TorchLMHeadSoftTargetCE(torch.nn.Module):
+    """Ground truth: materialized logits and -sum_k p_k * log_softmax(logits)_{y_k}."""
+
+    def __init__(
+        self, H: int, V: int, dtype: torch.dtype, bias: bool = False, ignore_index: int = -100, reduction="mean"
+    ):
+        super().__init__()
+        self.lin = torch.nn.Linear(in_features=H, out_features=V, bias=bias, dtype=dtype)
+        self.ignore_index = ignore_index
+        self.reduction = reduction
+
+    def forward(self, x, target_indices, target_probs):
+        logprobs = torch.log_softmax(self.lin(x).float(), dim=-1)
+        is_target = target_indices != self.ignore_index
+        target_logprobs = logprobs.gather(-1, target_indices.where(is_target, 0))
+        loss = -(target_probs.float() * target_logprobs).where(is_target, 0.0).sum(dim=-1)
+        if self.reduction == "none":
+            return loss
+        if self.reduction == "sum":
+            return loss.sum()
+        return loss.sum() / is_target.any(dim=-1).sum()
+
+
+class LigerLMHeadSoftTargetCE(torch.nn.Module):
+    def __init__(
+        self, H: int, V: int, dtype: torch.dtype, bias: bool = False, ignore_index: int = -100, reduction="mean"
+    ):
+        super().__init__()
+        self.lin = torch.nn.Linear(in_features=H, out_features=V, bias=bias, dtype=dtype)
+        self.soft_ce = LigerFusedLinearSoftTargetCrossEntropyLoss(ignore_index=ignore_index, reduction=reduction)
+
+    def forward(self, x, target_indices, target_probs):
+        return self.soft_ce(self.lin.weight, x, target_indices, target_probs, self.lin.bias)
+
+
+def _soft_targets(BT, V, K, dtype):
+    """Distinct top-k classes per row with probabilities summing to 1, some of them padded, some rows fully padded."""
+    target_indices = torch.rand(BT, V, device=device).topk(K, dim=-1).indices
+    target_probs = torch.softmax(torch.randn(BT, K, device=device), dim=-1).to(dtype)
+    target_indices[torch.rand(BT, K, device=device) < 0.2] = -100
+    target_indices[torch.randperm(BT, device=device)[: BT // 5]] = -100
+    return target_indices, target_probs
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V, K",
+    [
+        (8, 128, 1024, 4096, 8),
+        (4, 47, 31, 123, 5),  # random shape
+    ],
+)
+@pytest.mark.parametrize("bias", [True, False])
+@pytest.mark.parametrize(
+    "reduction, scalar, dtype, atol, rtol",
+    [
+        ("mean", 1.0, torch.bfloat16, 5e-3, 5e-2),
+        ("mean", 1.0, torch.float32, 1e-5, 5e-4),
+        ("sum", 1.0, torch.bfloat16, 5e-0, 5e1),
+        ("sum", 1.0, torch.float32, 1e-3, 5e-2),
+    ],
+)
+def test_correctness(B, T, H, V, K, bias, reduction, scalar, dtype, atol, rtol):
+    set_seed(42)
+    torch_lm_head_ce = TorchLMHeadSoftTargetCE(H=H, V=V, bias=bias, reduction=reduction, dtype=dtype).to(device)
+    liger_lm_head_ce = LigerLMHeadSoftTargetCE(H=H, V=V, bias=bias, reduction=reduction, dtype=dtype).to(device)
+    torch_lm_head_ce.lin.weight.data = liger_lm_head_ce.lin.weight.data = torch.rand(V, H, device=device, dtype=dtype)
+    if bias:
+        torch_lm_head_ce.lin.bias.data = liger_lm_head_ce.lin.bias.data = torch.rand(V, device=device, dtype=dtype)
+
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype) * scalar
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    target_indices, target_probs = _soft_targets(B * T, V, K, dtype)
+
+    output1 = torch_lm_head_ce(_input1, target_indices, target_probs)
+    output2 = liger_lm_head_ce(_input2, target_indices, target_probs)
+    assert_verbose_allclose(output1, output2, atol=atol, rtol=rtol)
+
+    output1.backward(gradient=torch.ones_like(output1))
+    output2.backward(gradient=torch.ones_like(output2))
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=atol, rtol=rtol)
+    assert_verbose_allclose(torch_lm_head_ce.lin.weight.grad, liger_lm_head_ce.lin.weight.grad, atol=atol, rtol=rtol)
+    if bias:
+        assert_verbose_allclose(torch_lm_head_ce.lin.bias.grad, liger_lm_head_ce.lin.bias.grad, atol=atol, rtol=rtol)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V",
+    [
+        (4, 47, 31, 123),  # random shape
+    ],
+)
+def test_one_hot_targets_match_hard_targets(B, T, H, V):
+    """A single target class with probability 1 is the usual cross entropy."""
+    set_seed(42)
+    dtype = torch.float32
+    weight = torch.randn(V, H, device=device, dtype=dtype)
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    target = torch.randint(0, V, (B * T,), device=device, dtype=torch.long)
+    target[torch.randperm(B * T)[: B * T // 3]] = -100
+
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    weight1 = weight.detach().clone().requires_grad_(True)
+    loss1 = liger_fused_linear_cross_entropy(_input1, weight1, target)
+    loss1.backward()
+
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    weight2 = weight.detach().clone().requires_grad_(True)
+    loss2 = liger_fused_linear_soft_target_cross_entropy(
+        _input2, weight2, target.unsqueeze(-1), torch.ones(B * T, 1, device=device)
+    )
+    loss2.backward()
+
+    assert_verbose_allclose(loss1, loss2, atol=1e-5, rtol=1e-5)
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=1e-5, rtol=1e-5)
+    assert_verbose_allclose(weight1.grad, weight2.grad, atol=1e-5, rtol=1e-5)
+
+
+@pytest.mark.parametrize(
+    "B, T, H, V, K",
+    [
+        (4, 47, 31, 123, 5),  # random shape
+    ],
+)
+def test_repeated_target_classes_add_up(B, T, H, V, K):
+    """A class repeated in a row counts with the sum of its probabilities, in the loss and in the gradients."""
+    set_seed(42)
+    dtype = torch.float32
+    torch_lm_head_ce = TorchLMHeadSoftTargetCE(H=H, V=V, bias=True, dtype=dtype).to(device)
+    liger_lm_head_ce = LigerLMHeadSoftTargetCE(H=H, V=V, bias=True, dtype=dtype).to(device)
+    liger_lm_head_ce.lin.load_state_dict(torch_lm_head_ce.lin.state_dict())
+
+    _tensor = torch.randn(B * T, H, device=device, dtype=dtype)
+    _input1 = _tensor.detach().clone().requires_grad_(True)
+    _input2 = _tensor.detach().clone().requires_grad_(True)
+    # few classes for many pairs: most rows repeat some of them
+    target_indices = torch.randint(0, 3, (B * T, K), device=device)
+    target_indices[torch.rand(B * T, K, device=device) < 0.2] = -100
+    target_probs = torch.rand(B * T, K, device=device, dtype=dtype)
+
+    output1 = torch_lm_head_ce(_input1, target_indices, target_probs)
+    output2 = liger_lm_head_ce(_input2, target_indices, target_probs)
+    assert_verbose_allclose(output1, output2, atol=1e-5, rtol=5e-4)
+
+    output1.backward()
+    output2.backward()
+    assert_verbose_allclose(_input1.grad, _input2.grad, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(torch_lm_head_ce.lin.weight.grad, liger_lm_head_ce.lin.weight.grad, atol=1e-5, rtol=5e-4)
+    assert_verbose_allclose(torch_lm_head_ce.lin.bias.grad, liger_lm_head_ce.lin.bias.grad, atol=1e-5, rtol=5e-4)
+
+
+def test_reduction_none_is_rejected():
+    """The gradients are summed over the rows in forward, so a per-row grad_output cannot be applied to them."""
+    _input = torch.randn(8, 31, device=device, requires_grad=True)
+    weight = torch.randn(123, 31, device=device, requires_grad=True)
+    target_indices = torch.randint(0, 123, (8, 2), device=device)
+    target_probs = torch.rand(8, 2, device=device)
+    with pytest.raises(AssertionError, match="reduction"):
+        LigerFusedLinearSoftTargetCrossEntropyLoss(reduction="none")
+    with pytest.raises(AssertionError, match="reduction"):
+        liger_fused_linear_soft_target_cross_entropy(_input, weight, target_indices, target_probs, reduction="none")
@@ -6,7 +6,9 @@ from test.utils import assert_verbose_allclose
 from test.utils import infer_device
 from test.utils import set_seed
 
+from liger_kernel.ops.grpo_loss import fused_linear_selective_log_softmax
 from liger_kernel.ops.grpo_loss import fused_selective_log_softmax
+from liger_kernel.transformers.grpo_loss import triton_fused_linear_grpo_loss
 from liger_kernel.transformers.grpo_loss import triton_grpo_loss
 
 
@@ -229,6 +231,34 @@ def test_selective_log_softmax(B, T, V, temperature, dtype, atol, rtol):
     assert_verbose_allclose(triton_bf16_logp, torch_fp32_logp.to(dtype), rtol=rtol, atol=atol)
 
 
+@pytest.mark.parametrize("temperature, B, T, H, V", [(0.7, 2, 47, 31, 123), (1.0, 3, 20, 64, 257)])
+@pytest.mark.parametrize("bias", [True, False])
+@pytest.mark.parametrize("use_mask", [True, False])
+def test_fused_linear_selective_log_softmax(temperature, B, T, H, V, bias, use_mask):
+    torch.manual_seed(42)
+    hidden_states = torch.randn(B, T + 1, H, device=device)
+    weight = torch.randn(V, H, device=device, requires_grad=True)
+    bias_tensor = torch.randn(V, device=device) if bias else None
+    input_ids = torch.randint(0, V, (B, 10 + T), dtype=torch.int64, device=device)
+    mask = (torch.rand(B, 10 + T, device=device) > 0.3).long() if use_mask else None
+
+    logits = hidden_states @ weight.detach().t()
+    if bias:
+        logits = logits + bias_tensor
+    expected = fused_selective_log_softmax(logits.contiguous(), input_ids, temperature, mask=mask)
+    if use_mask:
+        assert_verbose_allclose(
+            expected, selective_log_softmax(logits, input_ids, temperature) * mask[:, -T:], rtol=1e-5, atol=1e-5
+        )
+
+    logp = fused_linear_selective_log_softmax(
+        hidden_states, weight, input_ids, temperature, mask=mask, bias=bias_tensor
+    )
+    assert not logp.requires_grad
+    assert logp.shape == (B, T) and logp.dtype == torch.float32
+    assert_verbose_allclose(logp, expected, rtol=1e-5, atol=1e-4)
+
+
 @pytest.mark.parametrize(
     "temperature, num_iteration, beta, eps_low, eps_high",
     [(0.7, num_iteration, beta, 0.2, 0.4) for num_iteration in [1, 5] for beta in [0.0, 0.04]],
@@ -1329,3 +1359,74 @@ def test_triton_sequence_level_rejects_unsupported_loss_types(loss_type):
             loss_type=loss_type,
             reduce=True,
         )
+
+
+@pytest.mark.parametrize("loss_type", ["grpo", "bnpo", "dapo", "cispo", "sapo", "luspo"])
+@pytest.mark.parametrize("beta", [0.0, 0.04])
+@pytest.mark.parametrize("bias", [True, False])
+@pytest.mark.parametrize("max_chunk_bytes", [None, 4096])
+@pytest.mark.parametrize("B, T, H, V", [(3, 20, 32, 123)])
+def test_fused_linear_grpo_loss(B, T, H, V, loss_type, beta, bias, max_chunk_bytes):
+    """triton_fused_linear_grpo_loss matches triton_grpo_loss on the materialized logits."""
+    torch.manual_seed(42)
+    temperature = 0.9
+    eps_high = 5.0 if loss_type == "cispo" else 0.4
+
+    hidden_states = torch.randn(B, T + 1, H, device=device)
+    weight = torch.randn(V, H, device=device) * 0.2
+    bias_tensor = torch.randn(V, device=device) if bias else None
+    completion_ids = torch.randint(0, V, (B, T), device=device)
+    completion_mask = (torch.rand(B, T, device=device) > 0.2).to(torch.int64)
+    advantages = torch.randn(B, device=device)
+    with torch.no_grad():
+        logits = hidden_states @ weight.t()
+        if bias:
+            logits = logits + bias_tensor
+        current_logp = selective_log_softmax(logits, completion_ids, temperature)
+        old_logp = current_logp + torch.randn_like(current_logp) * 0.3
+        ref_logp = current_logp + torch.randn_like(current_logp) * 0.2 if beta != 0.0 else None
+
+    hidden_states1 = hidden_states.clone().requires_grad_(True)
+    weight1 = weight.clone().requires_grad_(True)
+    bias1 = bias_tensor.clone().requires_grad_(True) if bias else None
+    logits1 = hidden_states1 @ weight1.t()
+    if bias:
+        logits1 = logits1 + bias1
+    kwargs = dict(temperature=temperature, beta=beta, eps_high=eps_high, loss_type=loss_type)
+    loss1, metrics1 = triton_grpo_loss(
+        logits1.contiguous(),
+        old_logp,
+        ref_logp,
+        completion_ids,
+        advantages,
+        completion_mask,
+        inplace=False,
+        reduce=True,
+        **kwargs,
+    )
+    loss1.backward()
+
+    hidden_states2 = hidden_states.clone().requires_grad_(True)
+    weight2 = weight.clone().requires_grad_(True)
+    bias2 = bias_tensor.clone().requires_grad_(True) if bias else None
+    loss2, metrics2 = triton_fused_linear_grpo_loss(
+        hidden_states2,
+        weight2,
+        old_logp,
+        ref_logp,
+        completion_ids,
+        advantages,
+        completion_mask,
+        bias=bias2,
+        max_chunk_bytes=max_chunk_bytes,
+        **kwargs,
+    )
+    (loss2 * 2.0).backward()
+
+    assert_verbose_allclose(loss1, loss2, atol=1e-5, rtol=1e-5)
+    for metric1, metric2 in zip(metrics1, metrics2):
+        assert_verbose_allclose(metric1, metric2, atol=1e-5, rtol=1e-5)
+    assert_verbose_allclose(2.0 * hidden_states1.grad, hidden_states2.grad, atol=1e-5, rtol=1e-4)
+    assert_verbose_allclose(2.0 * weight1.grad, weight2.grad, atol=1e-5, rtol=1e-4)
+    if bias:
+        assert_verbose_allclose(2.0 * bias1.grad, bias2.grad, atol=1e-5, rtol=1e-4)